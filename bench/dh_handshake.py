@@ -0,0 +1,124 @@
+"""
+Diffie-Hellman握手延迟基准测试
+对每个预定义的DH组测量: 生成密钥对(使用固定底数预计算表)、计算一次共享密钥，
+以及两个NetworkManager在本机回环连接上完成一次公钥交换的时间(双方都在握手中生成密钥对)。
+每项取多次运行的中位数(毫秒)。默认对比短指数私钥和完整长度私钥。
+
+用法: python bench/dh_handshake.py [--runs N] [--groups modp2048,ffdhe3072] [--short-only]
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import statistics
+import threading
+import contextlib
+import io
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crypto.diffie_hellman import DiffieHellman, GROUPS, get_group
+from network.communication import NetworkManager
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def measure_keygen(group, runs, **kwargs):
+    """
+    生成密钥对的时间(秒)，预计算表已经建好
+    """
+    DiffieHellman(group=group, **kwargs)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        DiffieHellman(group=group, **kwargs)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def measure_secret(group, runs, **kwargs):
+    """
+    计算一次共享密钥的时间(秒)
+    """
+    alice = DiffieHellman(group=group, **kwargs)
+    bob = DiffieHellman(group=group, **kwargs)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        alice.generate_shared_secret(bob.get_public_key())
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def measure_handshake(group, runs, **kwargs):
+    """
+    回环连接上一次完整公钥交换的时间(秒): 从客户端生成密钥对到客户端得到共享密钥
+    """
+    times = []
+    for _ in range(runs):
+        port = free_port()
+        server = NetworkManager(is_server=True, port=port)
+        client = NetworkManager(port=port)
+        results = {}
+        server_done = threading.Event()
+        done = threading.Event()
+
+        def on_server_key(public_key, group_id):
+            dh = DiffieHellman(group=group_id, **kwargs)
+            server.send_dh_public_key(dh.get_public_key(), dh.group_id, dh.key_size)
+            results['server'] = dh.generate_shared_secret(public_key)
+            server_done.set()
+
+        def on_client_key(public_key, group_id):
+            results['client'] = client_dh.generate_shared_secret(public_key)
+            done.set()
+
+        server.set_dh_key_callback(on_server_key)
+        client.set_dh_key_callback(on_client_key)
+        server.start()
+        client.start()
+        try:
+            start = time.perf_counter()
+            client_dh = DiffieHellman(group=group, **kwargs)
+            client.send_dh_public_key(client_dh.get_public_key(), client_dh.group_id, client_dh.key_size)
+            if not done.wait(60):
+                raise RuntimeError("握手超时")
+            times.append(time.perf_counter() - start)
+            server_done.wait(60)
+        finally:
+            client.close()
+            server.close()
+        if results.get('server') != results['client']:
+            raise RuntimeError("双方的共享密钥不一致")
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help="每项测量的运行次数")
+    parser.add_argument('--groups', default=','.join(group.name for group in GROUPS.values()),
+                        help="逗号分隔的组名称或组编号")
+    parser.add_argument('--short-only', action='store_true', help="只测量短指数私钥")
+    args = parser.parse_args()
+
+    groups = [get_group(int(name) if name.isdigit() else name) for name in args.groups.split(',')]
+    exponents = (True,) if args.short_only else (True, False)
+    print(f"{'group':<10} {'exponent':<9} {'keygen':>9} {'secret':>9} {'handshake':>10}  (ms, median of {args.runs})")
+    for group in groups:
+        for short_exponent in exponents:
+            # DiffieHellman和NetworkManager会打印密钥和连接信息
+            with contextlib.redirect_stdout(io.StringIO()):
+                keygen = measure_keygen(group.id, args.runs, short_exponent=short_exponent)
+                secret = measure_secret(group.id, args.runs, short_exponent=short_exponent)
+                handshake = measure_handshake(group.id, args.runs, short_exponent=short_exponent)
+            exponent = 'short' if short_exponent else 'full'
+            print(f"{group.name:<10} {exponent:<9} {keygen * 1000:9.1f} {secret * 1000:9.1f} {handshake * 1000:10.1f}")
+
+
+if __name__ == '__main__':
+    main()
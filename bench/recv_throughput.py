@@ -0,0 +1,128 @@
+"""
+接收路径吞吐量基准测试
+在socketpair上发送数据，比较旧的接收循环(每次recv 4096字节后 data += chunk，复制量与长度的平方成正比)
+和NetworkManager._receive_messages(预分配bytearray，通过memoryview用recv_into直接写入)的接收吞吐量(MB/s)。
+单帧不能超过NetworkManager.MAX_FRAME_SIZE(超过时接收方断开连接)，更大的数据按MAX_FRAME_SIZE拆分为多帧发送。
+旧的接收循环在大于--legacy-max的数据上耗时过长，不再测量。
+
+用法: python bench/recv_throughput.py [--sizes 1M,16M,64M,256M,1G] [--runs N] [--legacy-max 16M]
+"""
+import os
+import sys
+import time
+import socket
+import struct
+import argparse
+import statistics
+import threading
+import contextlib
+import io
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from network.communication import NetworkManager
+
+
+UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(text):
+    text = text.strip().upper()
+    if text[-1] in UNITS:
+        return int(text[:-1]) * UNITS[text[-1]]
+    return int(text)
+
+
+def legacy_receive(connection):
+    """
+    旧版本_receive_messages中读取各帧的代码，直到对方关闭连接
+    :return: 接收的总字节数
+    """
+    total = 0
+    while True:
+        header = connection.recv(8)
+        if not header or len(header) != 8:
+            return total
+        msg_type, msg_len = struct.unpack("!II", header)
+        data = b""
+        remaining = msg_len
+        while remaining > 0:
+            chunk = connection.recv(min(4096, remaining))
+            if not chunk:
+                raise Exception("连接已关闭")
+            data += chunk
+            remaining -= len(chunk)
+        total += len(data)
+
+
+def current_receive(connection):
+    """
+    当前版本的接收循环NetworkManager._receive_messages，直到对方关闭连接
+    :return: 接收的总字节数
+    """
+    sizes = []
+    manager = NetworkManager()
+    manager.connection = connection
+    manager.connected = True
+    manager.set_message_callback(lambda data: sizes.append(len(data)))
+    # 对方关闭连接时接收循环会打印错误信息
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager._receive_messages()
+    return sum(sizes)
+
+
+def send_frames(sock, payload):
+    """
+    把payload按MAX_FRAME_SIZE拆分为文本消息帧发送，然后关闭连接
+    """
+    view = memoryview(payload)
+    for offset in range(0, len(view), NetworkManager.MAX_FRAME_SIZE):
+        part = view[offset:offset + NetworkManager.MAX_FRAME_SIZE]
+        sock.sendall(struct.pack("!II", NetworkManager.MSG_TYPE_TEXT, len(part)))
+        sock.sendall(part)
+    sock.shutdown(socket.SHUT_WR)
+
+
+def measure(receive, payload, runs):
+    """
+    接收payload的吞吐量(MB/s)，取多次运行的中位数
+    """
+    rates = []
+    for _ in range(runs):
+        sender, receiver = socket.socketpair()
+        thread = threading.Thread(target=send_frames, args=(sender, payload), daemon=True)
+        try:
+            start = time.perf_counter()
+            thread.start()
+            received = receive(receiver)
+            elapsed = time.perf_counter() - start
+        finally:
+            thread.join()
+            sender.close()
+            receiver.close()
+        if received != len(payload):
+            raise RuntimeError("接收的数据长度不正确")
+        rates.append(len(payload) / elapsed / 1024 ** 2)
+    return statistics.median(rates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1M,16M,64M,256M,1G', help="逗号分隔的数据大小(可带K/M/G)")
+    parser.add_argument('--runs', type=int, default=3, help="每项测量的运行次数")
+    parser.add_argument('--legacy-max', default='16M', help="旧的接收循环测量的最大数据大小")
+    args = parser.parse_args()
+
+    legacy_max = parse_size(args.legacy_max)
+    print(f"{'size':>8} {'legacy MB/s':>12} {'recv_into MB/s':>15}  (median of {args.runs})")
+    for text in args.sizes.split(','):
+        size = parse_size(text)
+        # 重复同一段随机数据，避免生成大块随机数据的时间
+        payload = os.urandom(1024 ** 2) * (size // 1024 ** 2) + os.urandom(size % 1024 ** 2)
+        legacy = f"{measure(legacy_receive, payload, args.runs):12.1f}" if size <= legacy_max else f"{'skipped':>12}"
+        current = measure(current_receive, payload, args.runs)
+        print(f"{text.strip():>8} {legacy} {current:15.1f}")
+
+
+if __name__ == '__main__':
+    main()
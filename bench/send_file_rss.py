@@ -0,0 +1,125 @@
+"""
+发送文件的峰值内存(RSS)基准测试
+每种发送方式在单独的子进程中把同一个文件发送给只读取不处理的对端，报告子进程的峰值RSS，
+以及开始发送前后峰值RSS的增量(MB):
+  whole  旧的发送方式: f.read()读入整个文件，整体加密后作为一条MSG_TYPE_FILE消息发送
+  mmap   Application的分块发送: 按窗口映射源文件，每块加密到轮流使用的输出缓冲区，以sendmsg分散/聚集发送
+
+用法: python bench/send_file_rss.py [--size-mb N] [--mode ctr|cbc] [--methods whole,mmap]
+"""
+import os
+import sys
+import socket
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+import contextlib
+import io
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 两种方式都在测量前导入main(含tkinter)，导入的开销不计入增量
+from main import Application
+from crypto.des import DESCipher
+from network.communication import NetworkManager
+
+
+def peak_rss_mb():
+    """
+    当前进程的峰值RSS(MB)，Linux上ru_maxrss以KB为单位
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class NullJob:
+    """
+    代替CryptoJob: 忽略进度
+    """
+    def set_progress(self, done, total):
+        pass
+
+
+def send_whole(des, network, file_path):
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    encrypted_data, _ = des.encrypt(data)
+    del data
+    return network.send_encrypted_file(file_path, encrypted_data)
+
+
+def send_mmap(des, network, file_path):
+    # 不创建界面，只借用Application的分块发送实现
+    app = object.__new__(Application)
+    with open(file_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        transfer_id = network.new_transfer_id()
+        network.send_file_start(transfer_id, file_path, file_size, app.FILE_CHUNK_SIZE)
+        result = app._Application__send_file_chunks(NullJob(), des, network, transfer_id, f, file_size, set())
+    return network.send_file_end(transfer_id, result[0])
+
+
+METHODS = {'whole': send_whole, 'mmap': send_mmap}
+
+
+def run_child(method, file_path, mode):
+    """
+    子进程: 连接到只读取不处理的对端，发送文件后打印峰值RSS
+    """
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+
+    def drain():
+        peer, _ = listener.accept()
+        with peer:
+            while peer.recv(1024 * 1024):
+                pass
+    threading.Thread(target=drain, daemon=True).start()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        network = NetworkManager(port=listener.getsockname()[1], send_high_watermark=4 * 1024 * 1024,
+                                 send_low_watermark=1024 * 1024)
+        network.start()
+        des = DESCipher(os.urandom(8), mode=mode)
+        if mode == DESCipher.MODE_CBC:
+            network.cipher_mode = mode
+        before = peak_rss_mb()
+        if not METHODS[method](des, network, file_path).result():
+            raise RuntimeError("发送失败")
+        network.close()
+    after = peak_rss_mb()
+    print(f"{before:.1f} {after:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=16, help="发送的文件大小(MB)")
+    parser.add_argument('--mode', default='ctr', choices=('ctr', 'cbc'), help="加密工作模式")
+    parser.add_argument('--methods', default='whole,mmap', help="逗号分隔的发送方式")
+    parser.add_argument('--child', nargs=2, metavar=('METHOD', 'FILE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], args.child[1], args.mode)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'payload.bin')
+        with open(file_path, 'wb') as f:
+            block = os.urandom(1024 * 1024)
+            for _ in range(args.size_mb):
+                f.write(block)
+
+        print(f"sending {args.size_mb} MB in {args.mode.upper()} mode")
+        print(f"{'method':<8} {'peak MB':>9} {'delta MB':>9}")
+        for method in args.methods.split(','):
+            output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--mode', args.mode,
+                                              '--child', method, file_path], text=True)
+            before, after = map(float, output.split())
+            print(f"{method:<8} {after:9.1f} {after - before:+9.1f}")
+
+
+if __name__ == '__main__':
+    main()
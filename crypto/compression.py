@@ -0,0 +1,116 @@
+import os
+import zlib
+import lzma
+
+class Compressor:
+    """
+    加密前的压缩处理(先压缩再加密)
+    压缩结果的第一个字节标明压缩方法，压缩后没有变小的数据按原样保存，
+    因此解压方不需要知道发送方的压缩级别，也不需要事先知道某段数据是否被压缩
+    """
+    # 压缩方法
+    METHOD_NONE = 'none'
+    METHOD_ZLIB = 'zlib'
+    METHOD_LZMA = 'lzma'
+    METHODS = (METHOD_ZLIB, METHOD_LZMA)
+
+    # 各压缩方法的默认压缩级别
+    DEFAULT_LEVELS = {METHOD_ZLIB: 6, METHOD_LZMA: 6}
+
+    # 压缩结果首字节的标记
+    TAG_STORED = 0
+    TAG_ZLIB = 1
+    TAG_LZMA = 2
+
+    # 小于该字节数的数据不压缩
+    MIN_SIZE = 64
+    # 判断数据是否值得压缩时取样的字节数
+    SAMPLE_SIZE = 64 * 1024
+    # 取样数据的压缩率高于该值时认为数据已经压缩过
+    SAMPLE_RATIO = 0.95
+
+    # 通常已经压缩过的文件类型
+    COMPRESSED_EXTENSIONS = {
+        '.zip', '.gz', '.tgz', '.bz2', '.xz', '.lzma', '.7z', '.rar', '.zst',
+        '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic',
+        '.mp3', '.aac', '.ogg', '.flac', '.mp4', '.mkv', '.avi', '.mov', '.webm',
+        '.pdf', '.docx', '.xlsx', '.pptx', '.jar', '.apk'
+    }
+
+    def __init__(self, method=METHOD_ZLIB, level=None):
+        """
+        初始化压缩器
+        :param method: 压缩方法(METHOD_ZLIB、METHOD_LZMA或METHOD_NONE)
+        :param level: 压缩级别(zlib为0-9，lzma为0-9)，为None时使用默认级别
+        """
+        if method != self.METHOD_NONE and method not in self.METHODS:
+            raise ValueError(f"不支持的压缩方法: {method}")
+        self.method = method
+        self.level = self.DEFAULT_LEVELS.get(method, 0) if level is None else level
+
+    def compress(self, data):
+        """
+        压缩数据，压缩后没有变小时按原样保存
+        :param data: 原始数据
+        :return: 标记字节 + 压缩后(或原样)的数据
+        """
+        if self.method == self.METHOD_ZLIB and len(data) >= self.MIN_SIZE:
+            compressed = zlib.compress(data, self.level)
+            if len(compressed) < len(data):
+                return bytes([self.TAG_ZLIB]) + compressed
+        elif self.method == self.METHOD_LZMA and len(data) >= self.MIN_SIZE:
+            compressed = lzma.compress(data, preset=self.level)
+            if len(compressed) < len(data):
+                return bytes([self.TAG_LZMA]) + compressed
+        return bytes([self.TAG_STORED]) + bytes(data)
+
+    @classmethod
+    def decompress(cls, data, max_size=None):
+        """
+        解压数据(根据标记字节选择方法)
+        :param data: compress的结果
+        :param max_size: 解压结果的最大字节数，超过时视为无效数据，为None时不限制
+        :return: 原始数据，数据无效时返回None
+        """
+        if not data:
+            return None
+        tag = data[0]
+        payload = data[1:]
+        limit = -1 if max_size is None else max_size + 1
+        try:
+            if tag == cls.TAG_STORED:
+                result = bytes(payload)
+            elif tag == cls.TAG_ZLIB:
+                decompressor = zlib.decompressobj()
+                result = decompressor.decompress(payload, 0 if max_size is None else limit)
+                if not decompressor.eof:
+                    return None
+            elif tag == cls.TAG_LZMA:
+                decompressor = lzma.LZMADecompressor()
+                result = decompressor.decompress(payload, limit)
+                if not decompressor.eof:
+                    return None
+            else:
+                return None
+        except (zlib.error, lzma.LZMAError):
+            return None
+        if max_size is not None and len(result) > max_size:
+            return None
+        return result
+
+    def should_compress(self, sample, file_name=None):
+        """
+        判断一段数据(或一个文件)是否值得压缩
+        已经压缩过的文件类型直接跳过；否则用最快的zlib级别压缩一段样本，压缩率不理想时跳过
+        :param sample: 数据样本(如文件的第一个数据块)
+        :param file_name: 文件名，用于按扩展名判断
+        :return: 是否压缩
+        """
+        if self.method == self.METHOD_NONE:
+            return False
+        if file_name and os.path.splitext(file_name)[1].lower() in self.COMPRESSED_EXTENSIONS:
+            return False
+        sample = bytes(sample[:self.SAMPLE_SIZE])
+        if len(sample) < self.MIN_SIZE:
+            return False
+        return len(zlib.compress(sample, 1)) < len(sample) * self.SAMPLE_RATIO
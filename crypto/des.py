@@ -1,5 +1,81 @@
 import time
 import os
+import functools
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # NumPy为可选依赖，缺失时使用纯Python实现
+    np = None
+
+
+def _permute_int(value, table, width):
+    """
+    对整数表示的数据块进行置换
+    :param value: 输入数据块(整数，第1位为最高位)
+    :param table: 置换表
+    :param width: 输入数据块的位数
+    :return: 置换后的数据块(整数)
+    """
+    result = 0
+    for i in table:
+        result = (result << 1) | ((value >> (width - i)) & 1)
+    return result
+
+
+def _build_byte_tables(table, width):
+    """
+    将置换表编译为按字节索引的查找表
+    输入的每个字节对应一张256项的表，表项为该字节各比特置换后在输出中的掩码
+    :param table: 置换表
+    :param width: 输入数据块的位数(8的倍数)
+    :return: width/8张查找表
+    """
+    tables = []
+    for j in range(width // 8):
+        shift = width - 8 * (j + 1)
+        tables.append(tuple(_permute_int(b << shift, table, width) for b in range(256)))
+    return tuple(tables)
+
+
+def _permute_bytes(value, tables):
+    """
+    使用按字节索引的查找表对整数数据块进行置换
+    :param value: 输入数据块(整数)
+    :param tables: _build_byte_tables生成的查找表
+    :return: 置换后的数据块(整数)
+    """
+    result = 0
+    shift = 8 * len(tables)
+    for table in tables:
+        shift -= 8
+        result |= table[(value >> shift) & 0xFF]
+    return result
+
+
+def _build_sp_tables(s_boxes, p_table):
+    """
+    预计算S盒与P置换合并后的查找表
+    每个S盒对应一张64项的表，以6位输入直接索引，表项为经过P置换后的32位输出
+    :param s_boxes: S盒
+    :param p_table: 置换函数P
+    :return: 8张SP表
+    """
+    tables = []
+    for i, s_box in enumerate(s_boxes):
+        table = []
+        for block in range(64):
+            row = ((block >> 4) & 0x2) | (block & 0x1)
+            col = (block >> 1) & 0xF
+            # 将S盒输出放到32位字中对应的位置后再做P置换
+            value = s_box[row][col] << (28 - 4 * i)
+            table.append(_permute_int(value, p_table, 32))
+        tables.append(tuple(table))
+    return tuple(tables)
+
 
 class DESCipher:
     # 初始置换表 IP
@@ -98,6 +174,13 @@ class DESCipher:
         ]
     ]
 
+    # S盒与P置换合并后的查找表(类加载时预计算)
+    __SP = _build_sp_tables(__S_BOX, __P)
+
+    # IP与IP^-1的按字节查找表(8张表，每张256项64位掩码)
+    __IP_TABLES = _build_byte_tables(__IP, 64)
+    __IP_1_TABLES = _build_byte_tables(__IP_1, 64)
+
     # 置换选择1 PC-1
     __PC_1 = [57, 49, 41, 33, 25, 17, 9,
               1, 58, 50, 42, 34, 26, 18,
@@ -119,11 +202,48 @@ class DESCipher:
     # 左移位数表
     __SHIFT = [1, 1, 2, 2, 2, 2, 2, 2, 1, 2, 2, 2, 2, 2, 2, 1]
 
-    def __init__(self, key):
+    # PC-1与PC-2的按字节查找表
+    __PC_1_TABLES = _build_byte_tables(__PC_1, 64)
+    __PC_2_TABLES = _build_byte_tables(__PC_2, 56)
+
+    # NumPy批量后端使用的查找表
+    if np is not None:
+        __NP_SP = np.array(__SP, dtype=np.uint32)
+        __NP_IP = np.array(__IP_TABLES, dtype=np.uint64)
+        __NP_IP_1 = np.array(__IP_1_TABLES, dtype=np.uint64)
+
+    # 块数不少于该值时才使用NumPy批量处理
+    BATCH_MIN_BLOCKS = 64
+
+    # 工作模式
+    MODE_CBC = 'cbc'  # 密码分组链接模式(默认)
+    MODE_CTR = 'ctr'  # 计数器模式，可随机访问、可并行
+    MODES = (MODE_CBC, MODE_CTR)
+
+    # 密文长度不少于该值(字节)时decrypt_parallel才使用多进程
+    PARALLEL_MIN_SIZE = 1024 * 1024
+
+    # 密钥编排缓存的最大条目数
+    KEY_SCHEDULE_CACHE_SIZE = 64
+
+    # 分组运算引擎
+    ENGINE_BITS = 'bits'  # 原始的比特列表实现
+    ENGINE_INT = 'int'    # 基于64/32位整数的实现
+
+    def __init__(self, key, engine=ENGINE_INT, use_numpy=True, mode=MODE_CBC):
         """
         初始化DES加密器
         :param key: 8字节密钥
+        :param engine: 分组运算引擎(ENGINE_INT或ENGINE_BITS)，两者输出完全一致
+        :param use_numpy: 是否在NumPy可用时对大量独立块使用批量后端(仅整数引擎)
+        :param mode: 默认工作模式(MODE_CBC或MODE_CTR)
         """
+        if engine not in (self.ENGINE_INT, self.ENGINE_BITS):
+            raise ValueError(f"未知的DES引擎: {engine}")
+        self.engine = engine
+        self.mode = self.__check_mode(mode)
+        self.use_numpy = use_numpy and np is not None and engine == self.ENGINE_INT
+
         # 确保密钥长度为8字节
         if isinstance(key, str):
             self.key = key.encode('utf-8')
@@ -139,7 +259,11 @@ class DESCipher:
         print(f'共享密钥：{self.key}')
             
         # 生成16轮子密钥
-        self.sub_keys = self.__generate_sub_keys()
+        if self.engine == self.ENGINE_BITS:
+            self.sub_keys = self.__generate_sub_keys()
+        else:
+            # 整数引擎使用48位整数形式的子密钥，加密/解密顺序均从缓存中取得
+            self.sub_keys, self.__decrypt_sub_keys = self.__compile_key_schedule(bytes(self.key))
         self.block_size = 8  # DES块大小为8字节
 
     def __str_to_bit_array(self, text):
@@ -224,6 +348,44 @@ class DESCipher:
             
         return sub_keys
 
+    @staticmethod
+    @functools.lru_cache(maxsize=KEY_SCHEDULE_CACHE_SIZE)
+    def __compile_key_schedule(key):
+        """
+        使用整数运算生成16轮子密钥，结果按密钥缓存(LRU)
+        :param key: 8字节密钥(bytes)
+        :return: (加密用子密钥元组, 解密用逆序子密钥元组)，每个子密钥为48位整数
+        """
+        # PC-1置换，将64位密钥变为56位，并分为左右各28位
+        key_56 = _permute_bytes(int.from_bytes(key, 'big'), DESCipher.__PC_1_TABLES)
+        left, right = key_56 >> 28, key_56 & 0xFFFFFFF
+
+        sub_keys = []
+        for shift in DESCipher.__SHIFT:
+            # 28位循环左移
+            left = ((left << shift) | (left >> (28 - shift))) & 0xFFFFFFF
+            right = ((right << shift) | (right >> (28 - shift))) & 0xFFFFFFF
+
+            # PC-2置换，将56位变为48位
+            sub_keys.append(_permute_bytes((left << 28) | right, DESCipher.__PC_2_TABLES))
+
+        return tuple(sub_keys), tuple(reversed(sub_keys))
+
+    @classmethod
+    def key_schedule_cache_info(cls):
+        """
+        获取密钥编排缓存的统计信息
+        :return: functools的CacheInfo(hits, misses, maxsize, currsize)
+        """
+        return cls.__compile_key_schedule.cache_info()
+
+    @classmethod
+    def clear_key_schedule_cache(cls):
+        """
+        清空密钥编排缓存及其统计信息
+        """
+        cls.__compile_key_schedule.cache_clear()
+
     def __f_function(self, right, sub_key):
         """
         DES的F函数
@@ -295,6 +457,190 @@ class DESCipher:
         # 将比特数组转换为字节
         return self.__bit_array_to_str(result)
 
+    def __f_function_table(self, right, sub_key):
+        """
+        查表版本的F函数，每轮只需8次查表和按位或
+        :param right: 输入数据右半部分(32位整数)
+        :param sub_key: 子密钥(48位整数)
+        :return: F函数输出(32位整数)
+        """
+        # 扩展置换：将右半部分首尾各补一位得到34位，相邻6位一组即为E的输出
+        expanded = ((right & 1) << 33) | (right << 1) | (right >> 31)
+        sp = self.__SP
+        return (sp[0][((expanded >> 28) ^ (sub_key >> 42)) & 0x3F]
+                | sp[1][((expanded >> 24) ^ (sub_key >> 36)) & 0x3F]
+                | sp[2][((expanded >> 20) ^ (sub_key >> 30)) & 0x3F]
+                | sp[3][((expanded >> 16) ^ (sub_key >> 24)) & 0x3F]
+                | sp[4][((expanded >> 12) ^ (sub_key >> 18)) & 0x3F]
+                | sp[5][((expanded >> 8) ^ (sub_key >> 12)) & 0x3F]
+                | sp[6][((expanded >> 4) ^ (sub_key >> 6)) & 0x3F]
+                | sp[7][(expanded ^ sub_key) & 0x3F])
+
+    def __des_crypt_block_int(self, block, decrypt=False):
+        """
+        整数版本的DES分组加密/解密
+        :param block: 输入块(64位整数)
+        :param decrypt: 是否为解密模式
+        :return: 加密/解密后的块(64位整数)
+        """
+        # 初始置换(8次查表)
+        ip = self.__IP_TABLES
+        block = (ip[0][block >> 56] | ip[1][(block >> 48) & 0xFF]
+                 | ip[2][(block >> 40) & 0xFF] | ip[3][(block >> 32) & 0xFF]
+                 | ip[4][(block >> 24) & 0xFF] | ip[5][(block >> 16) & 0xFF]
+                 | ip[6][(block >> 8) & 0xFF] | ip[7][block & 0xFF])
+
+        # 分为左右两部分，各32位
+        left, right = block >> 32, block & 0xFFFFFFFF
+
+        sub_keys = self.__decrypt_sub_keys if decrypt else self.sub_keys
+
+        # 16轮Feistel网络
+        for sub_key in sub_keys:
+            left, right = right, left ^ self.__f_function_table(right, sub_key)
+
+        # 合并左右两部分(交换左右位置)并进行逆初始置换(8次查表)
+        block = (right << 32) | left
+        ip_1 = self.__IP_1_TABLES
+        return (ip_1[0][block >> 56] | ip_1[1][(block >> 48) & 0xFF]
+                | ip_1[2][(block >> 40) & 0xFF] | ip_1[3][(block >> 32) & 0xFF]
+                | ip_1[4][(block >> 24) & 0xFF] | ip_1[5][(block >> 16) & 0xFF]
+                | ip_1[6][(block >> 8) & 0xFF] | ip_1[7][block & 0xFF])
+
+    def __crypt_block(self, block, decrypt=False):
+        """
+        使用当前引擎加密/解密一个块
+        :param block: 输入块(64位整数)
+        :param decrypt: 是否为解密模式
+        :return: 加密/解密后的块(64位整数)
+        """
+        if self.engine == self.ENGINE_BITS:
+            result = self.__des_encrypt_block(block.to_bytes(8, 'big'), decrypt)
+            return int.from_bytes(result, 'big')
+        return self.__des_crypt_block_int(block, decrypt)
+
+    def __np_permute(self, blocks, tables):
+        """
+        对uint64数组中的每个块进行按字节查表置换
+        :param blocks: 块数组(uint64)
+        :param tables: 按字节索引的查找表数组(8x256, uint64)
+        :return: 置换后的块数组(uint64)
+        """
+        result = np.zeros_like(blocks)
+        for j in range(8):
+            index = (blocks >> np.uint64(56 - 8 * j)) & np.uint64(0xFF)
+            result |= tables[j][index.astype(np.intp)]
+        return result
+
+    def __np_crypt_blocks(self, blocks, decrypt=False):
+        """
+        使用NumPy对大量独立块同时进行DES加密/解密
+        :param blocks: 块数组(uint64)
+        :param decrypt: 是否为解密模式
+        :return: 加密/解密后的块数组(uint64)
+        """
+        blocks = self.__np_permute(blocks, self.__NP_IP)
+        left = blocks >> np.uint64(32)
+        right = blocks & np.uint64(0xFFFFFFFF)
+
+        sp = self.__NP_SP
+        rows = np.arange(8).reshape(8, 1)
+        shifts = np.array([28, 24, 20, 16, 12, 8, 4, 0], dtype=np.uint64).reshape(8, 1)
+        sub_keys = self.__decrypt_sub_keys if decrypt else self.sub_keys
+
+        for sub_key in sub_keys:
+            # 扩展置换后按6位分组，与子密钥对应的6位异或作为SP表索引
+            expanded = (((right & np.uint64(1)) << np.uint64(33))
+                        | (right << np.uint64(1)) | (right >> np.uint64(31)))
+            key_parts = np.array([(sub_key >> (42 - 6 * i)) & 0x3F for i in range(8)],
+                                 dtype=np.uint64).reshape(8, 1)
+            index = ((expanded >> shifts) & np.uint64(0x3F)) ^ key_parts
+            f = np.bitwise_or.reduce(sp[rows, index.astype(np.intp)], axis=0)
+            left, right = right, left ^ f.astype(np.uint64)
+
+        return self.__np_permute((right << np.uint64(32)) | left, self.__NP_IP_1)
+
+    def __use_batch(self, size):
+        """
+        判断给定长度的数据是否使用NumPy批量后端
+        :param size: 数据长度(字节)
+        :return: 是否使用批量后端
+        """
+        return (self.use_numpy and size % self.block_size == 0
+                and size // self.block_size >= self.BATCH_MIN_BLOCKS)
+
+    def __crypt_blocks(self, data, decrypt=False):
+        """
+        独立地加密/解密若干完整的块
+        :param data: 输入数据，长度必须是块大小的倍数
+        :param decrypt: 是否为解密模式
+        :return: 加密/解密后的数据(bytes)
+        """
+        if len(data) % self.block_size != 0:
+            raise ValueError("数据长度必须是8字节的倍数")
+
+        if self.__use_batch(len(data)):
+            blocks = np.frombuffer(data, dtype='>u8').astype(np.uint64)
+            return self.__np_crypt_blocks(blocks, decrypt).astype('>u8').tobytes()
+
+        result = bytearray()
+        for i in range(0, len(data), self.block_size):
+            block = int.from_bytes(data[i:i+self.block_size], 'big')
+            result += self.__crypt_block(block, decrypt).to_bytes(8, 'big')
+        return bytes(result)
+
+    def encrypt_blocks(self, data):
+        """
+        以ECB方式加密若干完整的块(不填充、不使用IV)
+        数据量较大且NumPy可用时自动使用批量后端
+        :param data: 输入数据，长度必须是块大小的倍数
+        :return: 加密后的数据(bytes)
+        """
+        return self.__crypt_blocks(data)
+
+    def decrypt_blocks(self, data):
+        """
+        以ECB方式解密若干完整的块(不去除填充)
+        :param data: 输入数据，长度必须是块大小的倍数
+        :return: 解密后的数据(bytes)
+        """
+        return self.__crypt_blocks(data, decrypt=True)
+
+    def __check_mode(self, mode):
+        """
+        检查工作模式是否受支持
+        :param mode: 工作模式
+        :return: 工作模式
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"不支持的工作模式: {mode}")
+        return mode
+
+    def crypt_ctr(self, nonce, data, offset=0):
+        """
+        CTR模式加密/解密(两者相同)，可以从任意字节偏移开始独立处理一段数据
+        第i个计数器块为 (nonce + i) mod 2^64
+        :param nonce: 8字节的初始计数器(即IV)
+        :param data: 明文或密文(对应整段数据中从offset开始的部分)
+        :param offset: data在整段数据中的起始字节偏移
+        :return: 处理后的数据(bytes)
+        """
+        if not data:
+            return b''
+
+        # 生成覆盖[offset, offset+len(data))的密钥流
+        first_block = offset // self.block_size
+        last_block = (offset + len(data) - 1) // self.block_size
+        counter = int.from_bytes(nonce, 'big') + first_block
+        counters = b''.join(((counter + i) & 0xFFFFFFFFFFFFFFFF).to_bytes(8, 'big')
+                            for i in range(last_block - first_block + 1))
+        start = offset % self.block_size
+        keystream = self.encrypt_blocks(counters)[start:start + len(data)]
+
+        # 整体按大整数异或
+        result = int.from_bytes(data, 'big') ^ int.from_bytes(keystream, 'big')
+        return result.to_bytes(len(data), 'big')
+
     def __pad(self, data):
         """
         使用PKCS#5填充方式，确保数据长度是块大小的倍数
@@ -319,81 +665,161 @@ class DESCipher:
                 return None  # 无效填充
         return data[:-pad_len]
 
-    def encrypt(self, data):
+    def encrypt_cbc(self, iv, padded_data):
         """
-        加密数据，使用CBC模式
-        :param data: 需要加密的数据(bytes)
-        :return: (iv + 加密后的数据, 加密时间)
+        CBC模式加密若干完整的块(不填充)
+        :param iv: 初始化向量(即第一个明文块之前的密文块)
+        :param padded_data: 已填充的明文，长度为块大小的倍数
+        :return: 加密后的数据(bytearray)
         """
-        # 生成随机IV
-        iv = os.urandom(8)
-        
-        # 记录开始时间
-        start_time = time.time()
-        
-        # 对数据进行填充
-        padded_data = self.__pad(data)
-        
-        # 分块加密
         result = bytearray()
-        prev_block = iv  # 第一块使用IV作为前一个密文块
+        prev_block = int.from_bytes(iv, 'big')  # 第一块使用IV作为前一个密文块
         
         for i in range(0, len(padded_data), self.block_size):
             # 获取当前块
-            block = padded_data[i:i+self.block_size]
+            block = int.from_bytes(padded_data[i:i+self.block_size], 'big')
             
-            # CBC模式：当前明文块与前一个密文块进行异或
-            xored_block = bytes(a ^ b for a, b in zip(block, prev_block))
-            
-            # 加密
-            encrypted_block = self.__des_encrypt_block(xored_block)
+            # CBC模式：当前明文块与前一个密文块进行异或，然后加密
+            encrypted_block = self.__crypt_block(block ^ prev_block)
             
             # 保存加密结果
-            result.extend(encrypted_block)
+            result += encrypted_block.to_bytes(8, 'big')
             
             # 更新前一个密文块
             prev_block = encrypted_block
         
+        return result
+
+    def encrypt(self, data, mode=None):
+        """
+        加密数据，默认使用初始化时指定的工作模式
+        :param data: 需要加密的数据(bytes)
+        :param mode: 工作模式(MODE_CBC或MODE_CTR)，为None时使用self.mode
+        :return: (iv + 加密后的数据, 加密时间)
+        """
+        mode = self.__check_mode(mode or self.mode)
+
+        # 生成随机IV
+        iv = os.urandom(8)
+        
+        # 记录开始时间
+        start_time = time.time()
+        
+        if mode == self.MODE_CTR:
+            # CTR模式不需要填充
+            result = self.crypt_ctr(iv, data)
+        else:
+            # 对数据进行填充后分块加密
+            result = self.encrypt_cbc(iv, self.__pad(data))
+        
         # 计算加密时间
         encryption_time = time.time() - start_time
         
         # 返回IV + 加密数据以及加密时间
         return bytes(iv + result), encryption_time
 
-    def decrypt(self, data):
+    def encrypted_size(self, size, mode=None):
         """
-        解密数据，使用CBC模式
-        :param data: 加密后的数据，包含IV(前8字节)
-        :return: (解密后的数据, 解密时间)
+        计算加密结果(iv + 密文)的字节数
+        :param size: 明文字节数
+        :param mode: 工作模式，为None时使用self.mode
+        :return: 加密结果的字节数
         """
-        # 提取IV和加密数据
-        iv = data[:8]
-        encrypted_data = data[8:]
+        mode = self.__check_mode(mode or self.mode)
+        if mode == self.MODE_CTR:
+            return self.block_size + size
+        return self.block_size + size - size % self.block_size + self.block_size
+
+    def encrypt_into(self, data, out, mode=None):
+        """
+        加密数据，把 iv + 密文 直接写入调用方提供的缓冲区
+        用于配合mmap和可重复使用的输出缓冲区分块加密文件，不产生整段数据的中间副本
+        :param data: 需要加密的数据(支持缓冲区协议的对象，如mmap的memoryview切片)
+        :param out: 可写的输出缓冲区，长度不小于encrypted_size(len(data), mode)
+        :param mode: 工作模式(MODE_CBC或MODE_CTR)，为None时使用self.mode
+        :return: (写入的字节数, 加密时间)
+        """
+        mode = self.__check_mode(mode or self.mode)
+        data = memoryview(data).cast('B')
+        size = self.encrypted_size(len(data), mode)
+        out = memoryview(out).cast('B')
+        if len(out) < size:
+            raise ValueError("输出缓冲区太小")
+
+        # 生成随机IV
+        iv = os.urandom(8)
         
         # 记录开始时间
         start_time = time.time()
         
-        # 分块解密
+        out[:8] = iv
+        if mode == self.MODE_CTR:
+            # CTR模式不需要填充，逐块生成密钥流，异或结果直接写入输出缓冲区(最后一块可能不足8字节)
+            counter = int.from_bytes(iv, 'big')
+            pos = self.block_size
+            for i in range(0, len(data), self.block_size):
+                block = data[i:i+self.block_size]
+                keystream = self.__crypt_block(counter) >> (8 * (self.block_size - len(block)))
+                out[pos:pos+len(block)] = (int.from_bytes(block, 'big') ^ keystream).to_bytes(len(block), 'big')
+                counter = (counter + 1) & 0xFFFFFFFFFFFFFFFF
+                pos += len(block)
+        else:
+            # 完整的块逐块写入输出缓冲区，最后不足一块的部分与填充组成最后一块
+            full_size = len(data) - len(data) % self.block_size
+            prev_block = int.from_bytes(iv, 'big')
+            pos = self.block_size
+            for i in range(0, full_size + self.block_size, self.block_size):
+                if i < full_size:
+                    block = int.from_bytes(data[i:i+self.block_size], 'big')
+                else:
+                    block = int.from_bytes(self.__pad(bytes(data[full_size:])), 'big')
+                prev_block = self.__crypt_block(block ^ prev_block)
+                out[pos:pos+self.block_size] = prev_block.to_bytes(8, 'big')
+                pos += self.block_size
+        
+        # 计算加密时间
+        encryption_time = time.time() - start_time
+        
+        return size, encryption_time
+
+    def decrypt_cbc(self, iv, encrypted_data):
+        """
+        CBC模式解密(不去除填充)
+        :param iv: 初始化向量(即第一个密文块之前的密文块)
+        :param encrypted_data: 密文，长度为块大小的倍数
+        :return: 解密后的数据(bytearray)
+        """
+        # CBC解密的各块互不依赖，数据量大时使用NumPy批量解密
+        if self.__use_batch(len(encrypted_data)):
+            blocks = np.frombuffer(encrypted_data, dtype='>u8').astype(np.uint64)
+            prev_blocks = np.frombuffer(bytes(iv) + encrypted_data[:-8], dtype='>u8').astype(np.uint64)
+            decrypted = self.__np_crypt_blocks(blocks, decrypt=True) ^ prev_blocks
+            return bytearray(decrypted.astype('>u8').tobytes())
+
         result = bytearray()
-        prev_block = iv  # 第一块使用IV作为前一个密文块
+        prev_block = int.from_bytes(iv, 'big')  # 第一块使用IV作为前一个密文块
         
         for i in range(0, len(encrypted_data), self.block_size):
             # 获取当前密文块
-            block = encrypted_data[i:i+self.block_size]
+            block = int.from_bytes(encrypted_data[i:i+self.block_size], 'big')
             
             # 解密
-            decrypted_block = self.__des_encrypt_block(block, decrypt=True)
+            decrypted_block = self.__crypt_block(block, decrypt=True)
             
             # CBC模式：解密结果与前一个密文块进行异或
-            xored_block = bytes(a ^ b for a, b in zip(decrypted_block, prev_block))
-            
-            # 保存解密结果
-            result.extend(xored_block)
+            result += (decrypted_block ^ prev_block).to_bytes(8, 'big')
             
             # 更新前一个密文块
             prev_block = block
         
-        # 去除填充
+        return result
+
+    def __strip_padding(self, result):
+        """
+        去除解密结果的填充
+        :param result: CBC解密结果
+        :return: 原始数据，填充无效时返回None
+        """
         try:
             unpadded_data = self.__unpad(result)
             if unpadded_data is None:
@@ -401,12 +827,136 @@ class DESCipher:
         except:
             # 如果解密过程出错，返回None
             unpadded_data = None
+        return unpadded_data
+
+    def decrypt(self, data, mode=None):
+        """
+        解密数据，默认使用初始化时指定的工作模式
+        :param data: 加密后的数据，包含IV(前8字节)
+        :param mode: 工作模式(MODE_CBC或MODE_CTR)，为None时使用self.mode
+        :return: (解密后的数据, 解密时间)
+        """
+        mode = self.__check_mode(mode or self.mode)
+
+        # 提取IV和加密数据
+        iv = data[:8]
+        encrypted_data = data[8:]
+        
+        # 记录开始时间
+        start_time = time.time()
+        
+        if mode == self.MODE_CTR:
+            # CTR模式没有填充，直接与密钥流异或
+            decrypted_data = self.crypt_ctr(iv, encrypted_data)
+            return decrypted_data, time.time() - start_time
+
+        # 分块解密
+        result = self.decrypt_cbc(iv, encrypted_data)
+        
+        # 去除填充
+        unpadded_data = self.__strip_padding(result)
         
         # 计算解密时间
         decryption_time = time.time() - start_time
         
         return unpadded_data, decryption_time
     
+    def decrypt_parallel(self, data, mode=None, max_workers=None, threshold=None):
+        """
+        使用进程池并行解密数据
+        CBC模式下每个明文块只依赖两个密文块，因此可以把密文按块边界切分，
+        每个分片附带其前一个密文块后独立解密；CTR模式按字节偏移切分
+        :param data: 加密后的数据，包含IV(前8字节)
+        :param mode: 工作模式，为None时使用self.mode
+        :param max_workers: 进程数，为None时使用CPU核数
+        :param threshold: 密文长度低于该值时直接串行解密，为None时使用PARALLEL_MIN_SIZE
+        :return: (解密后的数据, 解密时间)
+        """
+        mode = self.__check_mode(mode or self.mode)
+        if threshold is None:
+            threshold = self.PARALLEL_MIN_SIZE
+        workers = max_workers or os.cpu_count() or 1
+
+        view = memoryview(data).cast('B')
+        iv = bytes(view[:8])
+        encrypted_data = view[8:]
+        if (workers < 2 or not encrypted_data or len(encrypted_data) < threshold
+                or len(encrypted_data) % self.block_size != 0 and mode == self.MODE_CBC):
+            return self.decrypt(data, mode)
+
+        start_time = time.time()
+        result = self.__decrypt_shards(mode, iv, encrypted_data, workers)
+
+        if mode == self.MODE_CBC:
+            # 只需检查最后一块的填充，在原缓冲区上截掉填充，不再复制整段明文
+            last_block = self.__strip_padding(result[-self.block_size:])
+            if last_block is None:
+                return None, time.time() - start_time
+            del result[len(result) - self.block_size + len(last_block):]
+
+        return result, time.time() - start_time
+
+    def decrypt_cbc_parallel(self, iv, encrypted_data, max_workers=None):
+        """
+        使用进程池并行进行CBC模式解密(不去除填充)
+        :param iv: 初始化向量(即第一个密文块之前的密文块)
+        :param encrypted_data: 密文，长度为块大小的倍数
+        :param max_workers: 进程数，为None时使用CPU核数
+        :return: 解密后的数据(bytearray)
+        """
+        workers = max_workers or os.cpu_count() or 1
+        if workers < 2 or len(encrypted_data) < 2 * self.block_size:
+            return self.decrypt_cbc(iv, encrypted_data)
+        return self.__decrypt_shards(self.MODE_CBC, bytes(iv), memoryview(encrypted_data).cast('B'), workers)
+
+    def __decrypt_shards(self, mode, iv, encrypted_data, workers):
+        """
+        把密文按块边界均分为workers个分片，在共享的进程池中并行解密(不去除填充)
+        :param mode: 工作模式
+        :param iv: 初始化向量
+        :param encrypted_data: 密文(memoryview)
+        :param workers: 进程数
+        :return: 解密后的数据(bytearray)
+        """
+        shard_size = -(-len(encrypted_data) // workers)
+        shard_size += -shard_size % self.block_size
+        offsets = range(0, len(encrypted_data), shard_size)
+        # 分片要序列化后传给工作进程，每个分片只从输入复制一次
+        shards = [bytes(encrypted_data[offset:offset + shard_size]) for offset in offsets]
+        if mode == self.MODE_CTR:
+            # CTR模式各分片使用同一个初始计数器和各自的偏移
+            prev_blocks = [iv] * len(offsets)
+        else:
+            # CBC模式各分片需要其前一个密文块(第一个分片为IV)
+            prev_blocks = [iv] + [shard[-8:] for shard in shards[:-1]]
+
+        # 各分片的结果直接写入预先分配的输出缓冲区
+        result = bytearray(len(encrypted_data))
+        params = (bytes(self.key), self.engine, self.use_numpy)
+        parts = _get_parallel_pool(workers).map(_decrypt_shard, itertools.repeat(params), itertools.repeat(mode),
+                                                prev_blocks, shards, offsets)
+        for offset, part in zip(offsets, parts):
+            result[offset:offset + len(part)] = part
+        return result
+
+    def encryptor(self, mode=None, iv=None):
+        """
+        创建流式加密器，可分块加密任意大小的数据
+        :param mode: 工作模式，为None时使用self.mode
+        :param iv: 初始化向量，为None时随机生成
+        :return: Encryptor对象
+        """
+        return Encryptor(self, mode or self.mode, iv)
+
+    def decryptor(self, mode=None, max_workers=None):
+        """
+        创建流式解密器，可分块解密encrypt()或Encryptor输出的数据
+        :param mode: 工作模式，为None时使用self.mode
+        :param max_workers: CBC模式下并行解密每段密文使用的进程数，为None时串行解密
+        :return: Decryptor对象
+        """
+        return Decryptor(self, mode or self.mode, max_workers)
+
     @staticmethod
     def calculate_encryption_efficiency(original_size, encrypted_size, encryption_time):
         """
@@ -416,4 +966,225 @@ class DESCipher:
         :param encryption_time: 加密时间(秒)
         :return: 加密效率(字节/秒)
         """
-        return original_size / encryption_time if encryption_time > 0 else 0 
\ No newline at end of file
+        return original_size / encryption_time if encryption_time > 0 else 0
+
+
+class Encryptor:
+    """
+    流式加密器，保存CBC链接状态(或CTR偏移)，仅在finalize时进行PKCS#5填充
+    输出格式与DESCipher.encrypt()相同: iv + 密文
+    """
+
+    def __init__(self, cipher, mode, iv=None):
+        """
+        初始化流式加密器
+        :param cipher: DESCipher对象
+        :param mode: 工作模式
+        :param iv: 初始化向量，为None时随机生成
+        """
+        if mode not in DESCipher.MODES:
+            raise ValueError(f"不支持的工作模式: {mode}")
+        self.cipher = cipher
+        self.mode = mode
+        self.iv = iv or os.urandom(8)
+        self.elapsed = 0.0  # 累计加密时间(秒)
+        self.__prev_block = self.iv  # CBC: 前一个密文块
+        self.__offset = 0            # CTR: 已处理的字节数
+        self.__buffer = bytearray()  # CBC: 未凑满一块的明文
+        self.__started = False
+        self.__finalized = False
+
+    def __header(self):
+        """
+        第一次输出时在前面附加IV
+        :return: IV或空字节串
+        """
+        if self.__started:
+            return b''
+        self.__started = True
+        return self.iv
+
+    def update(self, chunk):
+        """
+        加密一段数据
+        :param chunk: 明文片段
+        :return: 本次可输出的密文(第一次调用时包含IV)
+        """
+        if self.__finalized:
+            raise ValueError("加密器已结束")
+        start_time = time.time()
+
+        if self.mode == DESCipher.MODE_CTR:
+            result = self.cipher.crypt_ctr(self.iv, chunk, self.__offset)
+            self.__offset += len(chunk)
+        else:
+            # 只加密完整的块，剩余部分留到下次
+            self.__buffer += chunk
+            size = len(self.__buffer) - len(self.__buffer) % 8
+            result = b''
+            if size:
+                result = self.cipher.encrypt_cbc(self.__prev_block, self.__buffer[:size])
+                self.__prev_block = result[-8:]
+                del self.__buffer[:size]
+
+        self.elapsed += time.time() - start_time
+        return self.__header() + bytes(result)
+
+    def finalize(self):
+        """
+        结束加密，CBC模式下对剩余数据填充并加密
+        :return: 最后的密文
+        """
+        if self.__finalized:
+            raise ValueError("加密器已结束")
+        self.__finalized = True
+        start_time = time.time()
+
+        result = b''
+        if self.mode == DESCipher.MODE_CBC:
+            pad_len = 8 - len(self.__buffer) % 8
+            self.__buffer += bytes([pad_len]) * pad_len
+            result = bytes(self.cipher.encrypt_cbc(self.__prev_block, self.__buffer))
+            self.__buffer = bytearray()
+
+        self.elapsed += time.time() - start_time
+        return self.__header() + result
+
+
+class Decryptor:
+    """
+    流式解密器，输入为 iv + 密文，可按任意大小分段提供
+    CBC模式下总是保留最后一个密文块，在finalize时解密并去除填充
+    """
+
+    def __init__(self, cipher, mode, max_workers=None):
+        """
+        初始化流式解密器
+        :param cipher: DESCipher对象
+        :param mode: 工作模式
+        :param max_workers: CBC模式下并行解密每段密文使用的进程数，为None时串行解密
+        """
+        if mode not in DESCipher.MODES:
+            raise ValueError(f"不支持的工作模式: {mode}")
+        self.cipher = cipher
+        self.mode = mode
+        self.max_workers = max_workers
+        self.iv = None
+        self.elapsed = 0.0  # 累计解密时间(秒)
+        self.__prev_block = None
+        self.__offset = 0
+        self.__buffer = bytearray()
+        self.__finalized = False
+
+    def update(self, chunk):
+        """
+        解密一段数据
+        :param chunk: 密文片段
+        :return: 本次可输出的明文
+        """
+        if self.__finalized:
+            raise ValueError("解密器已结束")
+        start_time = time.time()
+
+        self.__buffer += chunk
+        result = b''
+        if self.iv is None:
+            # 先凑齐IV
+            if len(self.__buffer) < 8:
+                return result
+            self.iv = self.__prev_block = bytes(self.__buffer[:8])
+            del self.__buffer[:8]
+
+        if self.mode == DESCipher.MODE_CTR:
+            result = self.cipher.crypt_ctr(self.iv, self.__buffer, self.__offset)
+            self.__offset += len(self.__buffer)
+            self.__buffer = bytearray()
+        else:
+            # 至少保留一个字节(即最后一个块)，留给finalize去除填充
+            size = (len(self.__buffer) - 1) // 8 * 8
+            if size > 0:
+                block_data = bytes(self.__buffer[:size])
+                if self.max_workers is None:
+                    result = bytes(self.cipher.decrypt_cbc(self.__prev_block, block_data))
+                else:
+                    result = self.cipher.decrypt_cbc_parallel(self.__prev_block, block_data, self.max_workers)
+                self.__prev_block = block_data[-8:]
+                del self.__buffer[:size]
+
+        self.elapsed += time.time() - start_time
+        return result
+
+    def finalize(self):
+        """
+        结束解密，CBC模式下解密最后一块并去除填充
+        :return: 最后的明文
+        """
+        if self.__finalized:
+            raise ValueError("解密器已结束")
+        self.__finalized = True
+        if self.mode == DESCipher.MODE_CTR:
+            if self.iv is None:
+                raise ValueError("密文不完整")
+            return b''
+
+        if self.iv is None or len(self.__buffer) != 8:
+            raise ValueError("密文不完整")
+        start_time = time.time()
+        # 以前一个密文块作为IV解密最后一块，同时校验并去除填充
+        result, _ = self.cipher.decrypt(self.__prev_block + bytes(self.__buffer), mode=DESCipher.MODE_CBC)
+        self.elapsed += time.time() - start_time
+        if result is None:
+            raise ValueError("无效的填充")
+        return bytes(result)
+
+
+
+# 并行解密使用的进程池 {进程数: ProcessPoolExecutor}，首次使用时创建，之后在本进程中复用
+_parallel_pools = {}
+_parallel_pools_lock = threading.Lock()
+
+
+def _get_parallel_pool(workers):
+    """
+    获取并行解密使用的进程池
+    工作进程以spawn方式启动: 调用方通常是多线程程序(网络线程、发送线程、任务线程)，fork多线程的进程可能死锁
+    :param workers: 进程数
+    :return: ProcessPoolExecutor对象
+    """
+    with _parallel_pools_lock:
+        pool = _parallel_pools.get(workers)
+        if pool is None:
+            pool = _parallel_pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return pool
+
+
+@functools.lru_cache(maxsize=8)
+def _get_parallel_cipher(key, engine, use_numpy):
+    """
+    获取工作进程中使用的加密器，按密钥缓存，同一密钥只生成一次子密钥
+    :param key: 8字节密钥
+    :param engine: 分组运算引擎
+    :param use_numpy: 是否使用NumPy批量后端
+    :return: DESCipher对象
+    """
+    return DESCipher(key, engine=engine, use_numpy=use_numpy)
+
+
+def _decrypt_shard(params, mode, prev_block, shard, offset):
+    """
+    在工作进程中解密一个分片(不去除填充)
+    :param params: 加密器参数(密钥, 分组运算引擎, 是否使用NumPy)
+    :param mode: 工作模式
+    :param prev_block: CBC模式下为分片之前的密文块，CTR模式下为初始计数器
+    :param shard: 密文分片
+    :param offset: 分片在整段密文中的字节偏移
+    :return: 解密后的分片(bytes)
+    """
+    cipher = _get_parallel_cipher(*params)
+    if mode == DESCipher.MODE_CTR:
+        return cipher.crypt_ctr(prev_block, shard, offset)
+    decrypted = cipher.decrypt_blocks(shard)
+    chained = bytes(prev_block) + shard[:-8]
+    result = int.from_bytes(decrypted, 'big') ^ int.from_bytes(chained, 'big')
+    return result.to_bytes(len(shard), 'big')
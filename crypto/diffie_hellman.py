@@ -1,63 +1,488 @@
-import random
+import secrets
 import hashlib
+import functools
+import collections
+import queue
+import threading
+
+
+# 预定义的DH组: (组编号, 名称, 生成元, 质数的十六进制表示)
+# MODP组使用RFC 3526中的组编号，ffdhe组使用RFC 7919(TLS)中的编号，
+# 组编号在密钥交换时发送给对方，双方据此确认使用相同的组
+_GROUP_DEFINITIONS = (
+    # MODP组5 (RFC 3526)
+    (5, 'modp1536', 2, (
+        "FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74"
+        "020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437"
+        "4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED"
+        "EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05"
+        "98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB"
+        "9ED529077096966D670C354E4ABC9804F1746C08CA237327FFFFFFFFFFFFFFFF"
+    )),
+    # MODP组14 (RFC 3526)
+    (14, 'modp2048', 2, (
+        "FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74"
+        "020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437"
+        "4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED"
+        "EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05"
+        "98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB"
+        "9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B"
+        "E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718"
+        "3995497CEA956AE515D2261898FA051015728E5A8AACAA68FFFFFFFFFFFFFFFF"
+    )),
+    # MODP组15 (RFC 3526)
+    (15, 'modp3072', 2, (
+        "FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74"
+        "020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437"
+        "4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED"
+        "EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05"
+        "98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB"
+        "9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B"
+        "E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718"
+        "3995497CEA956AE515D2261898FA051015728E5A8AAAC42DAD33170D04507A33"
+        "A85521ABDF1CBA64ECFB850458DBEF0A8AEA71575D060C7DB3970F85A6E1E4C7"
+        "ABF5AE8CDB0933D71E8C94E04A25619DCEE3D2261AD2EE6BF12FFA06D98A0864"
+        "D87602733EC86A64521F2B18177B200CBBE117577A615D6C770988C0BAD946E2"
+        "08E24FA074E5AB3143DB5BFCE0FD108E4B82D120A93AD2CAFFFFFFFFFFFFFFFF"
+    )),
+    # MODP组16 (RFC 3526)
+    (16, 'modp4096', 2, (
+        "FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74"
+        "020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437"
+        "4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED"
+        "EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05"
+        "98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB"
+        "9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B"
+        "E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718"
+        "3995497CEA956AE515D2261898FA051015728E5A8AAAC42DAD33170D04507A33"
+        "A85521ABDF1CBA64ECFB850458DBEF0A8AEA71575D060C7DB3970F85A6E1E4C7"
+        "ABF5AE8CDB0933D71E8C94E04A25619DCEE3D2261AD2EE6BF12FFA06D98A0864"
+        "D87602733EC86A64521F2B18177B200CBBE117577A615D6C770988C0BAD946E2"
+        "08E24FA074E5AB3143DB5BFCE0FD108E4B82D120A92108011A723C12A787E6D7"
+        "88719A10BDBA5B2699C327186AF4E23C1A946834B6150BDA2583E9CA2AD44CE8"
+        "DBBBC2DB04DE8EF92E8EFC141FBECAA6287C59474E6BC05D99B2964FA090C3A2"
+        "233BA186515BE7ED1F612970CEE2D7AFB81BDD762170481CD0069127D5B05AA9"
+        "93B4EA988D8FDDC186FFB7DC90A6C08F4DF435C934063199FFFFFFFFFFFFFFFF"
+    )),
+    # MODP组17 (RFC 3526)
+    (17, 'modp6144', 2, (
+        "FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74"
+        "020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437"
+        "4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED"
+        "EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05"
+        "98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB"
+        "9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B"
+        "E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718"
+        "3995497CEA956AE515D2261898FA051015728E5A8AAAC42DAD33170D04507A33"
+        "A85521ABDF1CBA64ECFB850458DBEF0A8AEA71575D060C7DB3970F85A6E1E4C7"
+        "ABF5AE8CDB0933D71E8C94E04A25619DCEE3D2261AD2EE6BF12FFA06D98A0864"
+        "D87602733EC86A64521F2B18177B200CBBE117577A615D6C770988C0BAD946E2"
+        "08E24FA074E5AB3143DB5BFCE0FD108E4B82D120A92108011A723C12A787E6D7"
+        "88719A10BDBA5B2699C327186AF4E23C1A946834B6150BDA2583E9CA2AD44CE8"
+        "DBBBC2DB04DE8EF92E8EFC141FBECAA6287C59474E6BC05D99B2964FA090C3A2"
+        "233BA186515BE7ED1F612970CEE2D7AFB81BDD762170481CD0069127D5B05AA9"
+        "93B4EA988D8FDDC186FFB7DC90A6C08F4DF435C93402849236C3FAB4D27C7026"
+        "C1D4DCB2602646DEC9751E763DBA37BDF8FF9406AD9E530EE5DB382F413001AE"
+        "B06A53ED9027D831179727B0865A8918DA3EDBEBCF9B14ED44CE6CBACED4BB1B"
+        "DB7F1447E6CC254B332051512BD7AF426FB8F401378CD2BF5983CA01C64B92EC"
+        "F032EA15D1721D03F482D7CE6E74FEF6D55E702F46980C82B5A84031900B1C9E"
+        "59E7C97FBEC7E8F323A97A7E36CC88BE0F1D45B7FF585AC54BD407B22B4154AA"
+        "CC8F6D7EBF48E1D814CC5ED20F8037E0A79715EEF29BE32806A1D58BB7C5DA76"
+        "F550AA3D8A1FBFF0EB19CCB1A313D55CDA56C9EC2EF29632387FE8D76E3C0468"
+        "043E8F663F4860EE12BF2D5B0B7474D6E694F91E6DCC4024FFFFFFFFFFFFFFFF"
+    )),
+    # MODP组18 (RFC 3526)
+    (18, 'modp8192', 2, (
+        "FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74"
+        "020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437"
+        "4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED"
+        "EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05"
+        "98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB"
+        "9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B"
+        "E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718"
+        "3995497CEA956AE515D2261898FA051015728E5A8AAAC42DAD33170D04507A33"
+        "A85521ABDF1CBA64ECFB850458DBEF0A8AEA71575D060C7DB3970F85A6E1E4C7"
+        "ABF5AE8CDB0933D71E8C94E04A25619DCEE3D2261AD2EE6BF12FFA06D98A0864"
+        "D87602733EC86A64521F2B18177B200CBBE117577A615D6C770988C0BAD946E2"
+        "08E24FA074E5AB3143DB5BFCE0FD108E4B82D120A92108011A723C12A787E6D7"
+        "88719A10BDBA5B2699C327186AF4E23C1A946834B6150BDA2583E9CA2AD44CE8"
+        "DBBBC2DB04DE8EF92E8EFC141FBECAA6287C59474E6BC05D99B2964FA090C3A2"
+        "233BA186515BE7ED1F612970CEE2D7AFB81BDD762170481CD0069127D5B05AA9"
+        "93B4EA988D8FDDC186FFB7DC90A6C08F4DF435C93402849236C3FAB4D27C7026"
+        "C1D4DCB2602646DEC9751E763DBA37BDF8FF9406AD9E530EE5DB382F413001AE"
+        "B06A53ED9027D831179727B0865A8918DA3EDBEBCF9B14ED44CE6CBACED4BB1B"
+        "DB7F1447E6CC254B332051512BD7AF426FB8F401378CD2BF5983CA01C64B92EC"
+        "F032EA15D1721D03F482D7CE6E74FEF6D55E702F46980C82B5A84031900B1C9E"
+        "59E7C97FBEC7E8F323A97A7E36CC88BE0F1D45B7FF585AC54BD407B22B4154AA"
+        "CC8F6D7EBF48E1D814CC5ED20F8037E0A79715EEF29BE32806A1D58BB7C5DA76"
+        "F550AA3D8A1FBFF0EB19CCB1A313D55CDA56C9EC2EF29632387FE8D76E3C0468"
+        "043E8F663F4860EE12BF2D5B0B7474D6E694F91E6DBE115974A3926F12FEE5E4"
+        "38777CB6A932DF8CD8BEC4D073B931BA3BC832B68D9DD300741FA7BF8AFC47ED"
+        "2576F6936BA424663AAB639C5AE4F5683423B4742BF1C978238F16CBE39D652D"
+        "E3FDB8BEFC848AD922222E04A4037C0713EB57A81A23F0C73473FC646CEA306B"
+        "4BCBC8862F8385DDFA9D4B7FA2C087E879683303ED5BDD3A062B3CF5B3A278A6"
+        "6D2A13F83F44F82DDF310EE074AB6A364597E899A0255DC164F31CC50846851D"
+        "F9AB48195DED7EA1B1D510BD7EE74D73FAF36BC31ECFA268359046F4EB879F92"
+        "4009438B481C6CD7889A002ED5EE382BC9190DA6FC026E479558E4475677E9AA"
+        "9E3050E2765694DFC81F56E880B96E7160C980DD98EDD3DFFFFFFFFFFFFFFFFF"
+    )),
+    # ffdhe2048 (RFC 7919)
+    (256, 'ffdhe2048', 2, (
+        "FFFFFFFFFFFFFFFFADF85458A2BB4A9AAFDC5620273D3CF1D8B9C583CE2D3695"
+        "A9E13641146433FBCC939DCE249B3EF97D2FE363630C75D8F681B202AEC4617A"
+        "D3DF1ED5D5FD65612433F51F5F066ED0856365553DED1AF3B557135E7F57C935"
+        "984F0C70E0E68B77E2A689DAF3EFE8721DF158A136ADE73530ACCA4F483A797A"
+        "BC0AB182B324FB61D108A94BB2C8E3FBB96ADAB760D7F4681D4F42A3DE394DF4"
+        "AE56EDE76372BB190B07A7C8EE0A6D709E02FCE1CDF7E2ECC03404CD28342F61"
+        "9172FE9CE98583FF8E4F1232EEF28183C3FE3B1B4C6FAD733BB5FCBC2EC22005"
+        "C58EF1837D1683B2C6F34A26C1B2EFFA886B423861285C97FFFFFFFFFFFFFFFF"
+    )),
+    # ffdhe3072 (RFC 7919)
+    (257, 'ffdhe3072', 2, (
+        "FFFFFFFFFFFFFFFFADF85458A2BB4A9AAFDC5620273D3CF1D8B9C583CE2D3695"
+        "A9E13641146433FBCC939DCE249B3EF97D2FE363630C75D8F681B202AEC4617A"
+        "D3DF1ED5D5FD65612433F51F5F066ED0856365553DED1AF3B557135E7F57C935"
+        "984F0C70E0E68B77E2A689DAF3EFE8721DF158A136ADE73530ACCA4F483A797A"
+        "BC0AB182B324FB61D108A94BB2C8E3FBB96ADAB760D7F4681D4F42A3DE394DF4"
+        "AE56EDE76372BB190B07A7C8EE0A6D709E02FCE1CDF7E2ECC03404CD28342F61"
+        "9172FE9CE98583FF8E4F1232EEF28183C3FE3B1B4C6FAD733BB5FCBC2EC22005"
+        "C58EF1837D1683B2C6F34A26C1B2EFFA886B4238611FCFDCDE355B3B6519035B"
+        "BC34F4DEF99C023861B46FC9D6E6C9077AD91D2691F7F7EE598CB0FAC186D91C"
+        "AEFE130985139270B4130C93BC437944F4FD4452E2D74DD364F2E21E71F54BFF"
+        "5CAE82AB9C9DF69EE86D2BC522363A0DABC521979B0DEADA1DBF9A42D5C4484E"
+        "0ABCD06BFA53DDEF3C1B20EE3FD59D7C25E41D2B66C62E37FFFFFFFFFFFFFFFF"
+    )),
+    # ffdhe4096 (RFC 7919)
+    (258, 'ffdhe4096', 2, (
+        "FFFFFFFFFFFFFFFFADF85458A2BB4A9AAFDC5620273D3CF1D8B9C583CE2D3695"
+        "A9E13641146433FBCC939DCE249B3EF97D2FE363630C75D8F681B202AEC4617A"
+        "D3DF1ED5D5FD65612433F51F5F066ED0856365553DED1AF3B557135E7F57C935"
+        "984F0C70E0E68B77E2A689DAF3EFE8721DF158A136ADE73530ACCA4F483A797A"
+        "BC0AB182B324FB61D108A94BB2C8E3FBB96ADAB760D7F4681D4F42A3DE394DF4"
+        "AE56EDE76372BB190B07A7C8EE0A6D709E02FCE1CDF7E2ECC03404CD28342F61"
+        "9172FE9CE98583FF8E4F1232EEF28183C3FE3B1B4C6FAD733BB5FCBC2EC22005"
+        "C58EF1837D1683B2C6F34A26C1B2EFFA886B4238611FCFDCDE355B3B6519035B"
+        "BC34F4DEF99C023861B46FC9D6E6C9077AD91D2691F7F7EE598CB0FAC186D91C"
+        "AEFE130985139270B4130C93BC437944F4FD4452E2D74DD364F2E21E71F54BFF"
+        "5CAE82AB9C9DF69EE86D2BC522363A0DABC521979B0DEADA1DBF9A42D5C4484E"
+        "0ABCD06BFA53DDEF3C1B20EE3FD59D7C25E41D2B669E1EF16E6F52C3164DF4FB"
+        "7930E9E4E58857B6AC7D5F42D69F6D187763CF1D5503400487F55BA57E31CC7A"
+        "7135C886EFB4318AED6A1E012D9E6832A907600A918130C46DC778F971AD0038"
+        "092999A333CB8B7A1A1DB93D7140003C2A4ECEA9F98D0ACC0A8291CDCEC97DCF"
+        "8EC9B55A7F88A46B4DB5A851F44182E1C68A007E5E655F6AFFFFFFFFFFFFFFFF"
+    )),
+    # ffdhe6144 (RFC 7919)
+    (259, 'ffdhe6144', 2, (
+        "FFFFFFFFFFFFFFFFADF85458A2BB4A9AAFDC5620273D3CF1D8B9C583CE2D3695"
+        "A9E13641146433FBCC939DCE249B3EF97D2FE363630C75D8F681B202AEC4617A"
+        "D3DF1ED5D5FD65612433F51F5F066ED0856365553DED1AF3B557135E7F57C935"
+        "984F0C70E0E68B77E2A689DAF3EFE8721DF158A136ADE73530ACCA4F483A797A"
+        "BC0AB182B324FB61D108A94BB2C8E3FBB96ADAB760D7F4681D4F42A3DE394DF4"
+        "AE56EDE76372BB190B07A7C8EE0A6D709E02FCE1CDF7E2ECC03404CD28342F61"
+        "9172FE9CE98583FF8E4F1232EEF28183C3FE3B1B4C6FAD733BB5FCBC2EC22005"
+        "C58EF1837D1683B2C6F34A26C1B2EFFA886B4238611FCFDCDE355B3B6519035B"
+        "BC34F4DEF99C023861B46FC9D6E6C9077AD91D2691F7F7EE598CB0FAC186D91C"
+        "AEFE130985139270B4130C93BC437944F4FD4452E2D74DD364F2E21E71F54BFF"
+        "5CAE82AB9C9DF69EE86D2BC522363A0DABC521979B0DEADA1DBF9A42D5C4484E"
+        "0ABCD06BFA53DDEF3C1B20EE3FD59D7C25E41D2B669E1EF16E6F52C3164DF4FB"
+        "7930E9E4E58857B6AC7D5F42D69F6D187763CF1D5503400487F55BA57E31CC7A"
+        "7135C886EFB4318AED6A1E012D9E6832A907600A918130C46DC778F971AD0038"
+        "092999A333CB8B7A1A1DB93D7140003C2A4ECEA9F98D0ACC0A8291CDCEC97DCF"
+        "8EC9B55A7F88A46B4DB5A851F44182E1C68A007E5E0DD9020BFD64B645036C7A"
+        "4E677D2C38532A3A23BA4442CAF53EA63BB454329B7624C8917BDD64B1C0FD4C"
+        "B38E8C334C701C3ACDAD0657FCCFEC719B1F5C3E4E46041F388147FB4CFDB477"
+        "A52471F7A9A96910B855322EDB6340D8A00EF092350511E30ABEC1FFF9E3A26E"
+        "7FB29F8C183023C3587E38DA0077D9B4763E4E4B94B2BBC194C6651E77CAF992"
+        "EEAAC0232A281BF6B3A739C1226116820AE8DB5847A67CBEF9C9091B462D538C"
+        "D72B03746AE77F5E62292C311562A846505DC82DB854338AE49F5235C95B9117"
+        "8CCF2DD5CACEF403EC9D1810C6272B045B3B71F9DC6B80D63FDD4A8E9ADB1E69"
+        "62A69526D43161C1A41D570D7938DAD4A40E329CD0E40E65FFFFFFFFFFFFFFFF"
+    )),
+    # ffdhe8192 (RFC 7919)
+    (260, 'ffdhe8192', 2, (
+        "FFFFFFFFFFFFFFFFADF85458A2BB4A9AAFDC5620273D3CF1D8B9C583CE2D3695"
+        "A9E13641146433FBCC939DCE249B3EF97D2FE363630C75D8F681B202AEC4617A"
+        "D3DF1ED5D5FD65612433F51F5F066ED0856365553DED1AF3B557135E7F57C935"
+        "984F0C70E0E68B77E2A689DAF3EFE8721DF158A136ADE73530ACCA4F483A797A"
+        "BC0AB182B324FB61D108A94BB2C8E3FBB96ADAB760D7F4681D4F42A3DE394DF4"
+        "AE56EDE76372BB190B07A7C8EE0A6D709E02FCE1CDF7E2ECC03404CD28342F61"
+        "9172FE9CE98583FF8E4F1232EEF28183C3FE3B1B4C6FAD733BB5FCBC2EC22005"
+        "C58EF1837D1683B2C6F34A26C1B2EFFA886B4238611FCFDCDE355B3B6519035B"
+        "BC34F4DEF99C023861B46FC9D6E6C9077AD91D2691F7F7EE598CB0FAC186D91C"
+        "AEFE130985139270B4130C93BC437944F4FD4452E2D74DD364F2E21E71F54BFF"
+        "5CAE82AB9C9DF69EE86D2BC522363A0DABC521979B0DEADA1DBF9A42D5C4484E"
+        "0ABCD06BFA53DDEF3C1B20EE3FD59D7C25E41D2B669E1EF16E6F52C3164DF4FB"
+        "7930E9E4E58857B6AC7D5F42D69F6D187763CF1D5503400487F55BA57E31CC7A"
+        "7135C886EFB4318AED6A1E012D9E6832A907600A918130C46DC778F971AD0038"
+        "092999A333CB8B7A1A1DB93D7140003C2A4ECEA9F98D0ACC0A8291CDCEC97DCF"
+        "8EC9B55A7F88A46B4DB5A851F44182E1C68A007E5E0DD9020BFD64B645036C7A"
+        "4E677D2C38532A3A23BA4442CAF53EA63BB454329B7624C8917BDD64B1C0FD4C"
+        "B38E8C334C701C3ACDAD0657FCCFEC719B1F5C3E4E46041F388147FB4CFDB477"
+        "A52471F7A9A96910B855322EDB6340D8A00EF092350511E30ABEC1FFF9E3A26E"
+        "7FB29F8C183023C3587E38DA0077D9B4763E4E4B94B2BBC194C6651E77CAF992"
+        "EEAAC0232A281BF6B3A739C1226116820AE8DB5847A67CBEF9C9091B462D538C"
+        "D72B03746AE77F5E62292C311562A846505DC82DB854338AE49F5235C95B9117"
+        "8CCF2DD5CACEF403EC9D1810C6272B045B3B71F9DC6B80D63FDD4A8E9ADB1E69"
+        "62A69526D43161C1A41D570D7938DAD4A40E329CCFF46AAA36AD004CF600C838"
+        "1E425A31D951AE64FDB23FCEC9509D43687FEB69EDD1CC5E0B8CC3BDF64B10EF"
+        "86B63142A3AB8829555B2F747C932665CB2C0F1CC01BD70229388839D2AF05E4"
+        "54504AC78B7582822846C0BA35C35F5C59160CC046FD8251541FC68C9C86B022"
+        "BB7099876A460E7451A8A93109703FEE1C217E6C3826E52C51AA691E0E423CFC"
+        "99E9E31650C1217B624816CDAD9A95F9D5B8019488D9C0A0A1FE3075A577E231"
+        "83F81D4A3F2FA4571EFC8CE0BA8A4FE8B6855DFE72B0A66EDED2FBABFBE58A30"
+        "FAFABE1C5D71A87E2F741EF8C1FE86FEA6BBFDE530677F0D97D11D49F7A8443D"
+        "0822E506A9F4614E011E2A94838FF88CD68C8BB7C5C6424CFFFFFFFFFFFFFFFF"
+    )),
+)
+
+# DH组的参数
+DHGroup = collections.namedtuple('DHGroup', ['id', 'name', 'prime', 'generator', 'bits'])
+
+
+def _parse_groups(definitions):
+    """
+    解析预定义的DH组(模块导入时执行一次)
+    :param definitions: _GROUP_DEFINITIONS
+    :return: {组编号: DHGroup}
+    """
+    groups = {}
+    for group_id, name, generator, prime_hex in definitions:
+        prime = int(''.join(prime_hex), 16)
+        groups[group_id] = DHGroup(group_id, name, prime, generator, prime.bit_length())
+    return groups
+
+
+# 所有预定义的DH组 {组编号: DHGroup}
+GROUPS = _parse_groups(_GROUP_DEFINITIONS)
+
+# 默认使用的DH组(2048位MODP组14)
+DEFAULT_GROUP_ID = 14
+
+
+def get_group(group):
+    """
+    查找预定义的DH组
+    :param group: 组编号或组名称(如14或'modp2048')
+    :return: DHGroup对象
+    """
+    if isinstance(group, DHGroup):
+        return group
+    if group in GROUPS:
+        return GROUPS[group]
+    for dh_group in GROUPS.values():
+        if dh_group.name == group:
+            return dh_group
+    raise ValueError(f"未知的DH组: {group}")
+
+
+class FixedBaseTable:
+    """
+    固定底数模幂运算的窗口预计算表
+    把指数按window位分段，预先计算 base^(d * 2^(window*i)) mod modulus，
+    计算 base^e 时每段只需查表做一次模乘，不需要平方运算。
+    表按需扩展到实际用到的指数位数，但不超过max_bits位；更长的指数直接使用pow()
+    """
+
+    def __init__(self, base, modulus, window=5, max_bits=512):
+        """
+        初始化预计算表
+        :param base: 底数(如DH的生成元)
+        :param modulus: 模数(如DH的质数)
+        :param window: 每段的位数，越大模乘次数越少，但表越大
+        :param max_bits: 预计算表覆盖的最大指数位数，限制表的大小
+        """
+        self.base = base
+        self.modulus = modulus
+        self.window = window
+        self.max_bits = max_bits
+        self.rows = []
+        self.__lock = threading.Lock()
+        # 下一行的底数 base^(2^(window*len(rows)))
+        self.__next_base = base % modulus
+
+    def __extend(self, count):
+        """
+        把预计算表扩展到至少count行
+        :param count: 需要的行数
+        """
+        with self.__lock:
+            while len(self.rows) < count:
+                row = [1] * (1 << self.window)
+                value = 1
+                for digit in range(1, 1 << self.window):
+                    value = value * self.__next_base % self.modulus
+                    row[digit] = value
+                self.__next_base = value * self.__next_base % self.modulus
+                self.rows.append(row)
+
+    def pow(self, exponent):
+        """
+        计算 base^exponent mod modulus
+        :param exponent: 非负整数指数
+        :return: 结果
+        """
+        if exponent < 0:
+            raise ValueError("指数不能为负数")
+        if exponent.bit_length() > self.max_bits:
+            # 完整长度的指数(如关闭短指数时)不扩展预计算表，否则大质数的表可达数十MB
+            return pow(self.base, exponent, self.modulus)
+        count = -(-exponent.bit_length() // self.window)
+        if count > len(self.rows):
+            self.__extend(count)
+
+        rows = self.rows
+        mask = (1 << self.window) - 1
+        result = 1
+        index = 0
+        while exponent:
+            digit = exponent & mask
+            if digit:
+                result = result * rows[index][digit] % self.modulus
+            exponent >>= self.window
+            index += 1
+        return result % self.modulus
+
 
 class DiffieHellman:
     """
     Diffie-Hellman密钥交换算法的实现
     """
+    # 固定底数预计算表的窗口位数和缓存的表数量(每组(质数, 生成元)一张表)
+    TABLE_WINDOW = 5
+    TABLE_CACHE_SIZE = 16
+    # 预计算表覆盖的指数位数: 预定义组为该组短指数私钥的位数，自定义质数为TABLE_MAX_BITS
+    TABLE_MAX_BITS = 256
+    
+    # 短指数私钥的位数(按质数位数)，约为组安全强度的两倍，不低于RFC 7919第5.2节建议的长度
+    SHORT_EXPONENT_BITS = {1536: 240, 2048: 256, 3072: 320, 4096: 384, 6144: 448, 8192: 512}
     
-    def __init__(self, prime=None, generator=None):
+    def __init__(self, prime=None, generator=None, group=None, short_exponent=True):
         """
         初始化Diffie-Hellman
-        :param prime: 大质数p (如果为None，使用预定义的安全质数)
-        :param generator: 生成元g (如果为None，使用预定义的生成元)
+        :param prime: 大质数p (如果为None，使用预定义组的质数)
+        :param generator: 生成元g (如果为None，使用预定义组的生成元)
+        :param group: 预定义组的编号或名称(如果为None，使用默认组DEFAULT_GROUP_ID)
+        :param short_exponent: 预定义组是否使用短指数私钥(模幂运算快数倍)；
+                               自定义质数总是在[2, prime-2]中均匀选取私钥
         """
-        # 如果没有指定，使用预定义的安全质数和生成元
+        # 如果没有指定质数和生成元，使用预定义的组(质数在模块导入时已经解析)
         if prime is None or generator is None:
-            # 使用一个已知的安全质数和对应的生成元
-            # 这是一个2048位的安全质数（MODP组14）
-            self.prime = int(
-                "FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD1"
-                "29024E088A67CC74020BBEA63B139B22514A08798E3404DD"
-                "EF9519B3CD3A431B302B0A6DF25F14374FE1356D6D51C245"
-                "E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED"
-                "EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3D"
-                "C2007CB8A163BF0598DA48361C55D39A69163FA8FD24CF5F"
-                "83655D23DCA3AD961C62F356208552BB9ED529077096966D"
-                "670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B"
-                "E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9"
-                "DE2BCBF6955817183995497CEA956AE515D2261898FA0510"
-                "15728E5A8AACAA68FFFFFFFFFFFFFFFF", 16)
-            self.generator = 2
+            dh_group = get_group(DEFAULT_GROUP_ID if group is None else group)
+            self.group_id = dh_group.id
+            self.prime = dh_group.prime
+            self.generator = dh_group.generator
         else:
+            # 自定义的质数和生成元没有组编号
+            self.group_id = None
             self.prime = prime
             self.generator = generator
+        
+        # 公钥和共享密钥按质数的字节数编码为定长大端字节
+        self.key_size = (self.prime.bit_length() + 7) // 8
             
-        # 生成私钥 (1 < private_key < prime-1)
-        self.private_key = random.randint(2, self.prime - 2)
+        # 生成私钥
+        self.private_key = self.__generate_private_key(short_exponent)
         print(f'私钥：{self.private_key}')
         # 计算公钥: public_key = generator^private_key mod prime
-        self.public_key = pow(self.generator, self.private_key, self.prime)
+        # 生成元固定，使用按(质数, 生成元)缓存的预计算表
+        self.public_key = self.get_fixed_base_table(self.prime, self.generator).pow(self.private_key)
         print(f'公钥：{self.public_key}')
 
-    def generate_shared_secret(self, other_public_key):
+    def __generate_private_key(self, short_exponent):
+        """
+        使用secrets生成私钥
+        短指数私钥的最高位固定为1，位数由质数位数决定；否则在[2, prime-2]中均匀选取
+        :param short_exponent: 是否使用短指数(仅对预定义组有效)
+        :return: 私钥
+        """
+        bits = self.SHORT_EXPONENT_BITS.get(self.prime.bit_length()) if self.group_id is not None else None
+        if short_exponent and bits:
+            return secrets.randbits(bits - 1) | (1 << (bits - 1))
+        return secrets.randbelow(self.prime - 3) + 2
+
+    @staticmethod
+    @functools.lru_cache(maxsize=TABLE_CACHE_SIZE)
+    def get_fixed_base_table(prime, generator):
+        """
+        获取生成元的固定底数预计算表，结果按(质数, 生成元)缓存(LRU)
+        :param prime: 质数
+        :param generator: 生成元
+        :return: FixedBaseTable对象
+        """
+        max_bits = DiffieHellman.SHORT_EXPONENT_BITS.get(prime.bit_length(), DiffieHellman.TABLE_MAX_BITS)
+        return FixedBaseTable(generator, prime, DiffieHellman.TABLE_WINDOW, max_bits)
+
+    def generate_shared_secret(self, other_public_key, legacy_kdf=False):
         """
         使用对方的公钥生成共享密钥
         :param other_public_key: 对方的公钥
+        :param legacy_kdf: 为True时对共享密钥的十进制文本做哈希(与使用旧版公钥格式的对方一致)，
+                           否则对定长大端字节做哈希
         :return: 共享密钥
         """
+        # 公钥必须在[2, prime-2]中，排除只能落在{1, prime-1}小子群中的值
+        if not 1 < other_public_key < self.prime - 1:
+            raise ValueError("无效的Diffie-Hellman公钥")
+        
         # 计算共享密钥: shared_secret = other_public_key^private_key mod prime
         shared_secret = pow(other_public_key, self.private_key, self.prime)
         
         # 将共享密钥转换为DES需要的8字节密钥
         # 由于共享密钥可能很大，我们使用哈希函数将其处理为固定长度
         # 然后截取前8字节作为DES密钥
-        hash_obj = hashlib.sha256(str(shared_secret).encode())
-        return hash_obj.digest()[:8]  # 截取前8字节作为DES密钥
+        if legacy_kdf:
+            hash_obj = hashlib.sha256(str(shared_secret).encode())
+        else:
+            hash_obj = hashlib.sha256(shared_secret.to_bytes(self.key_size, 'big'))
+        # 完整的哈希值作为主密钥，用于派生会话恢复密钥
+        self.master_secret = hash_obj.digest()
+        return self.master_secret[:8]  # 截取前8字节作为DES密钥
     
     def get_public_key(self):
         """
         获取公钥
         :return: 公钥
         """
-        return self.public_key 
\ No newline at end of file
+        return self.public_key 
+
+
+class DiffieHellmanPool:
+    """
+    预先生成密钥对的后台池
+    后台线程使池中保持size个已经算好公钥的DiffieHellman对象，新会话直接取用，
+    模幂运算不在握手的关键路径上。每个密钥对只会被取出一次
+    """
+
+    def __init__(self, prime=None, generator=None, size=2, group=None, short_exponent=True):
+        """
+        创建密钥对池并启动后台生成线程
+        :param prime: 质数(为None时使用预定义组的质数)
+        :param generator: 生成元
+        :param size: 池中保持的密钥对数量
+        :param group: 预定义组的编号或名称(为None时使用默认组)
+        :param short_exponent: 预定义组是否使用短指数私钥
+        """
+        self.prime = prime
+        self.generator = generator
+        self.group = group
+        self.short_exponent = short_exponent
+        self.pool = queue.Queue(maxsize=size)
+        self.thread = threading.Thread(target=self.__fill, daemon=True)
+        self.thread.start()
+
+    def __fill(self):
+        """
+        后台线程: 池未满时生成新的密钥对(池满时阻塞等待)
+        """
+        while True:
+            self.pool.put(DiffieHellman(self.prime, self.generator, self.group, self.short_exponent))
+
+    def get(self):
+        """
+        取出一个密钥对，池为空时直接生成
+        :return: DiffieHellman对象
+        """
+        try:
+            return self.pool.get_nowait()
+        except queue.Empty:
+            return DiffieHellman(self.prime, self.generator, self.group, self.short_exponent)
@@ -0,0 +1,158 @@
+import os
+import hmac
+import time
+import struct
+import hashlib
+import threading
+
+
+# 密钥派生使用的标签
+LABEL_RESUMPTION = b'resumption secret'
+LABEL_SESSION_KEY = b'session key'
+
+
+def derive_resumption_secret(secret, *context):
+    """
+    派生会话恢复密钥(HMAC-SHA256)
+    完整密钥交换后由主密钥派生；每次恢复会话后由旧的恢复密钥和双方的随机数派生新的恢复密钥
+    :param secret: 主密钥或上一次的恢复密钥
+    :param context: 参与派生的其他数据(如双方的随机数)
+    :return: 32字节的恢复密钥
+    """
+    return hmac.new(secret, LABEL_RESUMPTION + b''.join(context), hashlib.sha256).digest()
+
+
+def derive_session_key(resumption_secret, client_nonce, server_nonce):
+    """
+    恢复会话时派生新的DES密钥，双方的随机数保证每次恢复得到不同的密钥
+    :param resumption_secret: 会话恢复密钥
+    :param client_nonce: 客户端随机数
+    :param server_nonce: 服务器随机数
+    :return: 8字节DES密钥
+    """
+    return hmac.new(resumption_secret, LABEL_SESSION_KEY + client_nonce + server_nonce, hashlib.sha256).digest()[:8]
+
+
+class SessionTicketIssuer:
+    """
+    服务器端: 签发和验证会话票据
+    票据由服务器的票据密钥加密并认证，内容为会话恢复密钥和过期时间，服务器不需要保存会话状态；
+    多个服务器实例使用相同的票据密钥时，可以恢复彼此签发的会话。
+    票据格式: 随机数(16字节) + 密文 + HMAC-SHA256(32字节)
+    """
+    NONCE_SIZE = 16
+    MAC_SIZE = 32
+    # 票据的默认有效期(秒)
+    LIFETIME = 3600
+    # 票据明文: 过期时间(8字节) + 恢复密钥(32字节)
+    PLAINTEXT_FORMAT = '!Q32s'
+
+    def __init__(self, key=None, lifetime=LIFETIME):
+        """
+        初始化票据签发者
+        :param key: 票据密钥(任意长度的字节串)，为None时随机生成(只能恢复本实例签发的会话)
+        :param lifetime: 票据有效期(秒)
+        """
+        key = os.urandom(32) if key is None else key
+        self.lifetime = lifetime
+        self.__encryption_key = hmac.new(key, b'ticket encryption', hashlib.sha256).digest()
+        self.__mac_key = hmac.new(key, b'ticket mac', hashlib.sha256).digest()
+
+    def __keystream(self, nonce, size):
+        """
+        生成加密票据的密钥流(HMAC-SHA256计数器模式)
+        :param nonce: 票据随机数
+        :param size: 字节数
+        :return: 密钥流
+        """
+        blocks = []
+        for counter in range(-(-size // 32)):
+            blocks.append(hmac.new(self.__encryption_key, nonce + struct.pack('!I', counter), hashlib.sha256).digest())
+        return b''.join(blocks)[:size]
+
+    def __xor(self, data, nonce):
+        """
+        用密钥流加密或解密
+        :param data: 明文或密文
+        :param nonce: 票据随机数
+        :return: 密文或明文
+        """
+        stream = self.__keystream(nonce, len(data))
+        return (int.from_bytes(data, 'big') ^ int.from_bytes(stream, 'big')).to_bytes(len(data), 'big')
+
+    def issue(self, resumption_secret):
+        """
+        签发会话票据
+        :param resumption_secret: 32字节的会话恢复密钥
+        :return: 票据
+        """
+        nonce = os.urandom(self.NONCE_SIZE)
+        plaintext = struct.pack(self.PLAINTEXT_FORMAT, int(time.time()) + self.lifetime, resumption_secret)
+        body = nonce + self.__xor(plaintext, nonce)
+        return body + hmac.new(self.__mac_key, body, hashlib.sha256).digest()
+
+    def open(self, ticket):
+        """
+        验证并解开会话票据
+        :param ticket: 客户端出示的票据
+        :return: 会话恢复密钥，票据无效或已过期时返回None
+        """
+        ticket = bytes(ticket)
+        if len(ticket) != self.NONCE_SIZE + struct.calcsize(self.PLAINTEXT_FORMAT) + self.MAC_SIZE:
+            return None
+        body, mac = ticket[:-self.MAC_SIZE], ticket[-self.MAC_SIZE:]
+        if not hmac.compare_digest(mac, hmac.new(self.__mac_key, body, hashlib.sha256).digest()):
+            return None
+        nonce = body[:self.NONCE_SIZE]
+        expires, resumption_secret = struct.unpack(self.PLAINTEXT_FORMAT, self.__xor(body[self.NONCE_SIZE:], nonce))
+        if time.time() >= expires:
+            return None
+        return resumption_secret
+
+
+class SessionTicketCache:
+    """
+    客户端: 按服务器地址保存收到的会话票据和对应的会话恢复密钥
+    """
+
+    def __init__(self):
+        """
+        初始化票据缓存
+        """
+        self.entries = {}
+        self.__lock = threading.Lock()
+
+    def put(self, server, ticket, resumption_secret, lifetime):
+        """
+        保存服务器签发的票据(替换该服务器之前的票据)
+        :param server: 服务器地址(host, port)
+        :param ticket: 票据
+        :param resumption_secret: 票据对应的会话恢复密钥
+        :param lifetime: 票据有效期(秒)
+        """
+        with self.__lock:
+            self.entries[server] = (bytes(ticket), resumption_secret, time.time() + lifetime)
+
+    def get(self, server):
+        """
+        取出服务器的有效票据
+        :param server: 服务器地址(host, port)
+        :return: (票据, 会话恢复密钥)，没有有效票据时返回None
+        """
+        with self.__lock:
+            entry = self.entries.get(server)
+            if entry is None:
+                return None
+            ticket, resumption_secret, expires = entry
+            if time.time() >= expires:
+                del self.entries[server]
+                return None
+            return ticket, resumption_secret
+
+    def discard(self, server):
+        """
+        删除服务器的票据
+        :param server: 服务器地址(host, port)
+        """
+        with self.__lock:
+            self.entries.pop(server, None)
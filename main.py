@@ -1,22 +1,636 @@
 import os
 import sys
+import json
+import mmap
 import time
+import hashlib
+import queue
+import tempfile
 import threading
+import collections
 import tkinter as tk
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
 from tkinter import messagebox
 
 # 添加当前目录到模块搜索路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from ui.main_window import MainWindow
-from crypto.diffie_hellman import DiffieHellman
+from crypto.diffie_hellman import DiffieHellmanPool, GROUPS, DEFAULT_GROUP_ID
 from crypto.des import DESCipher
+from crypto.compression import Compressor
+from crypto.session_ticket import SessionTicketIssuer, SessionTicketCache, derive_resumption_secret, derive_session_key
 from network.communication import NetworkManager
 
+class CryptoJob:
+    """
+    加密任务，记录任务函数、完成回调和执行进度
+    """
+    def __init__(self, name, func, on_done=None, on_error=None):
+        """
+        初始化任务
+        :param name: 任务名称(用于显示进度)
+        :param func: 任务函数，以任务本身为参数，返回任务结果
+        :param on_done: 成功回调(结果)，在主线程中执行
+        :param on_error: 失败回调(异常)，在主线程中执行
+        """
+        self.name = name
+        self.func = func
+        self.on_done = on_done
+        self.on_error = on_error
+        self.progress = None
+    
+    def set_progress(self, done, total):
+        """
+        更新任务进度(在工作线程中调用)
+        :param done: 已完成的数量
+        :param total: 总数量
+        """
+        self.progress = done / total if total else 1.0
+
+
+class CryptoJobScheduler:
+    """
+    加密任务调度器
+    DES加密/解密任务在线程池中执行，不阻塞Tk主线程；
+    任务结果放入结果队列，由主线程通过root.after定时批量取出并执行回调。
+    同一通道的任务按提交顺序依次执行，不同通道之间并行。
+    通道可以设置排队任务数的上限，以wait=True提交时队列满则阻塞提交方(例如网络接收线程)，
+    使发送方受到TCP流量控制，而不是把数据堆积在内存中。
+    """
+    # 主线程轮询结果队列的间隔(毫秒)
+    POLL_INTERVAL = 50
+    # 每次轮询最多处理的结果数量，避免一次处理过多导致界面卡顿
+    MAX_BATCH = 200
+    
+    def __init__(self, root, max_workers=2, status_callback=None, channel_limits=None):
+        """
+        初始化任务调度器
+        :param root: Tk根窗口，用于root.after
+        :param max_workers: 工作线程数量
+        :param status_callback: 队列状态回调(未完成任务数, 进度描述)，在主线程中执行
+        :param channel_limits: 各通道排队任务数的上限 {通道: 上限}，未列出的通道不限制
+        """
+        self.root = root
+        self.status_callback = status_callback
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+        # 通道中有任务完成(或调度器关闭)时通知等待队列空位的提交方
+        self.space_available = threading.Condition(self.lock)
+        self.channel_limits = dict(channel_limits or {})
+        self.results = queue.Queue()
+        self.channels = {}
+        self.running = []
+        self.pending = 0
+        self.closed = False
+        self.root.after(self.POLL_INTERVAL, self.__poll)
+    
+    def submit(self, channel, name, func, on_done=None, on_error=None, wait=False):
+        """
+        提交任务
+        :param channel: 任务通道，同一通道的任务按提交顺序执行
+        :param name: 任务名称
+        :param func: 任务函数，以任务本身为参数，可调用job.set_progress报告进度
+        :param on_done: 成功回调(结果)，在主线程中执行
+        :param on_error: 失败回调(异常)，在主线程中执行
+        :param wait: 通道排队的任务数达到上限时是否阻塞，直到有任务完成；
+                     主线程不能使用(回调需要主线程处理)，不阻塞时任务总是立即排队
+        :return: 任务对象
+        """
+        job = CryptoJob(name, func, on_done, on_error)
+        limit = self.channel_limits.get(channel)
+        with self.lock:
+            if wait and limit:
+                while not self.closed and len(self.channels.get(channel, ())) >= limit:
+                    self.space_available.wait()
+            if self.closed:
+                return job
+            self.pending += 1
+            jobs = self.channels.setdefault(channel, collections.deque())
+            jobs.append(job)
+            if len(jobs) == 1:
+                self.executor.submit(self.__run_channel, channel)
+        return job
+    
+    def call_in_ui(self, func, *args):
+        """
+        在主线程中执行函数(可在任意线程中调用)
+        :param func: 要执行的函数
+        :param args: 参数
+        """
+        self.results.put((func, args, None))
+    
+    def queue_depth(self):
+        """
+        获取尚未完成的任务数量(包括已执行完但回调尚未处理的任务)
+        :return: 任务数量
+        """
+        with self.lock:
+            return self.pending
+    
+    def shutdown(self):
+        """
+        关闭调度器，丢弃尚未开始的任务
+        """
+        with self.lock:
+            self.closed = True
+            self.channels.clear()
+            self.space_available.notify_all()
+        self.executor.shutdown(wait=False)
+    
+    def __run_channel(self, channel):
+        """
+        在工作线程中执行通道的队首任务，完成后提交该通道的下一个任务
+        :param channel: 任务通道
+        """
+        with self.lock:
+            jobs = self.channels.get(channel)
+            if not jobs:
+                return
+            job = jobs[0]
+            self.running.append(job)
+        
+        try:
+            self.results.put((job.on_done, (job.func(job),), job))
+        except Exception as e:
+            self.results.put((job.on_error, (e,), job))
+        
+        with self.lock:
+            self.running.remove(job)
+            jobs = self.channels.get(channel)
+            if not jobs:
+                return
+            jobs.popleft()
+            self.space_available.notify_all()
+            if jobs:
+                self.executor.submit(self.__run_channel, channel)
+            else:
+                del self.channels[channel]
+    
+    def __progress_text(self):
+        """
+        生成正在执行的任务的进度描述
+        :return: 进度描述
+        """
+        with self.lock:
+            running = list(self.running)
+        parts = []
+        for job in running:
+            if job.progress is None:
+                parts.append(job.name)
+            else:
+                parts.append(f"{job.name} {job.progress:.0%}")
+        return ", ".join(parts)
+    
+    def __poll(self):
+        """
+        主线程定时批量处理结果队列
+        """
+        if self.closed:
+            return
+        
+        for _ in range(self.MAX_BATCH):
+            try:
+                func, args, job = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                with self.lock:
+                    self.pending -= 1
+            if func is None:
+                continue
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"执行任务回调时出错: {str(e)}")
+        
+        if self.status_callback:
+            self.status_callback(self.queue_depth(), self.__progress_text())
+        
+        self.root.after(self.POLL_INTERVAL, self.__poll)
+
+
+class ReceivedFile:
+    """
+    接收文件写入器
+    数据先写入接收目录中的临时文件，按设定的字节间隔fsync，
+    全部写完后原子地重命名为最终文件名，未完成的文件不会以最终文件名出现。
+    指定文件摘要时，临时文件和清单文件使用由摘要决定的固定名称，清单中记录已写入的
+    块序号和每块明文的SHA-256摘要；连接断开后两者都保留，重新连接后只需接收缺少的块(续传)
+    """
+    # 计算整个文件的摘要时每次读取的字节数
+    READ_SIZE = 1024 * 1024
+    
+    def __init__(self, directory, file_name, fsync_interval=0, file_size=0, chunk_size=0, file_hash=None):
+        """
+        创建临时文件，指定文件摘要且已有对应的部分文件时继续使用
+        :param directory: 接收目录
+        :param file_name: 对方提供的文件名
+        :param fsync_interval: 每写入多少字节执行一次fsync，为0时只在完成时执行
+        :param file_size: 文件大小(按块写入时使用)
+        :param chunk_size: 每个数据块的明文字节数(按块写入时使用)
+        :param file_hash: 文件内容的SHA-256摘要(十六进制)，为None时不可续传
+        """
+        self.directory = directory
+        # 只使用文件名部分，防止写到接收目录之外
+        self.file_name = os.path.basename(file_name)
+        self.fsync_interval = fsync_interval
+        self.file_size = file_size
+        self.chunk_size = chunk_size
+        self.file_hash = file_hash
+        self.size = 0
+        self.unsynced_size = 0
+        # 已写入的数据块 {块序号: 明文SHA-256摘要}
+        self.chunks = {}
+        self.manifest = None
+        
+        if file_hash is None:
+            fd, self.temp_path = tempfile.mkstemp(prefix=".", suffix=".part", dir=directory)
+            self.file = os.fdopen(fd, 'w+b')
+            return
+        
+        self.temp_path = os.path.join(directory, f".{file_hash}.part")
+        self.manifest_path = os.path.join(directory, f".{file_hash}.manifest")
+        if self.__load_manifest() and os.path.exists(self.temp_path):
+            self.file = open(self.temp_path, 'r+b')
+            self.manifest = open(self.manifest_path, 'a')
+        else:
+            # 没有可用的部分文件，重新开始
+            self.chunks = {}
+            self.size = 0
+            self.file = open(self.temp_path, 'w+b')
+            self.__write_manifest()
+    
+    def __manifest_header(self):
+        """
+        生成清单的文件信息
+        :return: 文件信息字典
+        """
+        return {'name': self.file_name, 'size': self.file_size, 'chunk_size': self.chunk_size}
+    
+    def __load_manifest(self):
+        """
+        读取清单，文件大小或块大小与本次传输不一致时视为无效
+        :return: 清单是否有效
+        """
+        try:
+            with open(self.manifest_path, 'r') as f:
+                header = json.loads(f.readline())
+                if header.get('size') != self.file_size or header.get('chunk_size') != self.chunk_size:
+                    return False
+                for line in f:
+                    # 忽略写了一半的行
+                    parts = line.split()
+                    if len(parts) != 2 or not line.endswith("\n"):
+                        continue
+                    seq = int(parts[0])
+                    if 0 <= seq < self.chunk_count() and seq not in self.chunks:
+                        self.chunks[seq] = parts[1]
+                        self.size += self.chunk_length(seq)
+        except (OSError, ValueError):
+            return False
+        return True
+    
+    def __write_manifest(self):
+        """
+        按当前已写入的数据块重写清单(先写临时文件再替换)
+        """
+        if self.manifest:
+            self.manifest.close()
+        temp_manifest = self.manifest_path + ".tmp"
+        with open(temp_manifest, 'w') as f:
+            f.write(json.dumps(self.__manifest_header()) + "\n")
+            for seq in sorted(self.chunks):
+                f.write(f"{seq} {self.chunks[seq]}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_manifest, self.manifest_path)
+        self.manifest = open(self.manifest_path, 'a')
+    
+    def chunk_count(self):
+        """
+        获取文件的数据块数量
+        :return: 数据块数量
+        """
+        return -(-self.file_size // self.chunk_size) if self.chunk_size else 0
+    
+    def chunk_length(self, seq):
+        """
+        获取指定数据块的明文字节数
+        :param seq: 块序号
+        :return: 字节数
+        """
+        return min(self.chunk_size, self.file_size - seq * self.chunk_size)
+    
+    def write(self, data):
+        """
+        顺序写入一段明文
+        :param data: 明文数据
+        """
+        self.file.write(data)
+        self.size += len(data)
+        self.__written(len(data))
+    
+    def write_chunk(self, seq, data):
+        """
+        把一个数据块的明文写入其在文件中的位置，并记录到清单
+        :param seq: 块序号
+        :param data: 明文数据
+        """
+        if not 0 <= seq < self.chunk_count() or len(data) != self.chunk_length(seq):
+            raise ValueError("文件数据块无效")
+        if seq in self.chunks:
+            return
+        
+        self.file.seek(seq * self.chunk_size)
+        self.file.write(data)
+        digest = hashlib.sha256(data).hexdigest()
+        self.chunks[seq] = digest
+        if self.manifest:
+            self.manifest.write(f"{seq} {digest}\n")
+        self.size += len(data)
+        self.__written(len(data))
+    
+    def __written(self, size):
+        """
+        累计未同步的字节数，达到间隔时fsync
+        :param size: 本次写入的字节数
+        """
+        self.unsynced_size += size
+        if self.fsync_interval and self.unsynced_size >= self.fsync_interval:
+            self.__sync()
+    
+    def __sync(self):
+        """
+        把已写入的数据(和清单)刷新到磁盘
+        """
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        if self.manifest:
+            self.manifest.flush()
+            os.fsync(self.manifest.fileno())
+        self.unsynced_size = 0
+    
+    def is_complete(self):
+        """
+        判断所有数据块是否都已写入
+        :return: 是否完整
+        """
+        return len(self.chunks) == self.chunk_count()
+    
+    def verify(self):
+        """
+        重新计算清单中各数据块的摘要，丢弃与部分文件中实际内容不一致的块
+        (例如写入清单后、数据刷新到磁盘前断电)
+        """
+        self.file.flush()
+        bad = []
+        for seq, digest in self.chunks.items():
+            self.file.seek(seq * self.chunk_size)
+            if hashlib.sha256(self.file.read(self.chunk_length(seq))).hexdigest() != digest:
+                bad.append(seq)
+        if bad:
+            for seq in bad:
+                del self.chunks[seq]
+                self.size -= self.chunk_length(seq)
+            self.__write_manifest()
+    
+    def content_hash(self):
+        """
+        重新读取临时文件，计算已写入内容的SHA-256摘要
+        清单中的块摘要由接收方自己计算，不能证明内容与发送方的文件一致，提交前须与对方声明的摘要比较
+        :return: 摘要(十六进制)
+        """
+        self.file.flush()
+        self.file.seek(0)
+        digest = hashlib.sha256()
+        for block in iter(lambda: self.file.read(self.READ_SIZE), b''):
+            digest.update(block)
+        return digest.hexdigest()
+    
+    def have_ranges(self):
+        """
+        获取已写入的数据块范围
+        :return: [[起始块序号, 结束块序号), ...]
+        """
+        ranges = []
+        for seq in sorted(self.chunks):
+            if ranges and ranges[-1][1] == seq:
+                ranges[-1][1] = seq + 1
+            else:
+                ranges.append([seq, seq + 1])
+        return ranges
+    
+    def commit(self):
+        """
+        完成写入，把临时文件原子地重命名为最终文件名
+        最终文件名已存在时添加时间戳(及序号)，不覆盖已有文件
+        :return: (实际文件名, 文件路径)
+        """
+        self.__sync()
+        self.file.close()
+        if self.manifest:
+            self.manifest.close()
+        
+        name, ext = os.path.splitext(self.file_name)
+        timestamp = int(time.time())
+        candidates = [self.file_name, f"{name}_{timestamp}{ext}"]
+        index = 1
+        while True:
+            for file_name in candidates:
+                file_path = os.path.join(self.directory, file_name)
+                if self.__claim(file_path):
+                    if self.manifest:
+                        os.remove(self.manifest_path)
+                    return file_name, file_path
+            candidates = [f"{name}_{timestamp}_{index}{ext}"]
+            index += 1
+    
+    def __claim(self, file_path):
+        """
+        尝试把临时文件重命名为指定路径(目标已存在时失败)
+        :param file_path: 目标路径
+        :return: 是否成功
+        """
+        try:
+            # 硬链接在目标已存在时失败，可以原子地避免覆盖
+            os.link(self.temp_path, file_path)
+        except FileExistsError:
+            return False
+        except OSError:
+            # 不支持硬链接的文件系统退回到先检查再重命名
+            if os.path.exists(file_path):
+                return False
+            os.replace(self.temp_path, file_path)
+            return True
+        os.remove(self.temp_path)
+        return True
+    
+    def close(self):
+        """
+        关闭文件但保留部分文件和清单，供之后续传
+        """
+        try:
+            self.__sync()
+        except (OSError, ValueError):
+            pass
+        self.file.close()
+        if self.manifest:
+            self.manifest.close()
+    
+    def abort(self):
+        """
+        中止写入: 可续传时保留部分文件，否则删除临时文件
+        """
+        if self.file_hash is None:
+            self.discard()
+        else:
+            self.close()
+    
+    def discard(self):
+        """
+        放弃写入并删除临时文件(和清单)
+        """
+        self.file.close()
+        paths = [self.temp_path]
+        if self.manifest:
+            self.manifest.close()
+            paths.append(self.manifest_path)
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class ReceivedIndex:
+    """
+    接收目录的内容索引，按SHA-256摘要查找已经接收过的文件
+    每个文件的摘要连同大小和修改时间保存在索引文件中，只有新增或改动过的文件才需要重新计算摘要
+    """
+    # 索引文件名(以"."开头的文件不作为已接收的文件)
+    INDEX_FILE_NAME = ".index.json"
+    # 计算摘要时每次读取的字节数
+    READ_SIZE = 1024 * 1024
+    
+    def __init__(self, directory):
+        """
+        初始化索引并读取索引文件
+        :param directory: 接收目录
+        """
+        self.directory = directory
+        self.index_path = os.path.join(directory, self.INDEX_FILE_NAME)
+        # {文件名: {'size': 大小, 'mtime': 修改时间(纳秒), 'hash': 摘要}}
+        self.entries = {}
+        try:
+            with open(self.index_path, 'r') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+    
+    def refresh(self):
+        """
+        扫描接收目录，为新增或改动过的文件重新计算摘要，移除已删除的文件
+        """
+        changed = False
+        names = set()
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(".") or not entry.is_file():
+                continue
+            names.add(entry.name)
+            stat = entry.stat()
+            cached = self.entries.get(entry.name)
+            if cached and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime_ns:
+                continue
+            self.entries[entry.name] = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+                'hash': self.__hash_file(entry.path)
+            }
+            changed = True
+        
+        for name in list(self.entries):
+            if name not in names:
+                del self.entries[name]
+                changed = True
+        
+        if changed:
+            self.__save()
+    
+    def find(self, file_hash, file_size):
+        """
+        查找内容相同的已接收文件
+        :param file_hash: 文件摘要
+        :param file_size: 文件大小
+        :return: 文件名，没有时为None
+        """
+        self.refresh()
+        for name, entry in self.entries.items():
+            if entry['hash'] == file_hash and entry['size'] == file_size:
+                return name
+        return None
+    
+    def add(self, file_name, file_hash):
+        """
+        把刚接收完成的文件加入索引(摘要已由本端计算，不需要重新计算)
+        :param file_name: 文件名
+        :param file_hash: 本端根据文件内容计算的摘要
+        """
+        stat = os.stat(os.path.join(self.directory, file_name))
+        self.entries[file_name] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': file_hash}
+        self.__save()
+    
+    def __hash_file(self, path):
+        """
+        计算文件的SHA-256摘要
+        :param path: 文件路径
+        :return: 摘要(十六进制)
+        """
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(self.READ_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def __save(self):
+        """
+        保存索引文件(先写临时文件再替换)
+        """
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(temp_path, self.index_path)
+
+
 class Application:
     """
     应用程序主类，连接UI、加密和网络组件
     """
+    # 分块传输文件时每个数据块的明文字节数
+    FILE_CHUNK_SIZE = 64 * 1024
+    # 发送文件时轮流使用的加密输出缓冲区数量
+    SEND_BUFFER_COUNT = 4
+    # 接收的文本消息解压后的最大字节数
+    MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+    # 发送文件前等待对方答复文件请求的最长时间(秒)，超时(如对方不支持续传)则完整发送
+    FILE_REQUEST_TIMEOUT = 10
+    # 客户端发送二进制格式的DH公钥后等待服务器公钥的最长时间(秒)，超时(如尚不支持二进制格式的早期构建的服务器无法解析)则改用十进制文本重新发送
+    DH_KEY_TIMEOUT = 10
+    # 发送文件时每次映射到内存的文件窗口大小(须为FILE_CHUNK_SIZE和mmap.ALLOCATIONGRANULARITY的整数倍)
+    MMAP_WINDOW_SIZE = 1024 * 1024
+    
+    # 接收文件时每写入多少字节fsync一次(0表示只在接收完成时fsync)
+    RECEIVE_FSYNC_INTERVAL = 8 * 1024 * 1024
+    # 接收整块发送的文件时每次解密的密文窗口大小，内存中最多保留这么多明文
+    RECEIVE_WINDOW_SIZE = 1024 * 1024
+    
+    # 加密任务通道: 发送方向和接收方向各自按顺序执行
+    JOB_CHANNEL_SEND = 'send'
+    JOB_CHANNEL_RECV = 'recv'
+    # 接收通道最多排队的任务数，达到后网络接收线程停止读取，由TCP流量控制让发送方放慢
+    # (每个文件数据块一个任务，约为RECV_JOB_LIMIT * FILE_CHUNK_SIZE字节的密文)
+    RECV_JOB_LIMIT = 64
+    
     def __init__(self):
         """
         初始化应用程序
@@ -31,11 +645,41 @@ class Application:
         self.window.on_start_server = self.start_server
         self.window.on_disconnect = self.disconnect
         
+        # 加密任务调度器，DES加密/解密不在UI线程中执行
+        self.jobs = CryptoJobScheduler(self.window.root, status_callback=self.window.update_crypto_jobs,
+                                       channel_limits={self.JOB_CHANNEL_RECV: self.RECV_JOB_LIMIT})
+        
         # 初始化网络、加密组件
         self.network = None
         self.dh = None
         self.des = None
         
+        # 本端使用的DH组(组编号，客户端用它发起密钥交换)，以及可以接受的DH组
+        # 服务器接受客户端提议的组(若在可接受范围内)，否则回复自己的组，由客户端换组重新发送公钥
+        self.dh_group = DEFAULT_GROUP_ID
+        self.dh_groups = tuple(group_id for group_id, group in GROUPS.items() if group.bits >= 2048)
+        
+        # 是否使用短指数私钥(位数按组的安全强度选取，密钥生成和共享密钥计算快数倍)
+        self.dh_short_exponent = True
+        
+        # 本端发送DH公钥使用的格式版本(连接只能解析十进制文本的早期构建的服务器时设为DH_KEY_VERSION_TEXT)
+        self.dh_key_version = NetworkManager.DH_KEY_VERSION_BINARY
+        
+        # 会话恢复: 客户端重新连接时出示服务器签发的票据，双方由票据对应的恢复密钥派生新的会话密钥，不需要模幂运算
+        self.session_resumption = True
+        # 服务器签发票据使用的票据密钥(随机生成；多个服务器实例互相恢复会话时使用相同密钥创建SessionTicketIssuer)
+        self.session_tickets = SessionTicketIssuer()
+        # 客户端保存的各服务器的票据
+        self.session_cache = SessionTicketCache()
+        # 当前会话的恢复密钥，客户端连接的服务器地址，以及客户端正在请求恢复的会话(随机数, 恢复密钥)
+        self.resumption_secret = None
+        self.server_address = None
+        self.resuming = None
+        
+        # 后台预先生成Diffie-Hellman密钥对，建立连接时直接取用 {组编号: DiffieHellmanPool}
+        self.dh_pools = {}
+        self._get_dh_pool(self.dh_group)
+        
         # 加密统计
         self.encryption_times = []
         self.decryption_times = []
@@ -45,12 +689,36 @@ class Application:
         
         # 标记是否已完成密钥交换
         self.key_exchange_completed = False
+        
+        # 希望使用的加密工作模式(由客户端提议，经服务器确认后双方一致)
+        self.cipher_mode = DESCipher.MODE_CTR
+        
+        # 本端可以使用的压缩方法(按优先顺序，经协商后双方一致)和压缩级别(None为默认级别)
+        self.compressions = (Compressor.METHOD_ZLIB, Compressor.METHOD_LZMA)
+        self.compression_level = None
+        self.compressor = None
+        
+        # 批量发送文本消息的等待时间(秒)，为None时不批量发送(需要对方支持批量消息)
+        self.message_batch_window = None
+        
+        # 正在接收的分块文件传输 {传输ID: 传输状态}
+        self.incoming_files = {}
+        
+        # 等待对方答复的文件请求 {文件摘要: Future}
+        self.file_requests = {}
+        
+        # 尚未发送完成的文件路径，重新连接并完成密钥交换后自动续传
+        self.outgoing_files = set()
+        
+        # 接收目录的内容索引(首次收到文件请求时创建，只在接收任务通道中使用)
+        self.received_index = None
     
     def run(self):
         """
         运行应用程序
         """
         self.window.show()
+        self.jobs.shutdown()
     
     def start_server(self, host, port):
         """
@@ -60,7 +728,9 @@ class Application:
         """
         try:
             # 创建网络管理器(服务器模式)
-            self.network = NetworkManager(is_server=True, host=host, port=port)
+            self.network = NetworkManager(is_server=True, host=host, port=port, cipher_mode=self.cipher_mode,
+                                          compressions=self.compressions, batch_window=self.message_batch_window,
+                                          dh_key_version=self.dh_key_version)
             
             # 设置回调函数
             self._setup_network_callbacks()
@@ -70,7 +740,7 @@ class Application:
                 self.window.status_label.config(text="等待客户端连接...")
                 
                 # 初始化Diffie-Hellman
-                self.dh = DiffieHellman(23,5) # prime=23,gen=5
+                self.dh = self._get_dh_pool(self.dh_group).get()
                 
                 # 更新UI状态
                 self.window.set_encryption_status("等待密钥交换...")
@@ -89,7 +759,9 @@ class Application:
         """
         try:
             # 创建网络管理器(客户端模式)
-            self.network = NetworkManager(is_server=False, host=host, port=port)
+            self.network = NetworkManager(is_server=False, host=host, port=port, cipher_mode=self.cipher_mode,
+                                          compressions=self.compressions, batch_window=self.message_batch_window,
+                                          dh_key_version=self.dh_key_version)
             
             # 设置回调函数
             self._setup_network_callbacks()
@@ -97,10 +769,25 @@ class Application:
             # 启动网络服务
             if self.network.start():
                 # 初始化Diffie-Hellman
-                self.dh = DiffieHellman(23,5)
+                self.dh = self._get_dh_pool(self.dh_group).get()
+                
+                # 先提议工作模式和压缩方法，再发送公钥
+                self.network.send_cipher_mode_proposal()
+                self.network.send_compression_proposal()
+                
+                # 有该服务器的有效票据时先请求恢复会话，服务器不接受(或不支持)时按随后的公钥完成密钥交换
+                self.server_address = (host, port)
+                self.resuming = None
+                ticket = self.session_cache.get(self.server_address) if self.session_resumption else None
+                if ticket:
+                    nonce = os.urandom(NetworkManager.SESSION_NONCE_SIZE)
+                    self.resuming = (nonce, ticket[1])
+                    self.network.send_session_resume(nonce, ticket[0])
                 
-                # 发送公钥
-                self.network.send_dh_public_key(self.dh.get_public_key())
+                self.network.send_dh_public_key(self.dh.get_public_key(), self.dh.group_id, self.dh.key_size)
+                if self.network.dh_key_version != NetworkManager.DH_KEY_VERSION_TEXT:
+                    network = self.network
+                    self.window.root.after(self.DH_KEY_TIMEOUT * 1000, lambda: self.__fallback_dh_key_version(network))
                 
                 # 更新UI状态
                 self.window.set_encryption_status("正在进行密钥交换...")
@@ -111,6 +798,20 @@ class Application:
             self.window.connect_button.config(state=tk.NORMAL)
             self.window.show_error("错误", f"连接服务器时出错: {str(e)}")
     
+    def __fallback_dh_key_version(self, network):
+        """
+        发送公钥后超时仍未收到服务器的公钥时，改用十进制文本格式重新发送公钥
+        本系列中尚不支持二进制格式的早期构建的服务器无法解析二进制格式，也不会回复；
+        最初使用p=23玩具组的版本不接受任何预定义组，改用文本也无法互通
+        :param network: 发送公钥时使用的网络管理器(期间已断开或重新连接时不处理)
+        """
+        if network is not self.network or self.dh is None or self.key_exchange_completed:
+            return
+        if network.peer_dh_key_version is not None:
+            return
+        network.preferred_dh_key_version = network.dh_key_version = NetworkManager.DH_KEY_VERSION_TEXT
+        network.send_dh_public_key(self.dh.get_public_key(), self.dh.group_id, self.dh.key_size)
+    
     def _setup_network_callbacks(self):
         """
         设置网络回调函数
@@ -129,71 +830,222 @@ class Application:
         
         # 文件请求回调
         self.network.set_file_request_callback(self._on_file_request_received)
+        
+        # 工作模式协商回调
+        self.network.set_cipher_mode_callback(self._on_cipher_mode_negotiated)
+        
+        # 分块文件传输回调
+        self.network.set_file_start_callback(self._on_file_start_received)
+        self.network.set_file_chunk_callback(self._on_file_chunk_received)
+        self.network.set_file_end_callback(self._on_file_end_received)
+        self.network.set_file_response_callback(self._on_file_response_received)
+        
+        # 会话恢复回调
+        self.network.set_session_ticket_callback(self._on_session_ticket_received)
+        self.network.set_session_resume_callback(self._on_session_resume_received)
     
     def _on_connection_status_changed(self, connected):
         """
-        连接状态变化回调
+        连接状态变化回调(在网络线程中调用)
         :param connected: 是否已连接
         """
-        self.window.set_connected(connected)
-        
         if not connected:
+            # 放弃未完成的文件接收(排在已提交的接收任务之后)
+            self.jobs.submit(self.JOB_CHANNEL_RECV, "放弃文件接收", lambda job: self._abort_incoming_files())
+            
             # 重置加密状态
             self.des = None
+            self.compressor = None
             self.dh = None
             self.other_public_key = None
+            self.resumption_secret = None
+            self.resuming = None
             self.key_exchange_completed = False
-            
-            # 更新UI
+        
+        self.jobs.call_in_ui(self.__show_connection_status, connected)
+    
+    def __show_connection_status(self, connected):
+        """
+        在UI中显示连接状态
+        :param connected: 是否已连接
+        """
+        self.window.set_connected(connected)
+        
+        if not connected:
             self.window.set_key_exchange_status(False)
             self.window.set_encryption_status("")
     
-    def _on_dh_key_received(self, public_key):
+    def _on_cipher_mode_negotiated(self, cipher_mode):
+        """
+        工作模式协商完成
+        :param cipher_mode: 双方一致的工作模式
+        """
+        if self.des:
+            self.des.mode = cipher_mode
+    
+    def _get_dh_pool(self, group_id):
+        """
+        获取一个DH组的密钥对池(首次使用时创建)
+        :param group_id: DH组编号
+        :return: DiffieHellmanPool对象
+        """
+        pool = self.dh_pools.get(group_id)
+        if pool is None:
+            pool = self.dh_pools[group_id] = DiffieHellmanPool(group=group_id, short_exponent=self.dh_short_exponent)
+        return pool
+    
+    def _on_dh_key_received(self, public_key, group_id):
         """
-        接收到Diffie-Hellman公钥
+        接收到Diffie-Hellman公钥(在网络线程中调用)
         :param public_key: 对方的公钥
+        :param group_id: 对方公钥所属的DH组编号(对方未发送时为None，视为与本端相同)
         """
+        # 会话已经恢复时忽略客户端随恢复请求一起发送的公钥
+        if self.key_exchange_completed:
+            return
+        
+        if self.dh is None:
+            self.dh = self._get_dh_pool(self.dh_group).get()
+        
+        # 双方的DH组不一致
+        if group_id is not None and group_id != self.dh.group_id:
+            if group_id not in self.dh_groups:
+                if self.network.is_server:
+                    # 不接受客户端的组: 回复本端的公钥和组，由客户端换组后重新发送
+                    self.network.send_dh_public_key(self.dh.get_public_key(), self.dh.group_id, self.dh.key_size)
+                else:
+                    self.jobs.call_in_ui(self.window.show_error, "错误", f"服务器使用的DH组({group_id})不被接受")
+                return
+            
+            # 改用对方的组
+            self.dh = self._get_dh_pool(group_id).get()
+            if not self.network.is_server:
+                # 客户端换组后重新发送公钥，等待服务器回复
+                self.network.send_dh_public_key(self.dh.get_public_key(), self.dh.group_id, self.dh.key_size)
+                return
+        
         self.other_public_key = public_key
         
         # 如果是服务器端，收到公钥后发送自己的公钥
         if self.network.is_server:
-            self.network.send_dh_public_key(self.dh.get_public_key())
+            self.network.send_dh_public_key(self.dh.get_public_key(), self.dh.group_id, self.dh.key_size)
         
-        # 生成共享密钥
-        shared_secret = self.dh.generate_shared_secret(public_key)
+        # 生成共享密钥(对方使用十进制文本格式时，密钥派生也与早期构建一致)
+        legacy_kdf = self.network.dh_key_version == NetworkManager.DH_KEY_VERSION_TEXT
+        shared_secret = self.dh.generate_shared_secret(public_key, legacy_kdf)
         
-        # 创建DES加密器
-        self.des = DESCipher(shared_secret)
+        self.__establish_session(shared_secret, derive_resumption_secret(self.dh.master_secret))
+    
+    def _on_session_resume_received(self, nonce, ticket):
+        """
+        接收到恢复会话消息(在网络线程中调用)
+        服务器验证客户端出示的票据，有效时回复自己的随机数，无效时忽略(随后按客户端的公钥完成密钥交换)；
+        客户端收到服务器的随机数说明票据已被接受。双方由票据对应的恢复密钥和双方的随机数派生新的会话密钥
+        :param nonce: 对方的随机数
+        :param ticket: 客户端出示的票据(服务器的回复中为空)
+        """
+        if self.key_exchange_completed:
+            return
+        
+        if self.network.is_server:
+            resumption_secret = self.session_tickets.open(ticket) if self.session_resumption else None
+            if resumption_secret is None:
+                return
+            client_nonce = nonce
+            server_nonce = os.urandom(NetworkManager.SESSION_NONCE_SIZE)
+            self.network.send_session_resume(server_nonce)
+        else:
+            if self.resuming is None:
+                return
+            client_nonce, resumption_secret = self.resuming
+            server_nonce = nonce
+        
+        session_key = derive_session_key(resumption_secret, client_nonce, server_nonce)
+        self.__establish_session(session_key, derive_resumption_secret(resumption_secret, client_nonce, server_nonce),
+                                 resumed=True)
+    
+    def _on_session_ticket_received(self, ticket, lifetime):
+        """
+        接收到服务器签发的会话票据(在网络线程中调用)，保存后下次连接该服务器时出示
+        :param ticket: 票据
+        :param lifetime: 票据有效期(秒)
+        """
+        if self.network.is_server or self.resumption_secret is None or not self.session_resumption:
+            return
+        self.session_cache.put(self.server_address, ticket, self.resumption_secret, lifetime)
+    
+    def __establish_session(self, session_key, resumption_secret, resumed=False):
+        """
+        密钥交换或会话恢复完成后建立加密会话(在网络线程中调用)
+        :param session_key: DES密钥
+        :param resumption_secret: 本次会话的恢复密钥，服务器据此签发新的票据
+        :param resumed: 是否为恢复的会话
+        """
+        # 创建DES加密器，使用协商一致的工作模式
+        self.des = DESCipher(session_key, mode=self.network.cipher_mode)
+        
+        # 加密前使用协商一致的压缩方法
+        self.compressor = Compressor(self.network.compression, self.compression_level)
         
         # 标记密钥交换完成
+        self.resumption_secret = resumption_secret
+        self.resuming = None
         self.key_exchange_completed = True
         
+        # 服务器每次建立会话后签发新的票据(对方不支持会话恢复时忽略该消息)
+        if self.network.is_server and self.session_resumption:
+            self.network.send_session_ticket(self.session_tickets.issue(resumption_secret), self.session_tickets.lifetime)
+        
         # 更新UI
+        self.jobs.call_in_ui(self.__show_key_exchange_completed, self.des.mode, self.compressor.method, session_key, resumed)
+        
+        # 续传断开连接前未发送完成的文件
+        for file_path in list(self.outgoing_files):
+            self.__submit_file_send(file_path)
+    
+    def __show_key_exchange_completed(self, mode, compression, shared_secret, resumed=False):
+        """
+        在UI中显示密钥交换完成
+        :param mode: 工作模式
+        :param compression: 压缩方法
+        :param shared_secret: 共享密钥
+        :param resumed: 是否为恢复的会话
+        """
+        title = "会话已恢复" if resumed else "密钥交换完成"
         self.window.set_key_exchange_status(True)
-        self.window.set_encryption_status("密钥交换完成")
+        if compression == Compressor.METHOD_NONE:
+            self.window.set_encryption_status(f"{title} ({mode.upper()})")
+        else:
+            self.window.set_encryption_status(f"{title} ({mode.upper()}, {compression})")
         
         # 显示共享密钥信息，但不显示系统消息
-        self.window.update_crypto_display("密钥交换完成", shared_secret, b"", is_encrypting=False, show_system_message=False)
+        self.window.update_crypto_display(title, shared_secret, b"", is_encrypting=False, show_system_message=False)
     
     def _on_encrypted_message_received(self, encrypted_data):
         """
-        接收到加密消息
+        接收到加密消息(在网络线程中调用)，解密任务交给任务调度器
         :param encrypted_data: 加密的消息数据
         """
-        if not self.key_exchange_completed or not self.des:
-            self.window.show_error("错误", "收到消息，但密钥交换尚未完成")
+        des = self.des
+        compressor = self.compressor
+        if not self.key_exchange_completed or not des:
+            self.jobs.call_in_ui(self.window.show_error, "错误", "收到消息，但密钥交换尚未完成")
             return
         
-        try:
-            # 解密消息
-            decrypted_data, decryption_time = self.des.decrypt(encrypted_data)
-            
+        def decrypt_message(job):
+            decrypted_data, decryption_time = des.decrypt(encrypted_data)
+            if decrypted_data is not None and compressor.method != Compressor.METHOD_NONE:
+                # 先解密再解压
+                decrypted_data = Compressor.decompress(decrypted_data, self.MAX_MESSAGE_SIZE)
             if decrypted_data is None:
+                return None
+            return decrypted_data.decode('utf-8'), decryption_time
+        
+        def on_done(result):
+            if result is None:
                 self.window.show_error("错误", "消息解密失败")
                 return
-            
-            # 解码消息
-            message = decrypted_data.decode('utf-8')
+            message, decryption_time = result
             
             # 添加到消息记录
             self.window.add_message(message, is_sent=False)
@@ -203,49 +1055,56 @@ class Application:
             self._update_decryption_rate()
             
             # 更新加密/解密过程显示
-            self.window.update_crypto_display(message, self.des.key, encrypted_data, is_encrypting=False)
-            
-        except Exception as e:
-            self.window.show_error("错误", f"处理接收到的消息时出错: {str(e)}")
+            self.window.update_crypto_display(message, des.key, bytes(encrypted_data), is_encrypting=False)
+        
+        self.jobs.submit(self.JOB_CHANNEL_RECV, "解密消息", decrypt_message, on_done,
+                         lambda e: self.window.show_error("错误", f"处理接收到的消息时出错: {str(e)}"))
     
     def _on_encrypted_file_received(self, file_info, encrypted_data):
         """
-        接收到加密文件
+        接收到加密文件(在网络线程中调用)，解密和保存交给任务调度器
         :param file_info: 文件信息
         :param encrypted_data: 加密的文件数据
         """
-        if not self.key_exchange_completed or not self.des:
-            self.window.show_error("错误", "收到文件，但密钥交换尚未完成")
+        des = self.des
+        if not self.key_exchange_completed or not des:
+            self.jobs.call_in_ui(self.window.show_error, "错误", "收到文件，但密钥交换尚未完成")
             return
         
-        try:
-            # 解密文件数据
-            decrypted_data, decryption_time = self.des.decrypt(encrypted_data)
+        def decrypt_file(job):
+            mode = file_info.get('mode') or des.mode
+            # 使用发送方在文件信息中标明的工作模式，按窗口流式解密并写入临时文件，
+            # CBC模式的大文件每个窗口在进程池中并行解密
+            max_workers = None
+            if mode == DESCipher.MODE_CBC and len(encrypted_data) >= des.PARALLEL_MIN_SIZE:
+                max_workers = os.cpu_count() or 1
+            decryptor = des.decryptor(mode=mode, max_workers=max_workers)
+            received = self._create_received_file(file_info['name'])
+            try:
+                view = memoryview(encrypted_data)
+                for offset in range(0, len(view), self.RECEIVE_WINDOW_SIZE):
+                    received.write(decryptor.update(view[offset:offset + self.RECEIVE_WINDOW_SIZE]))
+                    job.set_progress(min(offset + self.RECEIVE_WINDOW_SIZE, len(view)), len(view))
+                received.write(decryptor.finalize())
+            except ValueError:
+                # 密文不完整或填充无效
+                received.discard()
+                return None
+            except Exception:
+                received.discard()
+                raise
             
-            if decrypted_data is None:
+            file_name, file_path = received.commit()
+            return file_name, file_path, received.size, decryptor.elapsed
+        
+        def on_done(result):
+            if result is None:
                 self.window.show_error("错误", "文件解密失败")
                 return
-            
-            # 创建接收文件目录
-            received_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "received")
-            os.makedirs(received_dir, exist_ok=True)
-            
-            # 保存文件
-            file_name = file_info['name']
-            file_path = os.path.join(received_dir, file_name)
-            
-            # 如果文件已存在，添加时间戳
-            if os.path.exists(file_path):
-                name, ext = os.path.splitext(file_name)
-                timestamp = int(time.time())
-                file_name = f"{name}_{timestamp}{ext}"
-                file_path = os.path.join(received_dir, file_name)
-            
-            with open(file_path, 'wb') as f:
-                f.write(decrypted_data)
+            file_name, file_path, file_size, decryption_time = result
             
             # 更新UI
-            self.window.add_file_transfer(file_name, len(decrypted_data), is_sent=False)
+            self.window.add_file_transfer(file_name, file_size, is_sent=False)
             self.window.show_info("文件接收", f"文件 {file_name} 已保存到 {file_path}")
             
             # 记录解密时间
@@ -253,22 +1112,255 @@ class Application:
             self._update_decryption_rate()
             
             # 更新加密/解密过程显示
-            self.window.update_crypto_display(f"文件: {file_name}", self.des.key, encrypted_data, is_encrypting=False)
+            self.window.update_crypto_display(f"文件: {file_name}", des.key, bytes(encrypted_data), is_encrypting=False)
+        
+        self.jobs.submit(self.JOB_CHANNEL_RECV, f"接收文件 {file_info['name']}", decrypt_file, on_done,
+                         lambda e: self.window.show_error("错误", f"处理接收到的文件时出错: {str(e)}"))
+    
+    def _get_received_dir(self):
+        """
+        获取接收文件目录(不存在时创建)
+        :return: 目录路径
+        """
+        received_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "received")
+        os.makedirs(received_dir, exist_ok=True)
+        return received_dir
+    
+    def _get_received_index(self):
+        """
+        获取接收目录的内容索引
+        :return: ReceivedIndex对象
+        """
+        if self.received_index is None:
+            self.received_index = ReceivedIndex(self._get_received_dir())
+        return self.received_index
+    
+    def _create_received_file(self, file_name, file_size=0, chunk_size=0, file_hash=None):
+        """
+        在接收目录中为接收的文件创建临时文件
+        :param file_name: 对方提供的文件名
+        :param file_size: 文件大小(按块接收时使用)
+        :param chunk_size: 每个数据块的明文字节数(按块接收时使用)
+        :param file_hash: 文件内容摘要，指定时使用可续传的部分文件
+        :return: ReceivedFile对象
+        """
+        return ReceivedFile(self._get_received_dir(), file_name, self.RECEIVE_FSYNC_INTERVAL, file_size, chunk_size, file_hash)
+    
+    def __valid_file_hash(self, file_hash):
+        """
+        检查对方提供的文件摘要是否为SHA-256十六进制串(摘要会用于部分文件的文件名)
+        :param file_hash: 文件摘要
+        :return: 是否有效
+        """
+        return (isinstance(file_hash, str) and len(file_hash) == 64
+                and all(c in "0123456789abcdef" for c in file_hash))
+    
+    def _on_file_start_received(self, transfer_id, file_info):
+        """
+        分块文件传输开始(在网络线程中调用)
+        :param transfer_id: 传输ID
+        :param file_info: 文件信息
+        """
+        des = self.des
+        if not self.key_exchange_completed or not des:
+            self.jobs.call_in_ui(self.window.show_error, "错误", "收到文件，但密钥交换尚未完成")
+            return
+        
+        def open_file(job):
+            # 带有效文件摘要的传输保存为可续传的部分文件，已有的数据块不需要重新接收
+            file_hash = file_info.get('hash')
+            received = self._create_received_file(file_info['name'], file_info['size'], file_info['chunk_size'],
+                                                  file_hash if self.__valid_file_hash(file_hash) else None)
+            self.incoming_files[transfer_id] = {
+                'info': file_info,
+                'des': des,
+                'file': received,
+                'encrypted_size': 0,
+                'decryption_time': 0.0,
+                'last_chunk': b''
+            }
+        
+        self.jobs.submit(self.JOB_CHANNEL_RECV, f"接收文件 {file_info['name']}", open_file, None,
+                         lambda e: self.window.show_error("错误", f"处理接收到的文件时出错: {str(e)}"))
+    
+    def _on_file_chunk_received(self, transfer_id, seq, encrypted_chunk):
+        """
+        接收到分块文件传输的数据块(在网络线程中调用)，解密和写入磁盘交给任务调度器
+        接收通道排满时阻塞网络线程，不再读取套接字，发送方因TCP流量控制而等待
+        :param transfer_id: 传输ID
+        :param seq: 块序号
+        :param encrypted_chunk: 加密的数据块
+        """
+        self.jobs.submit(self.JOB_CHANNEL_RECV, "接收文件", lambda job: self.__write_file_chunk(job, transfer_id, seq, encrypted_chunk),
+                         wait=True)
+    
+    def __write_file_chunk(self, job, transfer_id, seq, encrypted_chunk):
+        """
+        解密数据块并写入磁盘(在工作线程中执行)
+        :param job: 当前任务
+        :param transfer_id: 传输ID
+        :param seq: 块序号
+        :param encrypted_chunk: 加密的数据块
+        """
+        transfer = self.incoming_files.get(transfer_id)
+        if transfer is None:
+            return
+        
+        job.name = f"接收文件 {transfer['file'].file_name}"
+        try:
+            decrypted_chunk, decryption_time = transfer['des'].decrypt(encrypted_chunk, mode=transfer['info'].get('mode'))
+            if decrypted_chunk is not None and transfer['info'].get('compression', Compressor.METHOD_NONE) != Compressor.METHOD_NONE:
+                decrypted_chunk = Compressor.decompress(decrypted_chunk, transfer['file'].chunk_size)
+            if decrypted_chunk is None:
+                self._abort_incoming_file(transfer_id, "文件解密失败")
+                return
             
+            # 续传时数据块不一定连续，按块序号写入对应位置
+            transfer['file'].write_chunk(seq, decrypted_chunk)
+            transfer['encrypted_size'] += len(encrypted_chunk)
+            transfer['decryption_time'] += decryption_time
+            transfer['last_chunk'] = bytes(encrypted_chunk)
+            job.set_progress(transfer['file'].size, transfer['info']['size'])
         except Exception as e:
-            self.window.show_error("错误", f"处理接收到的文件时出错: {str(e)}")
+            self._abort_incoming_file(transfer_id, f"处理接收到的文件时出错: {str(e)}")
+    
+    def _on_file_end_received(self, transfer_id, end_info):
+        """
+        分块文件传输结束(在网络线程中调用)
+        :param transfer_id: 传输ID
+        :param end_info: 结束信息
+        """
+        self.jobs.submit(self.JOB_CHANNEL_RECV, "接收文件", lambda job: self.__finish_incoming_file(transfer_id, end_info),
+                         self.__show_incoming_file,
+                         lambda e: self.window.show_error("错误", f"处理接收到的文件时出错: {str(e)}"))
+    
+    def __finish_incoming_file(self, transfer_id, end_info):
+        """
+        校验并关闭接收完成的文件(在工作线程中执行)
+        :param transfer_id: 传输ID
+        :param end_info: 结束信息
+        :return: 传输状态，接收失败时为None
+        """
+        transfer = self.incoming_files.get(transfer_id)
+        if transfer is None:
+            return None
+        
+        received = transfer['file']
+        if end_info['chunks'] != received.chunk_count() or not received.is_complete():
+            self._abort_incoming_file(transfer_id, "文件接收不完整")
+            return None
+        
+        # CTR模式没有完整性校验，续传时部分文件也可能来自错误的数据，提交前核对整个文件的摘要
+        content_hash = received.content_hash()
+        if received.file_hash and content_hash != received.file_hash:
+            del self.incoming_files[transfer_id]
+            received.discard()
+            self.jobs.call_in_ui(self.window.show_error, "错误", f"文件 {received.file_name} 的内容与摘要不一致，已丢弃")
+            return None
+        
+        del self.incoming_files[transfer_id]
+        try:
+            transfer['name'], transfer['path'] = received.commit()
+        except Exception:
+            received.abort()
+            raise
+        # 索引中只记录本端计算的摘要，对方声明的摘要不可信
+        self._get_received_index().add(transfer['name'], content_hash)
+        return transfer
+    
+    def __show_incoming_file(self, transfer):
+        """
+        在UI中显示接收完成的文件
+        :param transfer: 传输状态
+        """
+        if transfer is None:
+            return
+        file_name = transfer['name']
+        
+        # 更新UI
+        self.window.add_file_transfer(file_name, transfer['file'].size, is_sent=False)
+        self.window.show_info("文件接收", f"文件 {file_name} 已保存到 {transfer['path']}")
+        
+        # 记录解密时间
+        self.decryption_times.append((transfer['encrypted_size'], transfer['decryption_time']))
+        self._update_decryption_rate()
+        
+        # 更新加密/解密过程显示
+        self.window.update_crypto_display(f"文件: {file_name}", transfer['des'].key, transfer['last_chunk'], is_encrypting=False)
+    
+    def _abort_incoming_file(self, transfer_id, message=None):
+        """
+        放弃一个未完成的文件接收(在接收任务通道中执行)
+        可续传的传输保留部分文件和清单，否则删除已写入的部分
+        :param transfer_id: 传输ID
+        :param message: 要显示的错误信息，为None时不显示
+        """
+        transfer = self.incoming_files.pop(transfer_id, None)
+        if transfer is None:
+            return
+        transfer['file'].abort()
+        if message:
+            self.jobs.call_in_ui(self.window.show_error, "错误", message)
+    
+    def _abort_incoming_files(self):
+        """
+        放弃所有未完成的文件接收
+        """
+        for transfer_id in list(self.incoming_files):
+            self._abort_incoming_file(transfer_id)
     
     def _on_file_request_received(self, file_info):
         """
-        接收到文件请求
+        接收到文件请求(在网络线程中调用)
+        检查接收目录中是否已有相同内容的文件或该文件的部分数据，答复对方需要发送哪些数据块
         :param file_info: 文件信息
         """
-        # 未实现，可用于文件请求确认功能
-        pass
+        network = self.network
+        self.jobs.submit(self.JOB_CHANNEL_RECV, f"检查文件 {file_info.get('name')}",
+                         lambda job: self.__answer_file_request(network, file_info))
+    
+    def __answer_file_request(self, network, file_info):
+        """
+        查找相同内容的文件、校验已有的部分文件并答复文件请求(在工作线程中执行)
+        :param network: 收到请求的网络管理器
+        :param file_info: 文件信息
+        """
+        file_hash = file_info.get('hash')
+        if not self.__valid_file_hash(file_hash):
+            network.send_file_response(file_hash, network.FILE_STATUS_SEND)
+            return
+        
+        # 已有相同内容的文件时不需要传输
+        existing_name = self._get_received_index().find(file_hash, file_info['size'])
+        if existing_name is not None:
+            network.send_file_response(file_hash, network.FILE_STATUS_HAVE)
+            self.jobs.call_in_ui(self.window.add_system_message,
+                                 f"已有与 {os.path.basename(file_info['name'])} 内容相同的文件 {existing_name}，对方无需发送")
+            return
+        
+        received = self._create_received_file(file_info['name'], file_info['size'], file_info['chunk_size'], file_hash)
+        received.verify()
+        have = received.have_ranges()
+        if have:
+            received.close()
+        else:
+            received.discard()
+        
+        status = network.FILE_STATUS_RESUME if have else network.FILE_STATUS_SEND
+        network.send_file_response(file_hash, status, have)
+    
+    def _on_file_response_received(self, response):
+        """
+        接收到对方对文件请求的答复(在网络线程中调用)
+        :param response: 答复内容
+        """
+        future = self.file_requests.get(response.get('hash'))
+        if future is not None and not future.done():
+            future.set_result(response)
     
     def send_message(self, message):
         """
-        发送消息
+        发送消息，加密和发送交给任务调度器
         :param message: 消息内容
         """
         if not self.network or not self.network.connected:
@@ -279,33 +1371,48 @@ class Application:
             self.window.show_error("错误", "密钥交换尚未完成，无法发送加密消息")
             return
         
-        try:
-            # 编码消息
-            message_bytes = message.encode('utf-8')
+        des = self.des
+        compressor = self.compressor
+        network = self.network
+        
+        # 编码消息
+        message_bytes = message.encode('utf-8')
+        
+        def encrypt_message(job):
+            # 先压缩再加密(协商了压缩方法时)
+            data = message_bytes
+            if compressor.method != Compressor.METHOD_NONE:
+                data = compressor.compress(data)
             
             # 加密消息
-            encrypted_data, encryption_time = self.des.encrypt(message_bytes)
+            encrypted_data, encryption_time = des.encrypt(data)
             
             # 发送加密消息
-            if self.network.send_encrypted_message(encrypted_data):
-                # 更新UI
-                self.window.add_message(message, is_sent=True)
-                
-                # 记录加密时间
-                self.encryption_times.append((len(message_bytes), encryption_time))
-                self._update_encryption_rate()
-                
-                # 更新加密/解密过程显示
-                self.window.update_crypto_display(message, self.des.key, encrypted_data, is_encrypting=True)
-            else:
+            accepted = self._send_accepted(network.send_encrypted_message(encrypted_data))
+            return accepted, encrypted_data, encryption_time
+        
+        def on_done(result):
+            accepted, encrypted_data, encryption_time = result
+            if not accepted:
                 self.window.show_error("错误", "发送消息失败")
-                
-        except Exception as e:
-            self.window.show_error("错误", f"发送消息时出错: {str(e)}")
+                return
+            
+            # 更新UI
+            self.window.add_message(message, is_sent=True)
+            
+            # 记录加密时间
+            self.encryption_times.append((len(message_bytes), encryption_time))
+            self._update_encryption_rate()
+            
+            # 更新加密/解密过程显示
+            self.window.update_crypto_display(message, des.key, encrypted_data, is_encrypting=True)
+        
+        self.jobs.submit(self.JOB_CHANNEL_SEND, "加密消息", encrypt_message, on_done,
+                         lambda e: self.window.show_error("错误", f"发送消息时出错: {str(e)}"))
     
     def send_file(self, file_path):
         """
-        发送文件
+        发送文件，逐块加密和发送交给任务调度器
         :param file_path: 文件路径
         """
         if not self.network or not self.network.connected:
@@ -316,31 +1423,195 @@ class Application:
             self.window.show_error("错误", "密钥交换尚未完成，无法发送加密文件")
             return
         
-        try:
-            # 读取文件
+        self.outgoing_files.add(file_path)
+        self.__submit_file_send(file_path)
+    
+    def __submit_file_send(self, file_path):
+        """
+        提交发送文件的任务: 文件请求 -> 开始消息 -> 逐块加密发送对方缺少的块 -> 结束消息
+        :param file_path: 文件路径
+        """
+        des = self.des
+        compressor = self.compressor
+        network = self.network
+        file_name = os.path.basename(file_path)
+        
+        def encrypt_file(job):
             with open(file_path, 'rb') as f:
-                file_data = f.read()
-            
-            # 加密文件
-            encrypted_data, encryption_time = self.des.encrypt(file_data)
-            
-            # 发送加密文件
-            if self.network.send_encrypted_file(file_path, encrypted_data):
-                # 更新UI
-                file_name = os.path.basename(file_path)
-                self.window.add_file_transfer(file_name, len(file_data), is_sent=True)
+                file_size = os.fstat(f.fileno()).st_size
                 
-                # 记录加密时间
-                self.encryption_times.append((len(file_data), encryption_time))
-                self._update_encryption_rate()
+                # 先询问对方是否已有相同内容的文件，或已有哪些数据块(断线续传)
+                job.name = f"计算摘要 {file_name}"
+                file_hash = self.__hash_file(job, f, file_size)
+                job.name = f"发送文件 {file_name}"
+                response = self.__request_file(network, file_path, file_hash)
+                if response is None:
+                    return None
+                status, have = response
+                if status == network.FILE_STATUS_HAVE:
+                    return status, file_size, 0, 0.0, b''
                 
-                # 更新加密/解密过程显示
-                self.window.update_crypto_display(f"文件: {file_name}", self.des.key, encrypted_data, is_encrypting=True)
-            else:
-                self.window.show_error("错误", "发送文件失败")
+                # 已经压缩过的文件(按扩展名和第一段数据判断)不再压缩
+                file_compressor = None
+                if compressor.should_compress(f.read(Compressor.SAMPLE_SIZE), file_name):
+                    file_compressor = compressor
+                f.seek(0)
                 
-        except Exception as e:
+                transfer_id = network.new_transfer_id()
+                if not self._send_accepted(network.send_file_start(transfer_id, file_path, file_size, self.FILE_CHUNK_SIZE, file_hash,
+                                                                   file_compressor.method if file_compressor else None)):
+                    return None
+                
+                result = self.__send_file_chunks(job, des, network, transfer_id, f, file_size, have, file_compressor)
+            if result is None:
+                return None
+            chunk_count, encryption_time, encrypted_chunk, sent_size = result
+            
+            # 发送结束消息
+            if not self._send_accepted(network.send_file_end(transfer_id, chunk_count)):
+                return None
+            return status, file_size, sent_size, encryption_time, encrypted_chunk
+        
+        def on_done(result):
+            if result is None:
+                self.window.show_error("错误", "发送文件失败，重新连接后将继续发送缺少的部分")
+                return
+            self.outgoing_files.discard(file_path)
+            status, file_size, sent_size, encryption_time, encrypted_chunk = result
+            if status == network.FILE_STATUS_HAVE:
+                self.window.add_system_message(f"对方已有与 {file_name} 内容相同的文件，跳过发送")
+                return
+            
+            # 更新UI
+            self.window.add_file_transfer(file_name, file_size, is_sent=True)
+            
+            # 记录加密时间
+            self.encryption_times.append((sent_size, encryption_time))
+            self._update_encryption_rate()
+            
+            # 更新加密/解密过程显示
+            self.window.update_crypto_display(f"文件: {file_name}", des.key, encrypted_chunk, is_encrypting=True)
+        
+        def on_error(e):
+            self.outgoing_files.discard(file_path)
             self.window.show_error("错误", f"发送文件时出错: {str(e)}")
+        
+        self.jobs.submit(self.JOB_CHANNEL_SEND, f"发送文件 {file_name}", encrypt_file, on_done, on_error)
+    
+    def __hash_file(self, job, f, file_size):
+        """
+        计算文件内容的SHA-256摘要(在工作线程中执行)
+        :param job: 当前任务
+        :param f: 已打开的文件
+        :param file_size: 文件大小
+        :return: 摘要(十六进制)
+        """
+        digest = hashlib.sha256()
+        buffer = bytearray(self.MMAP_WINDOW_SIZE)
+        view = memoryview(buffer)
+        done = 0
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+            done += size
+            job.set_progress(done, file_size)
+        f.seek(0)
+        return digest.hexdigest()
+    
+    def __request_file(self, network, file_path, file_hash):
+        """
+        发送文件请求并等待对方答复(在工作线程中执行)
+        :param network: 网络管理器
+        :param file_path: 文件路径
+        :param file_hash: 文件摘要
+        :return: (答复状态, 对方已有的块序号集合)，发送失败时为None
+        """
+        future = Future()
+        self.file_requests[file_hash] = future
+        try:
+            if not self._send_accepted(network.send_file_request(file_path, file_hash, self.FILE_CHUNK_SIZE)):
+                return None
+            try:
+                response = future.result(timeout=self.FILE_REQUEST_TIMEOUT)
+            except TimeoutError:
+                # 对方未答复(例如不支持文件请求)，完整发送
+                return network.FILE_STATUS_SEND, set()
+        finally:
+            self.file_requests.pop(file_hash, None)
+        
+        status = response.get('status')
+        have = set()
+        if status == network.FILE_STATUS_RESUME:
+            for start, end in response.get('have', []):
+                have.update(range(start, end))
+        return status, have
+    
+    def __send_file_chunks(self, job, des, network, transfer_id, f, file_size, have, compressor=None):
+        """
+        逐块加密并发送文件数据(在工作线程中执行)
+        源文件按窗口映射到内存后直接切片加密，每块加密结果写入轮流使用的输出缓冲区，
+        缓冲区上一次的发送完成后才重新使用
+        :param job: 当前任务
+        :param des: DES加密器
+        :param network: 网络管理器
+        :param transfer_id: 传输ID
+        :param f: 已打开的源文件
+        :param file_size: 文件大小
+        :param have: 对方已有的块序号集合，这些块不再发送
+        :param compressor: 加密前压缩数据块使用的压缩器，为None时不压缩
+        :return: (数据块总数, 加密时间, 最后一个加密数据块, 实际发送的明文字节数)，发送失败时为None
+        """
+        # 压缩后没有变小的数据块按原样保存，多一个标记字节
+        buffer_size = des.encrypted_size(self.FILE_CHUNK_SIZE + 1)
+        buffers = [bytearray(buffer_size) for _ in range(self.SEND_BUFFER_COUNT)]
+        futures = [None] * self.SEND_BUFFER_COUNT
+        
+        encryption_time = 0.0
+        chunk_count = 0
+        sent_count = 0
+        sent_size = 0
+        encrypted_chunk = b''
+        for window_offset in range(0, file_size, self.MMAP_WINDOW_SIZE):
+            # 每次只映射一个窗口，已发送部分的页面随窗口关闭释放
+            window_size = min(self.MMAP_WINDOW_SIZE, file_size - window_offset)
+            with mmap.mmap(f.fileno(), window_size, access=mmap.ACCESS_READ, offset=window_offset) as window:
+                with memoryview(window) as view:
+                    for offset in range(0, window_size, self.FILE_CHUNK_SIZE):
+                        seq = chunk_count
+                        chunk_count += 1
+                        job.set_progress(window_offset + min(offset + self.FILE_CHUNK_SIZE, window_size), file_size)
+                        if seq in have:
+                            continue
+                        
+                        slot = sent_count % self.SEND_BUFFER_COUNT
+                        if futures[slot] is not None and not futures[slot].result():
+                            return None
+                        
+                        # 每个数据块独立加密(各自带IV)
+                        chunk = view[offset:offset + self.FILE_CHUNK_SIZE]
+                        if compressor:
+                            chunk = compressor.compress(chunk)
+                        size, chunk_time = des.encrypt_into(chunk, buffers[slot])
+                        del chunk
+                        encryption_time += chunk_time
+                        encrypted_chunk = memoryview(buffers[slot])[:size]
+                        futures[slot] = network.send_file_chunk(transfer_id, seq, encrypted_chunk)
+                        if not self._send_accepted(futures[slot]):
+                            return None
+                        sent_count += 1
+                        sent_size += min(self.FILE_CHUNK_SIZE, window_size - offset)
+        
+        return chunk_count, encryption_time, bytes(encrypted_chunk), sent_size
+    
+    def _send_accepted(self, future):
+        """
+        判断发送请求是否已被网络层接受(未连接或连接已断开时Future立即以False结束)
+        :param future: send_*返回的Future
+        :return: 是否已接受
+        """
+        return not future.done() or future.result()
     
     def _update_encryption_rate(self):
         """
@@ -380,10 +1651,16 @@ class Application:
             self.network.close()
             self.network = None
         
+        # 放弃未完成的文件接收(排在已提交的接收任务之后)
+        self.jobs.submit(self.JOB_CHANNEL_RECV, "放弃文件接收", lambda job: self._abort_incoming_files())
+        
         # 重置加密组件
         self.des = None
+        self.compressor = None
         self.dh = None
         self.other_public_key = None
+        self.resumption_secret = None
+        self.resuming = None
         self.key_exchange_completed = False
         
         # 更新UI
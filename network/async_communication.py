@@ -0,0 +1,550 @@
+import asyncio
+import functools
+import struct
+import os
+import json
+import time
+
+from crypto.des import DESCipher
+from crypto.diffie_hellman import DiffieHellman, GROUPS
+from network.communication import NetworkManager
+
+
+class AsyncSession:
+    """
+    异步网络管理器中的一个连接
+    每个连接拥有独立的Diffie-Hellman密钥交换和DES加密状态
+    """
+
+    def __init__(self, manager, reader, writer):
+        """
+        初始化连接会话
+        :param manager: 所属的AsyncNetworkManager
+        :param reader: asyncio.StreamReader
+        :param writer: asyncio.StreamWriter
+        """
+        self.manager = manager
+        self.reader = reader
+        self.writer = writer
+        self.peer = writer.get_extra_info('peername')
+        self.connected = True
+        self.dh = None
+        self.des = None
+        self.other_public_key = None
+        # 协商完成前(或对方不支持协商时)使用CBC模式
+        self.cipher_mode = NetworkManager.CIPHER_MODE_CBC
+        # DH公钥的格式版本，服务器按客户端的版本回复
+        self.dh_key_version = NetworkManager.DH_KEY_VERSION_BINARY
+        self.key_exchanged = asyncio.Event()
+        # 已解密的接收消息队列，供receive()使用
+        self.messages = asyncio.Queue(manager.queue_size) if manager.queue_messages else None
+        # 正在接收的分块文件传输使用的工作模式 {传输ID: 工作模式}
+        self.transfer_modes = {}
+        # 接收消息循环的任务
+        self.task = None
+
+    async def _send_message(self, msg_type, data):
+        """
+        发送消息，帧格式与NetworkManager相同
+        :param msg_type: 消息类型
+        :param data: 消息数据
+        :return: 是否发送成功
+        """
+        if not self.connected:
+            return False
+
+        try:
+            # 头部和数据在同一次调度中写入，多个协程并发发送时帧不会交错
+            self.writer.write(struct.pack("!II", msg_type, len(data)))
+            self.writer.write(data)
+            await self.writer.drain()
+            return True
+        except Exception as e:
+            print(f"发送消息时出错: {e}")
+            self.connected = False
+            return False
+
+    async def send_dh_public_key(self):
+        """
+        发送本会话的Diffie-Hellman公钥
+        :return: 是否发送成功
+        """
+        data = NetworkManager.encode_dh_public_key(self.dh.get_public_key(), self.dh.group_id,
+                                                   self.dh.key_size, self.dh_key_version)
+        return await self._send_message(NetworkManager.MSG_TYPE_DH_PUBLIC_KEY, data)
+
+    async def send_cipher_mode_proposal(self):
+        """
+        向服务器提议本端希望使用的工作模式
+        :return: 是否发送成功
+        """
+        mode = self.manager.preferred_cipher_mode.encode('utf-8')
+        return await self._send_message(NetworkManager.MSG_TYPE_CIPHER_MODE, mode)
+
+    async def send_encrypted_message(self, encrypted_data):
+        """
+        发送已加密的消息
+        :param encrypted_data: 已加密的数据
+        :return: 是否发送成功
+        """
+        return await self._send_message(NetworkManager.MSG_TYPE_TEXT, encrypted_data)
+
+    async def send_text(self, message):
+        """
+        加密并发送文本消息(等待密钥交换完成)
+        :param message: 消息内容(str或bytes)
+        :return: 是否发送成功
+        """
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        await self.key_exchanged.wait()
+        encrypted_data, _ = self.des.encrypt(message)
+        return await self.send_encrypted_message(encrypted_data)
+
+    async def send_file_response(self, file_hash, status, have=None):
+        """
+        答复文件传输请求
+        :param file_hash: 请求中的文件摘要
+        :param status: 答复状态(NetworkManager.FILE_STATUS_*)
+        :param have: 已有的数据块范围列表[[起始块序号, 结束块序号), ...]
+        :return: 是否发送成功
+        """
+        return await self._send_message(NetworkManager.MSG_TYPE_FILE_RESPONSE,
+                                        NetworkManager.encode_file_response(file_hash, status, have))
+
+    async def send_file(self, file_path, chunk_size=64 * 1024):
+        """
+        使用分块文件传输消息加密并发送文件，读取和加密在线程池中进行，不阻塞事件循环
+        :param file_path: 文件路径
+        :param chunk_size: 每个数据块的明文字节数
+        :return: 是否发送成功
+        """
+        await self.key_exchanged.wait()
+        loop = asyncio.get_running_loop()
+        transfer_id = int.from_bytes(os.urandom(4), 'big')
+        file_info = {
+            'transfer_id': transfer_id,
+            'name': os.path.basename(file_path),
+            'size': os.path.getsize(file_path),
+            'chunk_size': chunk_size,
+            'mode': self.cipher_mode,
+            'timestamp': time.time()
+        }
+        if not await self._send_message(NetworkManager.MSG_TYPE_FILE_START,
+                                        json.dumps(file_info).encode('utf-8')):
+            return False
+
+        seq = 0
+        with open(file_path, 'rb') as f:
+            while True:
+                # 读取文件和加密都在线程池中进行
+                chunk = await loop.run_in_executor(None, f.read, chunk_size)
+                if not chunk:
+                    break
+                encrypted_chunk, _ = await loop.run_in_executor(None, self.des.encrypt, chunk)
+                payload = struct.pack("!II", transfer_id, seq) + encrypted_chunk
+                if not await self._send_message(NetworkManager.MSG_TYPE_FILE_CHUNK, payload):
+                    return False
+                seq += 1
+
+        end_info = {'transfer_id': transfer_id, 'chunks': seq}
+        return await self._send_message(NetworkManager.MSG_TYPE_FILE_END,
+                                        json.dumps(end_info).encode('utf-8'))
+
+    async def receive(self):
+        """
+        接收下一条消息(已解密)
+        :return: (消息类型, 内容)
+            MSG_TYPE_TEXT: 明文bytes(批量消息拆分为多条文本消息)
+            MSG_TYPE_FILE: (文件信息, 明文bytes)
+            MSG_TYPE_FILE_START / MSG_TYPE_FILE_END / MSG_TYPE_FILE_REQUEST: 信息字典
+            MSG_TYPE_FILE_CHUNK: (传输ID, 块序号, 明文bytes)
+            连接关闭后返回(None, None)
+        """
+        if self.messages is None:
+            raise RuntimeError("未启用消息队列(queue_messages=False)")
+        if not self.connected and self.messages.empty():
+            return None, None
+        return await self.messages.get()
+
+    async def close(self):
+        """
+        关闭连接
+        """
+        self.connected = False
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class AsyncNetworkManager:
+    """
+    基于asyncio的网络通信管理器
+    一个事件循环可以同时处理大量连接，消息类型和帧格式与NetworkManager相同
+    回调函数与NetworkManager一致，但第一个参数为对应的AsyncSession
+    """
+
+    def __init__(self, is_server=False, host='127.0.0.1', port=9999,
+                 cipher_mode=NetworkManager.CIPHER_MODE_CBC, dh_factory=DiffieHellman,
+                 queue_messages=True, queue_size=100):
+        """
+        初始化异步网络管理器
+        :param is_server: 是否为服务器端
+        :param host: 主机地址
+        :param port: 端口号
+        :param cipher_mode: 本端希望使用的加密工作模式
+        :param dh_factory: 为每个连接创建DiffieHellman对象的可调用对象
+        :param queue_messages: 是否把解密后的消息放入会话队列供receive()读取
+        :param queue_size: 每个会话消息队列的最大长度(队列满时暂停读取该连接)
+        """
+        self.is_server = is_server
+        self.host = host
+        self.port = port
+        self.preferred_cipher_mode = cipher_mode
+        self.dh_factory = dh_factory
+        self.queue_messages = queue_messages
+        self.queue_size = queue_size
+        self.server = None
+        self.session = None  # 客户端模式下的连接
+        self.sessions = set()
+        self.connection_callback = None
+        self.message_callback = None
+        self.dh_key_callback = None
+        self.file_callback = None
+        self.file_request_callback = None
+        self.cipher_mode_callback = None
+        self.file_start_callback = None
+        self.file_chunk_callback = None
+        self.file_end_callback = None
+
+    async def start(self):
+        """
+        启动网络服务
+        服务器模式下开始监听；客户端模式下连接服务器并发起密钥交换
+        :return: 成功返回True，失败返回False
+        """
+        try:
+            if self.is_server:
+                self.server = await asyncio.start_server(self._on_client_connected, self.host, self.port)
+                return True
+
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+            self.session = await self._open_session(reader, writer)
+
+            # 先提议工作模式，再发送公钥
+            await self.session.send_cipher_mode_proposal()
+            await self.session.send_dh_public_key()
+
+            self.session.task = asyncio.ensure_future(self._run_session(self.session))
+            return True
+        except Exception as e:
+            print(f"网络启动错误: {e}")
+            return False
+
+    async def connect(self):
+        """
+        以客户端模式连接服务器，并等待密钥交换完成
+        :return: 连接会话，失败返回None
+        """
+        if not await self.start():
+            return None
+        await self.session.key_exchanged.wait()
+        return self.session
+
+    async def _open_session(self, reader, writer):
+        """
+        创建连接会话并生成本会话的Diffie-Hellman密钥对
+        :param reader: asyncio.StreamReader
+        :param writer: asyncio.StreamWriter
+        :return: AsyncSession
+        """
+        session = AsyncSession(self, reader, writer)
+        # 模幂运算在线程池中进行，不阻塞其他连接
+        session.dh = await asyncio.get_running_loop().run_in_executor(None, self.dh_factory)
+        self.sessions.add(session)
+        if self.connection_callback:
+            self.connection_callback(session, True)
+        return session
+
+    async def _on_client_connected(self, reader, writer):
+        """
+        服务器接受新连接
+        :param reader: asyncio.StreamReader
+        :param writer: asyncio.StreamWriter
+        """
+        try:
+            session = await self._open_session(reader, writer)
+        except Exception as e:
+            print(f"等待连接时出错: {e}")
+            writer.close()
+            return
+        print(f"客户端 {session.peer} 已连接")
+        session.task = asyncio.ensure_future(self._run_session(session))
+        try:
+            await session.task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run_session(self, session):
+        """
+        接收消息的循环
+        :param session: 连接会话
+        """
+        try:
+            while session.connected:
+                header = await session.reader.readexactly(8)
+                msg_type, msg_len = struct.unpack("!II", header)
+                # 消息长度来自对方，超过上限时断开连接
+                if msg_len > NetworkManager.MAX_FRAME_SIZE:
+                    raise ValueError(f"消息长度超过上限: {msg_len}")
+                data = await session.reader.readexactly(msg_len)
+                await self._handle_message(session, msg_type, data)
+        except asyncio.IncompleteReadError:
+            pass
+        except Exception as e:
+            print(f"接收消息时出错: {e}")
+        finally:
+            await session.close()
+            self.sessions.discard(session)
+            if session.messages is not None:
+                # 唤醒正在等待receive()的协程
+                try:
+                    session.messages.put_nowait((None, None))
+                except asyncio.QueueFull:
+                    pass
+            if self.connection_callback:
+                self.connection_callback(session, False)
+
+    async def _queue(self, session, msg_type, content):
+        """
+        把解密后的消息放入会话队列
+        :param session: 连接会话
+        :param msg_type: 消息类型
+        :param content: 消息内容
+        """
+        if session.messages is not None:
+            await session.messages.put((msg_type, content))
+
+    async def _decrypt(self, session, data, mode=None):
+        """
+        在线程池中解密数据
+        :param session: 连接会话
+        :param data: 加密的数据
+        :param mode: 工作模式，为None时使用会话的工作模式
+        :return: 解密后的数据，失败返回None
+        """
+        loop = asyncio.get_running_loop()
+        decrypted_data, _ = await loop.run_in_executor(None, session.des.decrypt, data, mode)
+        return decrypted_data
+
+    async def _handle_message(self, session, msg_type, data):
+        """
+        处理接收到的消息
+        :param session: 连接会话
+        :param msg_type: 消息类型
+        :param data: 消息数据
+        """
+        try:
+            if msg_type == NetworkManager.MSG_TYPE_DH_PUBLIC_KEY:
+                # Diffie-Hellman公钥(及其所属的DH组和格式版本)
+                public_key, group_id, session.dh_key_version = NetworkManager.decode_dh_public_key(data)
+                loop = asyncio.get_running_loop()
+
+                # 双方的DH组不一致: 服务器使用dh_factory决定的组，回复自己的公钥和组；
+                # 客户端改用服务器的组后重新发送公钥
+                if group_id is not None and group_id != session.dh.group_id:
+                    if self.is_server:
+                        await session.send_dh_public_key()
+                    elif group_id in GROUPS:
+                        session.dh = await loop.run_in_executor(None, functools.partial(DiffieHellman, group=group_id))
+                        await session.send_dh_public_key()
+                    else:
+                        print(f"服务器使用了未知的DH组: {group_id}")
+                    return
+
+                session.other_public_key = public_key
+
+                # 服务器收到公钥后发送自己的公钥
+                if self.is_server:
+                    await session.send_dh_public_key()
+
+                legacy_kdf = session.dh_key_version == NetworkManager.DH_KEY_VERSION_TEXT
+                shared_secret = await loop.run_in_executor(None, session.dh.generate_shared_secret, public_key, legacy_kdf)
+                session.des = DESCipher(shared_secret, mode=session.cipher_mode)
+                session.key_exchanged.set()
+                if self.dh_key_callback:
+                    self.dh_key_callback(session, public_key, session.dh.group_id)
+
+            elif msg_type == NetworkManager.MSG_TYPE_CIPHER_MODE:
+                # 工作模式协商
+                mode = data.decode('utf-8')
+                if self.is_server:
+                    if mode not in NetworkManager.SUPPORTED_CIPHER_MODES:
+                        mode = NetworkManager.CIPHER_MODE_CBC
+                    session.cipher_mode = mode
+                    await session._send_message(NetworkManager.MSG_TYPE_CIPHER_MODE, mode.encode('utf-8'))
+                elif mode in NetworkManager.SUPPORTED_CIPHER_MODES:
+                    session.cipher_mode = mode
+                if session.des:
+                    session.des.mode = session.cipher_mode
+                if self.cipher_mode_callback:
+                    self.cipher_mode_callback(session, session.cipher_mode)
+
+            elif msg_type == NetworkManager.MSG_TYPE_TEXT:
+                # 加密的文本消息
+                if self.message_callback:
+                    self.message_callback(session, data)
+                if session.messages is not None:
+                    await self._queue(session, msg_type, await self._decrypt(session, data))
+
+            elif msg_type == NetworkManager.MSG_TYPE_BATCH:
+                # 批量消息，逐条按文本消息处理
+                for record in NetworkManager.decode_batch(data):
+                    if self.message_callback:
+                        self.message_callback(session, record)
+                    if session.messages is not None:
+                        await self._queue(session, NetworkManager.MSG_TYPE_TEXT, await self._decrypt(session, record))
+
+            elif msg_type == NetworkManager.MSG_TYPE_FILE:
+                # 加密的文件数据(单条消息)
+                file_info_size = struct.unpack("!I", data[:4])[0]
+                file_info = json.loads(data[4:4+file_info_size].decode('utf-8'))
+                file_data = data[4+file_info_size:]
+                if self.file_callback:
+                    self.file_callback(session, file_info, file_data)
+                if session.messages is not None:
+                    decrypted_data = await self._decrypt(session, file_data, file_info.get('mode'))
+                    await self._queue(session, msg_type, (file_info, decrypted_data))
+
+            elif msg_type == NetworkManager.MSG_TYPE_FILE_REQUEST:
+                # 文件传输请求
+                file_info = json.loads(data.decode('utf-8'))
+                if self.file_request_callback:
+                    self.file_request_callback(session, file_info)
+                else:
+                    # 没有回调决定如何答复时要求对方完整发送，对方不必等到超时
+                    await session.send_file_response(file_info.get('hash'), NetworkManager.FILE_STATUS_SEND)
+                await self._queue(session, msg_type, file_info)
+
+            elif msg_type == NetworkManager.MSG_TYPE_FILE_START:
+                # 分块文件传输开始
+                file_info = json.loads(data.decode('utf-8'))
+                session.transfer_modes[file_info['transfer_id']] = file_info.get('mode')
+                if self.file_start_callback:
+                    self.file_start_callback(session, file_info['transfer_id'], file_info)
+                await self._queue(session, msg_type, file_info)
+
+            elif msg_type == NetworkManager.MSG_TYPE_FILE_CHUNK:
+                # 分块文件传输的数据块
+                transfer_id, seq = struct.unpack("!II", data[:8])
+                if self.file_chunk_callback:
+                    self.file_chunk_callback(session, transfer_id, seq, data[8:])
+                if session.messages is not None:
+                    mode = session.transfer_modes.get(transfer_id)
+                    decrypted_chunk = await self._decrypt(session, data[8:], mode)
+                    await self._queue(session, msg_type, (transfer_id, seq, decrypted_chunk))
+
+            elif msg_type == NetworkManager.MSG_TYPE_FILE_END:
+                # 分块文件传输结束
+                end_info = json.loads(data.decode('utf-8'))
+                session.transfer_modes.pop(end_info['transfer_id'], None)
+                if self.file_end_callback:
+                    self.file_end_callback(session, end_info['transfer_id'], end_info)
+                await self._queue(session, msg_type, end_info)
+
+        except Exception as e:
+            print(f"处理消息时出错: {e}")
+
+    async def broadcast_text(self, message):
+        """
+        向所有已完成密钥交换的连接发送文本消息(各自使用自己的密钥加密)
+        :param message: 消息内容(str或bytes)
+        :return: 发送成功的连接数
+        """
+        sessions = [s for s in self.sessions if s.key_exchanged.is_set()]
+        results = await asyncio.gather(*(s.send_text(message) for s in sessions))
+        return sum(1 for ok in results if ok)
+
+    def set_connection_callback(self, callback):
+        """
+        设置连接状态回调
+        :param callback: 回调函数(session, connected) -> None
+        """
+        self.connection_callback = callback
+
+    def set_message_callback(self, callback):
+        """
+        设置消息接收回调
+        :param callback: 回调函数(session, encrypted_data) -> None
+        """
+        self.message_callback = callback
+
+    def set_dh_key_callback(self, callback):
+        """
+        设置Diffie-Hellman公钥接收回调(此时会话的DES加密器已创建)
+        参数与NetworkManager的回调相同，只是多了第一个参数session
+        :param callback: 回调函数(session, public_key, group_id) -> None，使用自定义质数时group_id为None
+        """
+        self.dh_key_callback = callback
+
+    def set_file_callback(self, callback):
+        """
+        设置文件接收回调
+        :param callback: 回调函数(session, file_info, encrypted_data) -> None
+        """
+        self.file_callback = callback
+
+    def set_file_request_callback(self, callback):
+        """
+        设置文件请求回调，回调函数须调用session.send_file_response答复对方；
+        未设置时总是答复FILE_STATUS_SEND
+        :param callback: 回调函数(session, file_info) -> None
+        """
+        self.file_request_callback = callback
+
+    def set_cipher_mode_callback(self, callback):
+        """
+        设置工作模式协商结果回调
+        :param callback: 回调函数(session, cipher_mode) -> None
+        """
+        self.cipher_mode_callback = callback
+
+    def set_file_start_callback(self, callback):
+        """
+        设置分块文件传输开始回调
+        :param callback: 回调函数(session, transfer_id, file_info) -> None
+        """
+        self.file_start_callback = callback
+
+    def set_file_chunk_callback(self, callback):
+        """
+        设置分块文件传输数据块回调
+        :param callback: 回调函数(session, transfer_id, seq, encrypted_chunk) -> None
+        """
+        self.file_chunk_callback = callback
+
+    def set_file_end_callback(self, callback):
+        """
+        设置分块文件传输结束回调
+        :param callback: 回调函数(session, transfer_id, end_info) -> None
+        """
+        self.file_end_callback = callback
+
+    async def close(self):
+        """
+        关闭服务器和所有连接
+        """
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+        # 停止所有连接的接收循环
+        tasks = []
+        for session in list(self.sessions):
+            await session.close()
+            if session.task:
+                session.task.cancel()
+                tasks.append(session.task)
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -4,6 +4,21 @@ import threading
 import os
 import json
 import time
+import collections
+import itertools
+from concurrent.futures import Future
+
+
+def _iov_max():
+    """
+    sendmsg一次可以写入的最大缓冲区数量(系统的IOV_MAX)，无法获取时使用1024
+    """
+    try:
+        iov_max = os.sysconf('SC_IOV_MAX')
+    except (AttributeError, ValueError, OSError):
+        iov_max = -1
+    return iov_max if iov_max > 0 else 1024
+
 
 class NetworkManager:
     """
@@ -14,17 +29,91 @@ class NetworkManager:
     MSG_TYPE_TEXT = 2           # 文本消息
     MSG_TYPE_FILE = 3           # 文件传输
     MSG_TYPE_FILE_REQUEST = 4   # 请求发送文件
+    MSG_TYPE_CIPHER_MODE = 5    # 加密工作模式协商
+    MSG_TYPE_FILE_START = 6     # 分块文件传输: 开始(文件信息)
+    MSG_TYPE_FILE_CHUNK = 7     # 分块文件传输: 加密的数据块
+    MSG_TYPE_FILE_END = 8       # 分块文件传输: 结束
+    MSG_TYPE_FILE_RESPONSE = 9  # 对文件请求的答复
+    MSG_TYPE_COMPRESSION = 10   # 压缩方法协商
+    MSG_TYPE_BATCH = 11         # 批量消息: 多条加密文本消息合并为一帧
+    MSG_TYPE_SESSION_TICKET = 12  # 服务器签发的会话票据
+    MSG_TYPE_SESSION_RESUME = 13  # 使用会话票据恢复会话(不重新进行密钥交换)
+    
+    # 文件请求的答复状态
+    FILE_STATUS_SEND = 'send'       # 需要完整发送
+    FILE_STATUS_RESUME = 'resume'   # 已有部分数据块，只需发送缺少的块
+    FILE_STATUS_HAVE = 'have'       # 已有相同内容的文件，不需要发送
+    
+    # 加密工作模式
+    CIPHER_MODE_CBC = 'cbc'
+    CIPHER_MODE_CTR = 'ctr'
+    SUPPORTED_CIPHER_MODES = (CIPHER_MODE_CBC, CIPHER_MODE_CTR)
+    
+    # 加密前的压缩方法
+    COMPRESSION_NONE = 'none'
+    COMPRESSION_ZLIB = 'zlib'
+    COMPRESSION_LZMA = 'lzma'
+    SUPPORTED_COMPRESSIONS = (COMPRESSION_ZLIB, COMPRESSION_LZMA)
+    
+    # DH公钥消息的格式版本
+    # 版本1: 十进制文本(不带版本字节和组编号)，密钥派生对共享密钥的十进制文本做哈希
+    #        用于与本系列中尚不支持版本2的早期构建互通(双方使用同一个预定义组)；
+    #        最初的版本使用p=23的玩具组，任何预定义组都不接受，无法与其互通
+    # 版本2: 版本字节 + 组编号(2字节，0表示自定义质数) + 定长大端字节，密钥派生对定长大端字节做哈希
+    DH_KEY_VERSION_TEXT = 1
+    DH_KEY_VERSION_BINARY = 2
     
-    def __init__(self, is_server=False, host='127.0.0.1', port=9999):
+    # 恢复会话时双方随机数的字节数
+    SESSION_NONCE_SIZE = 16
+    
+    # 单个帧允许的最大消息长度(字节)，超过时断开连接，不按对方声明的长度分配缓冲区
+    # 分块传输的数据块远小于该值；旧的整文件消息(MSG_TYPE_FILE)只能发送不超过该长度的文件
+    MAX_FRAME_SIZE = 64 * 1024 * 1024
+    
+    # 协议控制消息: 数据量很小，且常由接收线程发送(答复对方)，发送时不受高水位限制，
+    # 否则接收线程阻塞后不再读取套接字，双方可能互相等待
+    CONTROL_MESSAGE_TYPES = (MSG_TYPE_DH_PUBLIC_KEY, MSG_TYPE_CIPHER_MODE, MSG_TYPE_COMPRESSION,
+                             MSG_TYPE_FILE_RESPONSE, MSG_TYPE_SESSION_TICKET, MSG_TYPE_SESSION_RESUME)
+    
+    # 关闭连接时等待发送线程写完队列中剩余消息的最长时间(秒)
+    CLOSE_TIMEOUT = 5
+    
+    # 每次调用sendmsg最多传入的缓冲区数量，超过IOV_MAX时sendmsg失败(EMSGSIZE)
+    IOV_MAX = _iov_max()
+    
+    def __init__(self, is_server=False, host='127.0.0.1', port=9999, cipher_mode=CIPHER_MODE_CBC,
+                 send_high_watermark=4 * 1024 * 1024, send_low_watermark=1024 * 1024, compressions=(),
+                 batch_window=None, batch_max_bytes=64 * 1024, dh_key_version=DH_KEY_VERSION_BINARY):
         """
         初始化网络管理器
         :param is_server: 是否为服务器端
         :param host: 主机地址
         :param port: 端口号
+        :param cipher_mode: 本端希望使用的加密工作模式
+        :param send_high_watermark: 发送队列高水位(字节)，超过后send_*阻塞调用方
+        :param send_low_watermark: 发送队列低水位(字节)，降到该值以下后恢复接受发送
+        :param compressions: 本端可以使用的压缩方法(按优先顺序)，为空时不压缩
+        :param batch_window: 批量发送文本消息的等待时间(秒)，为None时每条消息单独发送；
+                             启用后在该时间内发送的消息合并为一个批量消息帧(对方须支持MSG_TYPE_BATCH)
+        :param batch_max_bytes: 一个批量消息帧的最大字节数，达到后立即发送
+        :param dh_key_version: 本端发送DH公钥使用的格式版本；尚不支持版本2的早期构建只能解析DH_KEY_VERSION_TEXT，
+                               本端总能解析两种版本，并按对方的版本回复
         """
         self.is_server = is_server
         self.host = host
         self.port = port
+        # 本端希望使用的工作模式，以及双方协商一致的工作模式
+        # 协商完成前(或对方不支持协商时)使用CBC模式
+        self.preferred_cipher_mode = cipher_mode
+        self.cipher_mode = self.CIPHER_MODE_CBC
+        # 本端可以使用的压缩方法，以及双方协商一致的压缩方法(协商完成前不压缩)
+        self.preferred_compressions = tuple(c for c in compressions if c in self.SUPPORTED_COMPRESSIONS)
+        self.compression = self.COMPRESSION_NONE
+        # 本端希望使用的DH公钥格式版本，以及双方一致的版本(取双方版本中较低的一个)
+        self.preferred_dh_key_version = dh_key_version
+        self.dh_key_version = dh_key_version
+        # 对方上一次发来的DH公钥的格式版本(尚未收到时为None)
+        self.peer_dh_key_version = None
         self.socket = None
         self.connection = None
         self.connected = False
@@ -33,6 +122,30 @@ class NetworkManager:
         self.dh_key_callback = None
         self.file_callback = None
         self.file_request_callback = None
+        self.cipher_mode_callback = None
+        self.file_start_callback = None
+        self.file_chunk_callback = None
+        self.file_end_callback = None
+        self.file_response_callback = None
+        self.session_ticket_callback = None
+        self.session_resume_callback = None
+        
+        # 发送队列，由每个连接唯一的发送线程按顺序写入套接字
+        self.send_high_watermark = send_high_watermark
+        self.send_low_watermark = send_low_watermark
+        self._send_queue = collections.deque()
+        self._send_condition = threading.Condition()
+        self._queued_bytes = 0
+        self._send_paused = False
+        self._writer_thread = None
+        
+        # 批量发送的文本消息 [(加密数据, Future), ...]
+        self.batch_window = batch_window
+        self.batch_max_bytes = batch_max_bytes
+        self._batch = []
+        self._batch_bytes = 0
+        self._batch_lock = threading.Lock()
+        self._batch_timer = None
         
     def start(self):
         """
@@ -56,6 +169,7 @@ class NetworkManager:
                 self.socket.connect((self.host, self.port))
                 self.connection = self.socket
                 self.connected = True
+                self._start_writer()
                 
                 # 在新线程中接收消息
                 threading.Thread(target=self._receive_messages, daemon=True).start()
@@ -78,6 +192,7 @@ class NetworkManager:
             print("等待客户端连接...")
             self.connection, client_address = self.socket.accept()
             self.connected = True
+            self._start_writer()
             print(f"客户端 {client_address} 已连接")
             
             # 触发连接回调
@@ -91,35 +206,54 @@ class NetworkManager:
             if self.connection_callback:
                 self.connection_callback(False)
     
+    def _recv_exact(self, size):
+        """
+        接收恰好size字节的数据
+        预先分配缓冲区，通过memoryview使用recv_into直接写入，避免反复拼接复制
+        :param size: 要接收的字节数
+        :return: 接收到的数据(bytearray)
+        """
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            n = self.connection.recv_into(view[received:])
+            if n == 0:
+                raise Exception("连接已关闭")
+            received += n
+        return buffer
+    
     def _receive_messages(self):
         """
         接收消息的循环
         """
         try:
             while self.connected:
-                # 读取消息头部 (消息类型和消息长度)
-                header = self.connection.recv(8)
-                if not header or len(header) != 8:
-                    raise Exception("连接已关闭")
-                
+                # 读取消息头部 (消息类型和消息长度)，短读时继续读取直到满8字节
+                header = self._recv_exact(8)
                 msg_type, msg_len = struct.unpack("!II", header)
+                # 消息长度来自对方，超过上限时不分配缓冲区，直接断开连接
+                if msg_len > self.MAX_FRAME_SIZE:
+                    raise ValueError(f"消息长度超过上限: {msg_len}")
                 
-                # 读取消息内容
-                data = b""
-                remaining = msg_len
-                while remaining > 0:
-                    chunk = self.connection.recv(min(4096, remaining))
-                    if not chunk:
-                        raise Exception("连接已关闭")
-                    data += chunk
-                    remaining -= len(chunk)
+                # 读取消息内容，以memoryview的形式交给处理函数(不再复制)
+                data = memoryview(self._recv_exact(msg_len))
                 
                 # 根据消息类型处理不同的消息
                 self._handle_message(msg_type, data)
                 
         except Exception as e:
-            print(f"接收消息时出错: {e}")
-            self.connected = False
+            if self.connected:
+                # 本端调用close()导致的退出不作为错误
+                print(f"接收消息时出错: {e}")
+            with self._send_condition:
+                self.connected = False
+                self._send_condition.notify_all()
+            # 关闭双向连接(套接字由close释放)，对方和发送线程都能立即得知连接已断开
+            try:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except (OSError, AttributeError):
+                pass
             if self.connection_callback:
                 self.connection_callback(False)
     
@@ -127,24 +261,32 @@ class NetworkManager:
         """
         处理接收到的消息
         :param msg_type: 消息类型
-        :param data: 消息数据
+        :param data: 消息数据(memoryview)
         """
         try:
             if msg_type == self.MSG_TYPE_DH_PUBLIC_KEY:
-                # Diffie-Hellman公钥
-                public_key = int(data.decode('utf-8'))
+                # Diffie-Hellman公钥(及其所属的DH组)，之后按双方都支持的格式版本回复和派生密钥
+                public_key, group_id, version = self.decode_dh_public_key(data)
+                self.peer_dh_key_version = version
+                self.dh_key_version = min(version, self.preferred_dh_key_version)
                 if self.dh_key_callback:
-                    self.dh_key_callback(public_key)
+                    self.dh_key_callback(public_key, group_id)
                     
             elif msg_type == self.MSG_TYPE_TEXT:
                 # 加密的文本消息
                 if self.message_callback:
                     self.message_callback(data)
                     
+            elif msg_type == self.MSG_TYPE_BATCH:
+                # 批量消息，逐条交给消息回调
+                for record in self.decode_batch(data):
+                    if self.message_callback:
+                        self.message_callback(record)
+                    
             elif msg_type == self.MSG_TYPE_FILE:
                 # 加密的文件数据
                 file_info_size = struct.unpack("!I", data[:4])[0]
-                file_info_json = data[4:4+file_info_size].decode('utf-8')
+                file_info_json = str(data[4:4+file_info_size], 'utf-8')
                 file_info = json.loads(file_info_json)
                 file_data = data[4+file_info_size:]
                 
@@ -153,58 +295,315 @@ class NetworkManager:
                     
             elif msg_type == self.MSG_TYPE_FILE_REQUEST:
                 # 文件传输请求
-                file_info = json.loads(data.decode('utf-8'))
+                file_info = json.loads(str(data, 'utf-8'))
                 if self.file_request_callback:
                     self.file_request_callback(file_info)
                     
+            elif msg_type == self.MSG_TYPE_CIPHER_MODE:
+                # 工作模式协商
+                mode = str(data, 'utf-8')
+                if self.is_server:
+                    # 服务器接受客户端提议的模式(若支持)，并回复最终结果
+                    if mode not in self.SUPPORTED_CIPHER_MODES:
+                        mode = self.CIPHER_MODE_CBC
+                    self.cipher_mode = mode
+                    self._send_message(self.MSG_TYPE_CIPHER_MODE, mode.encode('utf-8'))
+                elif mode in self.SUPPORTED_CIPHER_MODES:
+                    # 客户端采用服务器确认的模式
+                    self.cipher_mode = mode
+                if self.cipher_mode_callback:
+                    self.cipher_mode_callback(self.cipher_mode)
+                    
+            elif msg_type == self.MSG_TYPE_COMPRESSION:
+                # 压缩方法协商
+                methods = str(data, 'utf-8').split(',')
+                if self.is_server:
+                    # 服务器从客户端提议的方法中选择第一个本端也可以使用的方法，并回复最终结果
+                    method = next((m for m in methods if m in self.preferred_compressions), self.COMPRESSION_NONE)
+                    self.compression = method
+                    self._send_message(self.MSG_TYPE_COMPRESSION, method.encode('utf-8'))
+                elif methods[0] in self.preferred_compressions:
+                    # 客户端采用服务器确认的方法
+                    self.compression = methods[0]
+                else:
+                    self.compression = self.COMPRESSION_NONE
+                    
+            elif msg_type == self.MSG_TYPE_FILE_START:
+                # 分块文件传输开始
+                file_info = json.loads(str(data, 'utf-8'))
+                if self.file_start_callback:
+                    self.file_start_callback(file_info['transfer_id'], file_info)
+                    
+            elif msg_type == self.MSG_TYPE_FILE_CHUNK:
+                # 分块文件传输的数据块
+                # 格式: [传输ID(4字节)][块序号(4字节)][加密的数据块]
+                transfer_id, seq = struct.unpack("!II", data[:8])
+                if self.file_chunk_callback:
+                    self.file_chunk_callback(transfer_id, seq, data[8:])
+                    
+            elif msg_type == self.MSG_TYPE_FILE_END:
+                # 分块文件传输结束
+                end_info = json.loads(str(data, 'utf-8'))
+                if self.file_end_callback:
+                    self.file_end_callback(end_info['transfer_id'], end_info)
+                    
+            elif msg_type == self.MSG_TYPE_FILE_RESPONSE:
+                # 对文件请求的答复
+                response = json.loads(str(data, 'utf-8'))
+                if self.file_response_callback:
+                    self.file_response_callback(response)
+                    
+            elif msg_type == self.MSG_TYPE_SESSION_TICKET:
+                # 会话票据
+                # 格式: [有效期(4字节，秒)][票据]
+                lifetime, = struct.unpack("!I", data[:4])
+                if self.session_ticket_callback:
+                    self.session_ticket_callback(bytes(data[4:]), lifetime)
+                    
+            elif msg_type == self.MSG_TYPE_SESSION_RESUME:
+                # 恢复会话
+                # 格式: [随机数(16字节)][票据(只有客户端发送)]
+                nonce = bytes(data[:self.SESSION_NONCE_SIZE])
+                if len(nonce) == self.SESSION_NONCE_SIZE and self.session_resume_callback:
+                    self.session_resume_callback(nonce, bytes(data[self.SESSION_NONCE_SIZE:]))
+                    
         except Exception as e:
             print(f"处理消息时出错: {e}")
     
-    def send_dh_public_key(self, public_key):
+    @staticmethod
+    def encode_dh_public_key(public_key, group_id=None, key_size=None, version=DH_KEY_VERSION_BINARY):
         """
-        发送Diffie-Hellman公钥
+        编码DH公钥消息的内容
         :param public_key: 公钥
-        :return: 是否发送成功
+        :param group_id: 公钥所属的DH组编号(自定义质数时为None)，版本1不发送组编号
+        :param key_size: 公钥的字节数(质数的字节数)，为None时使用公钥本身的最小字节数
+        :param version: 格式版本(DH_KEY_VERSION_TEXT或DH_KEY_VERSION_BINARY)
+        :return: 消息数据
+        """
+        if version == NetworkManager.DH_KEY_VERSION_TEXT:
+            return str(public_key).encode('utf-8')
+        if key_size is None:
+            key_size = (public_key.bit_length() + 7) // 8
+        header = struct.pack('!BH', NetworkManager.DH_KEY_VERSION_BINARY, group_id or 0)
+        return header + public_key.to_bytes(key_size, 'big')
+    
+    @staticmethod
+    def decode_batch(data):
+        """
+        拆分批量消息
+        格式: [消息长度(4字节)][加密的消息] 重复
+        :param data: 消息数据
+        :return: 各条加密消息的列表(data为memoryview时为其切片，不复制)
+        """
+        records = []
+        offset = 0
+        while offset < len(data):
+            record_len = struct.unpack("!I", data[offset:offset+4])[0]
+            record = data[offset+4:offset+4+record_len]
+            offset += 4 + record_len
+            if len(record) != record_len:
+                raise ValueError("批量消息不完整")
+            records.append(record)
+        return records
+    
+    @staticmethod
+    def decode_dh_public_key(data):
         """
-        # 将公钥转换为字符串
-        data = str(public_key).encode('utf-8')
+        解码DH公钥消息的内容，根据首字节区分格式版本
+        版本1的十进制文本以数字开头，不会与版本字节混淆
+        :param data: 消息数据
+        :return: (公钥, 组编号, 格式版本)，没有组编号时组编号为None
+        """
+        if data and data[0] == NetworkManager.DH_KEY_VERSION_BINARY:
+            if len(data) <= 3:
+                raise ValueError("DH公钥消息过短")
+            _, group_id = struct.unpack_from('!BH', data)
+            return int.from_bytes(data[3:], 'big'), group_id or None, NetworkManager.DH_KEY_VERSION_BINARY
+        return int(str(data, 'utf-8')), None, NetworkManager.DH_KEY_VERSION_TEXT
+    
+    def send_dh_public_key(self, public_key, group_id=None, key_size=None):
+        """
+        发送Diffie-Hellman公钥(使用双方一致的格式版本)
+        :param public_key: 公钥
+        :param group_id: 公钥所属的DH组编号，对方据此确认双方使用相同的组
+        :param key_size: 公钥的字节数(质数的字节数)
+        :return: Future，消息写入套接字后结果为True，发送失败为False
+        """
+        data = self.encode_dh_public_key(public_key, group_id, key_size, self.dh_key_version)
         return self._send_message(self.MSG_TYPE_DH_PUBLIC_KEY, data)
     
+    def send_cipher_mode_proposal(self):
+        """
+        向服务器提议本端希望使用的工作模式(客户端在发送公钥之前调用)
+        :return: Future，消息写入套接字后结果为True，发送失败为False
+        """
+        return self._send_message(self.MSG_TYPE_CIPHER_MODE, self.preferred_cipher_mode.encode('utf-8'))
+    
+    def send_compression_proposal(self):
+        """
+        向服务器提议本端可以使用的压缩方法(客户端在发送公钥之前调用，没有可用方法时不发送)
+        :return: Future，消息写入套接字后结果为True，发送失败为False
+        """
+        future = Future()
+        if not self.preferred_compressions:
+            future.set_result(True)
+            return future
+        return self._send_message(self.MSG_TYPE_COMPRESSION, ','.join(self.preferred_compressions).encode('utf-8'))
+    
     def send_encrypted_message(self, encrypted_data):
         """
-        发送加密的消息
+        发送加密的消息，启用批量发送时先放入当前批次
         :param encrypted_data: 已加密的数据
-        :return: 是否发送成功
+        :return: Future，消息写入套接字后结果为True，发送失败为False
+        """
+        if self.batch_window is None:
+            return self._send_message(self.MSG_TYPE_TEXT, encrypted_data)
+        
+        future = Future()
+        record_size = 4 + len(encrypted_data)
+        with self._batch_lock:
+            if self._batch and self._batch_bytes + record_size > self.batch_max_bytes:
+                self._flush_batch_locked()
+            self._batch.append((encrypted_data, future))
+            self._batch_bytes += record_size
+            if self._batch_bytes >= self.batch_max_bytes:
+                self._flush_batch_locked()
+            elif self._batch_timer is None:
+                # 当前批次的第一条消息，等待时间到后发送
+                self._batch_timer = threading.Timer(self.batch_window, self._flush_batch)
+                self._batch_timer.daemon = True
+                self._batch_timer.start()
+        # 释放_batch_lock之后再按高水位阻塞调用方，其他线程和定时器线程仍然可以放入或发送批次
+        self._wait_for_send_window()
+        return future
+    
+    def _flush_batch(self):
+        """
+        立即发送当前批次中的消息
         """
-        return self._send_message(self.MSG_TYPE_TEXT, encrypted_data)
+        with self._batch_lock:
+            self._flush_batch_locked()
+    
+    def _flush_batch_locked(self):
+        """
+        把当前批次合并为一个批量消息帧放入发送队列(调用方须持有_batch_lock)
+        放入队列时不等待高水位，持有_batch_lock期间不会阻塞；批次大小不超过batch_max_bytes，
+        需要等待的调用方在释放锁之后调用_wait_for_send_window
+        """
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        batch = self._batch
+        if not batch:
+            return
+        self._batch = []
+        self._batch_bytes = 0
+        
+        if len(batch) == 1:
+            # 只有一条消息时按普通文本消息发送
+            frame_future = self._enqueue_message(self.MSG_TYPE_TEXT, batch[0][0], block=False)
+        else:
+            # 各条消息加上长度前缀后拼接为一个缓冲区: 批次中的消息都很小，
+            # 分散/聚集发送时每条消息占两个缓冲区，消息较多时sendmsg要分多次调用
+            frame = bytearray()
+            for encrypted_data, _ in batch:
+                frame += struct.pack("!I", len(encrypted_data))
+                frame += encrypted_data
+            frame_future = self._enqueue_message(self.MSG_TYPE_BATCH, bytes(frame), block=False)
+        
+        def set_results(done):
+            for _, future in batch:
+                future.set_result(done.result())
+        frame_future.add_done_callback(set_results)
     
     def send_encrypted_file(self, file_path, encrypted_data):
         """
         发送加密的文件
         :param file_path: 文件路径
         :param encrypted_data: 已加密的文件数据
-        :return: 是否发送成功
+        :return: Future，消息写入套接字后结果为True，发送失败为False
         """
         file_name = os.path.basename(file_path)
         file_info = {
             'name': file_name,
             'size': len(encrypted_data),
+            'mode': self.cipher_mode,
             'timestamp': time.time()
         }
         file_info_json = json.dumps(file_info).encode('utf-8')
         file_info_size = len(file_info_json)
         
-        # 组合文件信息和文件数据
         # 格式: [文件信息长度(4字节)][文件信息JSON][加密的文件数据]
-        payload = struct.pack("!I", file_info_size) + file_info_json + encrypted_data
+        # 文件数据作为单独的缓冲区分散/聚集发送，不与文件信息拼接
+        file_header = struct.pack("!I", file_info_size) + file_info_json
         
-        return self._send_message(self.MSG_TYPE_FILE, payload)
+        return self._send_message(self.MSG_TYPE_FILE, [file_header, encrypted_data])
     
-    def send_file_request(self, file_path):
+    def new_transfer_id(self):
+        """
+        生成分块文件传输的传输ID
+        :return: 32位随机整数
+        """
+        return int.from_bytes(os.urandom(4), 'big')
+    
+    def send_file_start(self, transfer_id, file_path, file_size, chunk_size, file_hash=None, compression=None):
+        """
+        发送分块文件传输的开始消息
+        :param transfer_id: 传输ID
+        :param file_path: 文件路径
+        :param file_size: 文件大小(明文字节数)
+        :param chunk_size: 每个数据块的明文字节数
+        :param file_hash: 文件内容的SHA-256摘要(十六进制)，接收方据此保存可续传的部分文件
+        :param compression: 数据块加密前使用的压缩方法，为None时不压缩
+        :return: Future，消息写入套接字后结果为True，发送失败为False
+        """
+        file_info = {
+            'transfer_id': transfer_id,
+            'name': os.path.basename(file_path),
+            'size': file_size,
+            'chunk_size': chunk_size,
+            'mode': self.cipher_mode,
+            'timestamp': time.time()
+        }
+        if file_hash:
+            file_info['hash'] = file_hash
+        if compression and compression != self.COMPRESSION_NONE:
+            file_info['compression'] = compression
+        data = json.dumps(file_info).encode('utf-8')
+        return self._send_message(self.MSG_TYPE_FILE_START, data)
+    
+    def send_file_chunk(self, transfer_id, seq, encrypted_chunk):
+        """
+        发送分块文件传输的一个数据块
+        :param transfer_id: 传输ID
+        :param seq: 块序号(从0开始)
+        :param encrypted_chunk: 已加密的数据块(支持缓冲区协议的对象，在Future结束前不能修改)
+        :return: Future，消息写入套接字后结果为True，发送失败为False
+        """
+        chunk_header = struct.pack("!II", transfer_id, seq)
+        return self._send_message(self.MSG_TYPE_FILE_CHUNK, [chunk_header, encrypted_chunk])
+    
+    def send_file_end(self, transfer_id, chunk_count):
+        """
+        发送分块文件传输的结束消息
+        :param transfer_id: 传输ID
+        :param chunk_count: 已发送的数据块总数
+        :return: Future，消息写入套接字后结果为True，发送失败为False
         """
-        发送文件传输请求
+        end_info = {
+            'transfer_id': transfer_id,
+            'chunks': chunk_count
+        }
+        data = json.dumps(end_info).encode('utf-8')
+        return self._send_message(self.MSG_TYPE_FILE_END, data)
+    
+    def send_file_request(self, file_path, file_hash, chunk_size):
+        """
+        发送文件传输请求，接收方以send_file_response答复需要发送哪些数据块
         :param file_path: 要传输的文件路径
-        :return: 是否发送成功
+        :param file_hash: 文件内容的SHA-256摘要(十六进制)
+        :param chunk_size: 每个数据块的明文字节数
+        :return: Future，消息写入套接字后结果为True，发送失败为False
         """
         file_name = os.path.basename(file_path)
         file_size = os.path.getsize(file_path)
@@ -212,36 +611,185 @@ class NetworkManager:
         file_info = {
             'name': file_name,
             'size': file_size,
-            'path': file_path,
+            'hash': file_hash,
+            'chunk_size': chunk_size,
             'timestamp': time.time()
         }
         
         data = json.dumps(file_info).encode('utf-8')
         return self._send_message(self.MSG_TYPE_FILE_REQUEST, data)
     
+    def send_file_response(self, file_hash, status, have=None):
+        """
+        答复文件传输请求
+        :param file_hash: 请求中的文件摘要
+        :param status: 答复状态(FILE_STATUS_*)
+        :param have: 已有的数据块范围列表[[起始块序号, 结束块序号), ...]
+        :return: Future，消息写入套接字后结果为True，发送失败为False
+        """
+        return self._send_message(self.MSG_TYPE_FILE_RESPONSE, self.encode_file_response(file_hash, status, have))
+    
+    @staticmethod
+    def encode_file_response(file_hash, status, have=None):
+        """
+        编码文件请求答复消息的内容
+        :param file_hash: 请求中的文件摘要
+        :param status: 答复状态(FILE_STATUS_*)
+        :param have: 已有的数据块范围列表[[起始块序号, 结束块序号), ...]
+        :return: 消息数据
+        """
+        response = {
+            'hash': file_hash,
+            'status': status,
+            'have': have or []
+        }
+        return json.dumps(response).encode('utf-8')
+    
+    def send_session_ticket(self, ticket, lifetime):
+        """
+        发送会话票据(服务器)
+        :param ticket: 票据
+        :param lifetime: 票据有效期(秒)
+        :return: Future，消息写入套接字后结果为True，发送失败为False
+        """
+        return self._send_message(self.MSG_TYPE_SESSION_TICKET, [struct.pack("!I", lifetime), ticket])
+    
+    def send_session_resume(self, nonce, ticket=b''):
+        """
+        发送恢复会话消息: 客户端出示票据和自己的随机数，服务器接受时只回复自己的随机数
+        :param nonce: 本端随机数(SESSION_NONCE_SIZE字节)
+        :param ticket: 会话票据(只有客户端发送)
+        :return: Future，消息写入套接字后结果为True，发送失败为False
+        """
+        return self._send_message(self.MSG_TYPE_SESSION_RESUME, [nonce, ticket])
+    
     def _send_message(self, msg_type, data):
         """
-        发送消息
+        发送一条消息，先发送当前批次中的消息以保持消息顺序
+        协议控制消息(CONTROL_MESSAGE_TYPES)不受高水位限制
         :param msg_type: 消息类型
-        :param data: 消息数据
-        :return: 是否发送成功
+        :param data: 消息数据，或依次组成消息数据的缓冲区列表(分散/聚集发送，不拼接)
+        :return: Future，消息写入套接字后结果为True，发送失败为False
+        """
+        if self._batch:
+            self._flush_batch()
+        return self._enqueue_message(msg_type, data, block=msg_type not in self.CONTROL_MESSAGE_TYPES)
+    
+    def _wait_for_send_window(self):
         """
+        队列中的数据超过高水位时阻塞调用方，直到发送线程把队列降到低水位以下(或连接断开)
+        """
+        with self._send_condition:
+            while self._send_paused and self.connected:
+                self._send_condition.wait()
+    
+    def _enqueue_message(self, msg_type, data, block=True):
+        """
+        把消息放入发送队列，由发送线程写入套接字
+        :param msg_type: 消息类型
+        :param data: 消息数据，或依次组成消息数据的缓冲区列表(分散/聚集发送，不拼接)
+        :param block: 队列中的数据超过高水位时是否先阻塞调用方，直到发送线程把队列降到低水位以下
+        :return: Future，消息写入套接字后结果为True，发送失败为False
+        """
+        future = Future()
         if not self.connected or not self.connection:
-            return False
+            future.set_result(False)
+            return future
         
-        try:
-            # 准备消息头部 (消息类型和消息长度)
-            header = struct.pack("!II", msg_type, len(data))
+        parts = data if isinstance(data, list) else [data]
+        data_len = sum(memoryview(part).nbytes for part in parts)
+        
+        # 准备消息头部 (消息类型和消息长度)
+        header = struct.pack("!II", msg_type, data_len)
+        buffers = [header] + parts
+        size = len(header) + data_len
+        
+        with self._send_condition:
+            while block and self._send_paused and self.connected:
+                self._send_condition.wait()
+            if not self.connected:
+                future.set_result(False)
+                return future
+            self._send_queue.append((buffers, size, future))
+            self._queued_bytes += size
+            if self._queued_bytes >= self.send_high_watermark:
+                self._send_paused = True
+            self._send_condition.notify_all()
+        return future
+    
+    def _start_writer(self):
+        """
+        启动当前连接的发送线程
+        """
+        self._writer_thread = threading.Thread(target=self._write_messages, daemon=True)
+        self._writer_thread.start()
+    
+    def _write_messages(self):
+        """
+        发送线程：按顺序把发送队列中的消息写入套接字
+        """
+        while True:
+            with self._send_condition:
+                while not self._send_queue and self.connected:
+                    self._send_condition.wait()
+                if not self._send_queue:
+                    break
+                buffers, size, future = self._send_queue[0]
             
-            # 发送头部和数据
-            self.connection.sendall(header + data)
-            return True
-        except Exception as e:
-            print(f"发送消息时出错: {e}")
-            self.connected = False
-            if self.connection_callback:
-                self.connection_callback(False)
-            return False
+            try:
+                self._send_buffers(buffers)
+                success = True
+            except Exception as e:
+                print(f"发送消息时出错: {e}")
+                success = False
+            
+            with self._send_condition:
+                self._send_queue.popleft()
+                self._queued_bytes -= size
+                if self._send_paused and self._queued_bytes <= self.send_low_watermark:
+                    self._send_paused = False
+                    self._send_condition.notify_all()
+            future.set_result(success)
+            
+            if not success:
+                was_connected = self.connected
+                self.connected = False
+                if was_connected and self.connection_callback:
+                    self.connection_callback(False)
+                break
+        
+        # 连接已断开，队列中剩余的消息全部失败
+        with self._send_condition:
+            pending = list(self._send_queue)
+            self._send_queue.clear()
+            self._queued_bytes = 0
+            self._send_paused = False
+            self._send_condition.notify_all()
+        for _, _, future in pending:
+            future.set_result(False)
+    
+    def _send_buffers(self, buffers):
+        """
+        使用sendmsg分散/聚集写入多个缓冲区，不需要先拼接头部和数据
+        缓冲区较多时每次最多传入IOV_MAX个
+        :param buffers: 要依次发送的缓冲区列表
+        """
+        connection = self.connection
+        if not hasattr(connection, 'sendmsg'):
+            # 不支持sendmsg的平台逐个发送
+            for buffer in buffers:
+                connection.sendall(buffer)
+            return
+        
+        views = [memoryview(buffer).cast('B') for buffer in buffers]
+        views = collections.deque(view for view in views if len(view))
+        while views:
+            sent = connection.sendmsg(list(itertools.islice(views, self.IOV_MAX)))
+            while views and sent >= len(views[0]):
+                sent -= len(views[0])
+                views.popleft()
+            if sent:
+                views[0] = views[0][sent:]
     
     def set_connection_callback(self, callback):
         """
@@ -260,7 +808,7 @@ class NetworkManager:
     def set_dh_key_callback(self, callback):
         """
         设置Diffie-Hellman公钥接收回调
-        :param callback: 回调函数(public_key) -> None
+        :param callback: 回调函数(public_key, group_id) -> None，对方未发送组编号时group_id为None
         """
         self.dh_key_callback = callback
     
@@ -278,12 +826,74 @@ class NetworkManager:
         """
         self.file_request_callback = callback
     
+    def set_file_response_callback(self, callback):
+        """
+        设置文件请求答复回调
+        :param callback: 回调函数(response) -> None
+        """
+        self.file_response_callback = callback
+    
+    def set_session_ticket_callback(self, callback):
+        """
+        设置会话票据接收回调
+        :param callback: 回调函数(ticket, lifetime) -> None
+        """
+        self.session_ticket_callback = callback
+    
+    def set_session_resume_callback(self, callback):
+        """
+        设置恢复会话消息回调
+        :param callback: 回调函数(nonce, ticket) -> None，服务器的回复中ticket为空
+        """
+        self.session_resume_callback = callback
+    
+    def set_cipher_mode_callback(self, callback):
+        """
+        设置工作模式协商结果回调
+        :param callback: 回调函数(cipher_mode) -> None
+        """
+        self.cipher_mode_callback = callback
+    
+    def set_file_start_callback(self, callback):
+        """
+        设置分块文件传输开始回调
+        :param callback: 回调函数(transfer_id, file_info) -> None
+        """
+        self.file_start_callback = callback
+    
+    def set_file_chunk_callback(self, callback):
+        """
+        设置分块文件传输数据块回调
+        :param callback: 回调函数(transfer_id, seq, encrypted_chunk) -> None
+        """
+        self.file_chunk_callback = callback
+    
+    def set_file_end_callback(self, callback):
+        """
+        设置分块文件传输结束回调
+        :param callback: 回调函数(transfer_id, end_info) -> None
+        """
+        self.file_end_callback = callback
+    
     def close(self):
         """
         关闭连接
+        不再接受新消息，等待发送线程写完队列中已有的消息(最多CLOSE_TIMEOUT秒)后关闭套接字
         """
-        self.connected = False
+        # 当前批次中的消息放入发送队列，和队列中的其他消息一起发送
+        self._flush_batch()
+        with self._send_condition:
+            self.connected = False
+            self._send_condition.notify_all()
+        writer = self._writer_thread
+        if writer is not None and writer is not threading.current_thread():
+            writer.join(self.CLOSE_TIMEOUT)
         if self.connection:
+            try:
+                # 先关闭双向连接，唤醒阻塞在recv中的接收线程并向对方发送FIN
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
             try:
                 self.connection.close()
             except:
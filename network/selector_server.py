@@ -0,0 +1,641 @@
+import selectors
+import socket
+import struct
+import threading
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from crypto.des import DESCipher
+from crypto.diffie_hellman import DiffieHellman
+from network.communication import NetworkManager
+
+
+class FrameReader:
+    """
+    增量解析 [消息类型(4字节)][消息长度(4字节)][消息内容] 格式的帧
+    消息长度来自尚未认证的对方，超过上限时拒绝；缓冲区随数据到达逐步增长，不按声明的长度预先分配
+    """
+
+    def __init__(self, max_frame_size=NetworkManager.MAX_FRAME_SIZE):
+        """
+        初始化帧解析器
+        :param max_frame_size: 允许的最大消息长度(字节)
+        """
+        self.max_frame_size = max_frame_size
+        self.__header = bytearray()
+        self.__msg_type = None
+        self.__msg_len = 0
+        self.__payload = None
+
+    def feed(self, data):
+        """
+        输入新收到的数据
+        :param data: 新收到的数据
+        :return: 已完整接收的帧列表 [(消息类型, 消息内容memoryview)]
+        :raises ValueError: 消息长度超过上限
+        """
+        frames = []
+        view = memoryview(data)
+        pos = 0
+        while True:
+            if self.__payload is None:
+                # 读取头部
+                take = min(8 - len(self.__header), len(view) - pos)
+                self.__header += view[pos:pos + take]
+                pos += take
+                if len(self.__header) < 8:
+                    break
+                self.__msg_type, self.__msg_len = struct.unpack("!II", self.__header)
+                if self.__msg_len > self.max_frame_size:
+                    raise ValueError(f"消息长度超过上限: {self.__msg_len}")
+                self.__header = bytearray()
+                self.__payload = bytearray()
+            else:
+                # 读取消息内容
+                take = min(self.__msg_len - len(self.__payload), len(view) - pos)
+                self.__payload += view[pos:pos + take]
+                pos += take
+
+            if len(self.__payload) == self.__msg_len:
+                frames.append((self.__msg_type, memoryview(self.__payload)))
+                self.__payload = None
+            elif pos == len(view):
+                break
+        return frames
+
+
+class SelectorConnection:
+    """
+    多路复用服务器中的一个连接，拥有独立的密钥交换和DES加密状态
+    """
+
+    def __init__(self, manager, sock, address):
+        """
+        初始化连接
+        :param manager: 所属的SelectorNetworkManager
+        :param sock: 非阻塞套接字
+        :param address: 对方地址
+        """
+        self.manager = manager
+        self.socket = sock
+        self.address = address
+        self.connected = True
+        self.reader = FrameReader()
+        self.out_buffer = bytearray()  # 等待发送的数据，可写时发送
+        self.dh = None
+        self.des = None
+        self.other_public_key = None
+        # 密钥对生成或共享密钥计算在工作线程中进行时为True，期间收到的消息按顺序暂存，完成后再处理
+        self.dh_pending = False
+        self.deferred_messages = []
+        # 协商完成前(或对方不支持协商时)使用CBC模式
+        self.cipher_mode = NetworkManager.CIPHER_MODE_CBC
+
+    def send_message(self, msg_type, data):
+        """
+        发送消息(线程安全)，数据先进入写缓冲区，由事件循环在套接字可写时发送
+        :param msg_type: 消息类型
+        :param data: 消息数据
+        :return: 是否已放入写缓冲区
+        """
+        return self.manager._queue_message(self, msg_type, data)
+
+    def send_encrypted_message(self, encrypted_data):
+        """
+        发送已加密的消息
+        :param encrypted_data: 已加密的数据
+        :return: 是否已放入写缓冲区
+        """
+        return self.send_message(NetworkManager.MSG_TYPE_TEXT, encrypted_data)
+
+    def send_text(self, message):
+        """
+        加密并发送文本消息
+        :param message: 消息内容(str或bytes)
+        :return: 是否已放入写缓冲区
+        """
+        if not self.des:
+            return False
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        encrypted_data, _ = self.des.encrypt(message)
+        return self.send_encrypted_message(encrypted_data)
+
+    def send_file_response(self, file_hash, status, have=None):
+        """
+        答复文件传输请求
+        :param file_hash: 请求中的文件摘要
+        :param status: 答复状态(NetworkManager.FILE_STATUS_*)
+        :param have: 已有的数据块范围列表[[起始块序号, 结束块序号), ...]
+        :return: 是否已放入写缓冲区
+        """
+        return self.send_message(NetworkManager.MSG_TYPE_FILE_RESPONSE,
+                                 NetworkManager.encode_file_response(file_hash, status, have))
+
+    def close(self):
+        """
+        关闭连接
+        """
+        self.manager._close_connection(self)
+
+
+class SelectorNetworkManager:
+    """
+    基于selectors(epoll/kqueue/select)的单线程多路复用服务器
+    所有连接使用非阻塞套接字，在同一个线程中完成接收、帧解析和发送
+    消息类型和帧格式与NetworkManager相同，回调函数的第一个参数为对应的SelectorConnection
+    """
+    # 每次从套接字读取的最大字节数
+    RECV_SIZE = 64 * 1024
+    # 每个连接写缓冲区的上限(字节)，超过时认为对方读取过慢，断开连接
+    MAX_OUT_BUFFER = 16 * 1024 * 1024
+
+    def __init__(self, host='127.0.0.1', port=9999, dh_factory=DiffieHellman, dh_workers=2,
+                 max_out_buffer=MAX_OUT_BUFFER):
+        """
+        初始化多路复用服务器
+        :param host: 主机地址
+        :param port: 端口号
+        :param dh_factory: 为每个连接创建DiffieHellman对象的可调用对象(在工作线程中调用)
+        :param dh_workers: 执行密钥对生成和共享密钥计算的工作线程数
+        :param max_out_buffer: 每个连接写缓冲区的上限(字节)
+        """
+        self.is_server = True
+        self.host = host
+        self.port = port
+        self.dh_factory = dh_factory
+        self.dh_workers = dh_workers
+        self.max_out_buffer = max_out_buffer
+        self.socket = None
+        self.selector = None
+        self.running = False
+        self.connections = set()
+        self.__lock = threading.Lock()
+        self.__pending_writes = set()
+        self.__pending_closes = set()
+        # 工作线程完成的任务 [(完成回调, Future)]，由事件循环线程调用完成回调
+        self.__completions = []
+        self.__executor = None
+        self.__loop_thread = None
+        self.__wakeup_r = None
+        self.__wakeup_w = None
+        self.connection_callback = None
+        self.message_callback = None
+        self.dh_key_callback = None
+        self.file_callback = None
+        self.file_request_callback = None
+        self.cipher_mode_callback = None
+        self.file_start_callback = None
+        self.file_chunk_callback = None
+        self.file_end_callback = None
+
+    def start(self):
+        """
+        启动服务器，事件循环运行在一个后台线程中
+        :return: 成功返回True，失败返回False
+        """
+        try:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.socket.bind((self.host, self.port))
+            self.socket.listen(socket.SOMAXCONN)
+            self.socket.setblocking(False)
+
+            self.selector = selectors.DefaultSelector()
+            self.selector.register(self.socket, selectors.EVENT_READ, self._accept)
+
+            # 其他线程发送消息时用于唤醒事件循环
+            self.__wakeup_r, self.__wakeup_w = socket.socketpair()
+            self.__wakeup_r.setblocking(False)
+            self.__wakeup_w.setblocking(False)
+            self.selector.register(self.__wakeup_r, selectors.EVENT_READ, self._on_wakeup)
+
+            # 模幂运算在工作线程中进行，不阻塞事件循环
+            self.__executor = ThreadPoolExecutor(max_workers=self.dh_workers)
+
+            self.running = True
+            self.__loop_thread = threading.Thread(target=self._serve, daemon=True)
+            self.__loop_thread.start()
+            return True
+        except Exception as e:
+            print(f"网络启动错误: {e}")
+            return False
+
+    def _serve(self):
+        """
+        事件循环
+        """
+        while self.running:
+            try:
+                events = self.selector.select(timeout=1.0)
+            except (OSError, ValueError):
+                break
+            for key, mask in events:
+                handler = key.data
+                if isinstance(handler, SelectorConnection):
+                    if mask & selectors.EVENT_READ:
+                        self._on_readable(handler)
+                    if mask & selectors.EVENT_WRITE and handler.connected:
+                        self._on_writable(handler)
+                else:
+                    handler()
+
+    def _accept(self):
+        """
+        接受新连接
+        """
+        try:
+            sock, address = self.socket.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        conn = SelectorConnection(self, sock, address)
+        self.connections.add(conn)
+        self.selector.register(sock, selectors.EVENT_READ, conn)
+        print(f"客户端 {address} 已连接")
+        # 在工作线程中生成密钥对，完成前收到的消息(包括客户端的公钥)暂存
+        conn.dh_pending = True
+        self._run_in_worker(self.dh_factory, lambda future: self.__on_dh_ready(conn, future))
+        if self.connection_callback:
+            self.connection_callback(conn, True)
+
+    def _wakeup(self):
+        """
+        唤醒事件循环(任何线程都可以调用)
+        唤醒套接字是非阻塞的: 缓冲区已满说明已有未处理的唤醒，不需要再写入，
+        事件循环线程自己调用时也不会因为写满而阻塞
+        """
+        try:
+            self.__wakeup_w.send(b'\0')
+        except (OSError, AttributeError):
+            pass
+
+    def _run_in_worker(self, func, on_done):
+        """
+        在工作线程中执行func，完成后通过唤醒套接字让事件循环线程调用on_done
+        :param func: 在工作线程中执行的函数
+        :param on_done: 完成回调(future) -> None，在事件循环线程中调用
+        """
+        def post(future):
+            with self.__lock:
+                self.__completions.append((on_done, future))
+            self._wakeup()
+        self.__executor.submit(func).add_done_callback(post)
+
+    def __on_dh_ready(self, conn, future):
+        """
+        密钥对生成完成(事件循环线程)
+        :param conn: 连接
+        :param future: 结果为DiffieHellman对象的Future
+        """
+        if not conn.connected:
+            return
+        try:
+            conn.dh = future.result()
+        except Exception as e:
+            print(f"生成密钥对时出错: {e}")
+            self._close_connection(conn)
+            return
+        self.__resume_connection(conn)
+
+    def __on_shared_secret(self, conn, public_key, future):
+        """
+        共享密钥计算完成(事件循环线程): 建立DES加密器
+        :param conn: 连接
+        :param public_key: 客户端公钥
+        :param future: 结果为共享密钥的Future
+        """
+        if not conn.connected:
+            return
+        try:
+            shared_secret = future.result()
+        except Exception as e:
+            print(f"处理消息时出错: {e}")
+        else:
+            conn.other_public_key = public_key
+            conn.des = DESCipher(shared_secret, mode=conn.cipher_mode)
+            if self.dh_key_callback:
+                self.dh_key_callback(conn, public_key, conn.dh.group_id)
+        self.__resume_connection(conn)
+
+    def __resume_connection(self, conn):
+        """
+        工作线程的任务完成后按顺序处理期间暂存的消息
+        :param conn: 连接
+        """
+        conn.dh_pending = False
+        deferred = conn.deferred_messages
+        conn.deferred_messages = []
+        for msg_type, data in deferred:
+            # 再次遇到需要工作线程的消息时，其后的消息会重新暂存
+            self._handle_message(conn, msg_type, data)
+
+    def _on_wakeup(self):
+        """
+        处理其他线程提交的发送请求和工作线程完成的任务
+        """
+        try:
+            while self.__wakeup_r.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self.__lock:
+            pending = self.__pending_writes
+            self.__pending_writes = set()
+            closes = self.__pending_closes
+            self.__pending_closes = set()
+            completions = self.__completions
+            self.__completions = []
+        for conn in closes:
+            self._close_connection(conn)
+        for conn in pending:
+            self._update_interest(conn)
+        for on_done, future in completions:
+            on_done(future)
+
+    def _update_interest(self, conn):
+        """
+        根据写缓冲区是否为空更新连接关注的事件
+        :param conn: 连接
+        """
+        if not conn.connected:
+            return
+        events = selectors.EVENT_READ
+        if conn.out_buffer:
+            events |= selectors.EVENT_WRITE
+        self.selector.modify(conn.socket, events, conn)
+
+    def _on_readable(self, conn):
+        """
+        连接可读：读取数据并增量解析出完整的帧
+        :param conn: 连接
+        """
+        try:
+            data = conn.socket.recv(self.RECV_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            print(f"接收消息时出错: {e}")
+            data = b''
+        if not data:
+            self._close_connection(conn)
+            return
+        try:
+            frames = conn.reader.feed(data)
+        except ValueError as e:
+            # 对方声明的消息长度异常，断开连接
+            print(f"接收消息时出错: {e}")
+            self._close_connection(conn)
+            return
+        for msg_type, payload in frames:
+            self._handle_message(conn, msg_type, payload)
+
+    def _on_writable(self, conn):
+        """
+        连接可写：尽可能多地发送写缓冲区中的数据
+        :param conn: 连接
+        """
+        with self.__lock:
+            try:
+                sent = conn.socket.send(conn.out_buffer)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                print(f"发送消息时出错: {e}")
+                sent = None
+            if sent is not None:
+                del conn.out_buffer[:sent]
+        if sent is None:
+            self._close_connection(conn)
+        elif not conn.out_buffer:
+            self._update_interest(conn)
+
+    def _queue_message(self, conn, msg_type, data):
+        """
+        把消息放入连接的写缓冲区
+        写缓冲区超过max_out_buffer时认为对方读取过慢，丢弃该消息并断开连接
+        :param conn: 连接
+        :param msg_type: 消息类型
+        :param data: 消息数据
+        :return: 是否已放入写缓冲区
+        """
+        if not conn.connected:
+            return False
+        on_loop = threading.current_thread() is self.__loop_thread
+        with self.__lock:
+            overflow = len(conn.out_buffer) + 8 + len(data) > self.max_out_buffer
+            first_overflow = overflow and conn not in self.__pending_closes
+            if overflow and not on_loop:
+                self.__pending_closes.add(conn)
+        if overflow:
+            if first_overflow:
+                print(f"客户端 {conn.address} 的写缓冲区超过上限，断开连接")
+            if on_loop:
+                self._close_connection(conn)
+            else:
+                self._wakeup()
+            return False
+        with self.__lock:
+            was_empty = not conn.out_buffer
+            conn.out_buffer += struct.pack("!II", msg_type, len(data))
+            conn.out_buffer += data
+            if was_empty and not on_loop:
+                self.__pending_writes.add(conn)
+        if was_empty:
+            if on_loop:
+                self._update_interest(conn)
+            else:
+                self._wakeup()
+        return True
+
+    def _close_connection(self, conn):
+        """
+        关闭连接并触发连接回调
+        :param conn: 连接
+        """
+        if not conn.connected:
+            return
+        conn.connected = False
+        self.connections.discard(conn)
+        try:
+            self.selector.unregister(conn.socket)
+        except (KeyError, ValueError):
+            pass
+        try:
+            conn.socket.close()
+        except OSError:
+            pass
+        if self.connection_callback:
+            self.connection_callback(conn, False)
+
+    def _handle_message(self, conn, msg_type, data):
+        """
+        处理接收到的消息，密钥交换和模式协商在内部完成，其余消息交给回调函数
+        :param conn: 连接
+        :param msg_type: 消息类型
+        :param data: 消息数据(memoryview)
+        """
+        if conn.dh_pending:
+            # 工作线程的任务完成前暂存消息，保持消息顺序
+            conn.deferred_messages.append((msg_type, data))
+            return
+        try:
+            if msg_type == NetworkManager.MSG_TYPE_DH_PUBLIC_KEY:
+                # 收到客户端公钥后回复自己的公钥(及所属的DH组)并建立DES加密器
+                # 按客户端使用的格式版本回复，尚不支持二进制格式的早期构建的客户端只能解析十进制文本
+                public_key, group_id, version = NetworkManager.decode_dh_public_key(data)
+                conn.send_message(NetworkManager.MSG_TYPE_DH_PUBLIC_KEY,
+                                  NetworkManager.encode_dh_public_key(conn.dh.get_public_key(), conn.dh.group_id,
+                                                                      conn.dh.key_size, version))
+                # 客户端使用的组与dh_factory决定的组不一致时，等待客户端换组后重新发送公钥
+                if group_id is not None and group_id != conn.dh.group_id:
+                    return
+                # 在工作线程中计算共享密钥，完成后建立DES加密器
+                legacy_kdf = version == NetworkManager.DH_KEY_VERSION_TEXT
+                dh = conn.dh
+                conn.dh_pending = True
+                self._run_in_worker(lambda: dh.generate_shared_secret(public_key, legacy_kdf),
+                                    lambda future: self.__on_shared_secret(conn, public_key, future))
+
+            elif msg_type == NetworkManager.MSG_TYPE_CIPHER_MODE:
+                # 接受客户端提议的模式(若支持)，并回复最终结果
+                mode = str(data, 'utf-8')
+                if mode not in NetworkManager.SUPPORTED_CIPHER_MODES:
+                    mode = NetworkManager.CIPHER_MODE_CBC
+                conn.cipher_mode = mode
+                if conn.des:
+                    conn.des.mode = mode
+                conn.send_message(NetworkManager.MSG_TYPE_CIPHER_MODE, mode.encode('utf-8'))
+                if self.cipher_mode_callback:
+                    self.cipher_mode_callback(conn, mode)
+
+            elif msg_type == NetworkManager.MSG_TYPE_TEXT:
+                if self.message_callback:
+                    self.message_callback(conn, data)
+
+            elif msg_type == NetworkManager.MSG_TYPE_BATCH:
+                # 批量消息，逐条交给消息回调
+                for record in NetworkManager.decode_batch(data):
+                    if self.message_callback:
+                        self.message_callback(conn, record)
+
+            elif msg_type == NetworkManager.MSG_TYPE_FILE:
+                file_info_size = struct.unpack("!I", data[:4])[0]
+                file_info = json.loads(str(data[4:4+file_info_size], 'utf-8'))
+                if self.file_callback:
+                    self.file_callback(conn, file_info, data[4+file_info_size:])
+
+            elif msg_type == NetworkManager.MSG_TYPE_FILE_REQUEST:
+                file_info = json.loads(str(data, 'utf-8'))
+                if self.file_request_callback:
+                    self.file_request_callback(conn, file_info)
+                else:
+                    # 没有回调决定如何答复时要求对方完整发送，对方不必等到超时
+                    conn.send_file_response(file_info.get('hash'), NetworkManager.FILE_STATUS_SEND)
+
+            elif msg_type == NetworkManager.MSG_TYPE_FILE_START:
+                file_info = json.loads(str(data, 'utf-8'))
+                if self.file_start_callback:
+                    self.file_start_callback(conn, file_info['transfer_id'], file_info)
+
+            elif msg_type == NetworkManager.MSG_TYPE_FILE_CHUNK:
+                transfer_id, seq = struct.unpack("!II", data[:8])
+                if self.file_chunk_callback:
+                    self.file_chunk_callback(conn, transfer_id, seq, data[8:])
+
+            elif msg_type == NetworkManager.MSG_TYPE_FILE_END:
+                end_info = json.loads(str(data, 'utf-8'))
+                if self.file_end_callback:
+                    self.file_end_callback(conn, end_info['transfer_id'], end_info)
+
+        except Exception as e:
+            print(f"处理消息时出错: {e}")
+
+    def set_connection_callback(self, callback):
+        """
+        设置连接状态回调
+        :param callback: 回调函数(conn, connected) -> None
+        """
+        self.connection_callback = callback
+
+    def set_message_callback(self, callback):
+        """
+        设置消息接收回调
+        :param callback: 回调函数(conn, encrypted_data) -> None
+        """
+        self.message_callback = callback
+
+    def set_dh_key_callback(self, callback):
+        """
+        设置Diffie-Hellman公钥接收回调(此时连接的DES加密器已创建)
+        参数与NetworkManager的回调相同，只是多了第一个参数conn
+        :param callback: 回调函数(conn, public_key, group_id) -> None，使用自定义质数时group_id为None
+        """
+        self.dh_key_callback = callback
+
+    def set_file_callback(self, callback):
+        """
+        设置文件接收回调
+        :param callback: 回调函数(conn, file_info, encrypted_data) -> None
+        """
+        self.file_callback = callback
+
+    def set_file_request_callback(self, callback):
+        """
+        设置文件请求回调，回调函数须调用conn.send_file_response答复对方；
+        未设置时服务器总是答复FILE_STATUS_SEND
+        :param callback: 回调函数(conn, file_info) -> None
+        """
+        self.file_request_callback = callback
+
+    def set_cipher_mode_callback(self, callback):
+        """
+        设置工作模式协商结果回调
+        :param callback: 回调函数(conn, cipher_mode) -> None
+        """
+        self.cipher_mode_callback = callback
+
+    def set_file_start_callback(self, callback):
+        """
+        设置分块文件传输开始回调
+        :param callback: 回调函数(conn, transfer_id, file_info) -> None
+        """
+        self.file_start_callback = callback
+
+    def set_file_chunk_callback(self, callback):
+        """
+        设置分块文件传输数据块回调
+        :param callback: 回调函数(conn, transfer_id, seq, encrypted_chunk) -> None
+        """
+        self.file_chunk_callback = callback
+
+    def set_file_end_callback(self, callback):
+        """
+        设置分块文件传输结束回调
+        :param callback: 回调函数(conn, transfer_id, end_info) -> None
+        """
+        self.file_end_callback = callback
+
+    def close(self):
+        """
+        停止事件循环并关闭所有连接
+        """
+        self.running = False
+        if self.__loop_thread and self.__loop_thread is not threading.current_thread():
+            self._wakeup()
+            self.__loop_thread.join(timeout=2.0)
+        for conn in list(self.connections):
+            self._close_connection(conn)
+        if self.__executor:
+            self.__executor.shutdown(wait=False)
+            self.__executor = None
+        for sock in (self.socket, self.__wakeup_r, self.__wakeup_w):
+            if sock:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+        if self.selector:
+            self.selector.close()
+        self.socket = None
+        self.selector = None
@@ -0,0 +1,26 @@
+import os
+import sys
+import threading
+import time
+
+# 测试直接从仓库根目录导入 crypto/network/main 等模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeRoot:
+    """
+    代替Tk根窗口: after()在定时器线程中调用回调
+    """
+    def after(self, ms, func):
+        timer = threading.Timer(ms / 1000, func)
+        timer.daemon = True
+        timer.start()
+
+
+def wait_until(predicate, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return predicate()
@@ -0,0 +1,269 @@
+import contextlib
+import hashlib
+import io
+import os
+import socket
+import struct
+import time
+
+import pytest
+
+import main
+from conftest import FakeRoot, wait_until
+from crypto.diffie_hellman import DiffieHellman
+from network.communication import NetworkManager
+
+
+class FakeWidget:
+    def config(self, **kwargs):
+        pass
+
+
+class FakeWindow:
+    """
+    代替MainWindow: 记录所有界面调用 [(方法名, 参数)]
+    """
+    def __init__(self, *args, **kwargs):
+        self.log = []
+        self.root = FakeRoot()
+        self.status_label = FakeWidget()
+        self.connect_button = FakeWidget()
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            self.log.append((name, args))
+        return record
+
+    def calls(self, name):
+        return [args for method, args in list(self.log) if method == name]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def make_app(monkeypatch, tmp_path):
+    """
+    创建使用假界面的Application，接收目录位于临时目录中
+    """
+    monkeypatch.setattr(main, 'MainWindow', FakeWindow)
+    apps = []
+
+    def factory(name, **attrs):
+        app = main.Application()
+        received_dir = tmp_path / name
+        received_dir.mkdir()
+        app._get_received_dir = lambda: str(received_dir)
+        for key, value in attrs.items():
+            setattr(app, key, value)
+        apps.append(app)
+        return app
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield factory
+        for app in apps:
+            app.disconnect()
+
+
+@pytest.fixture
+def pair(make_app):
+    """
+    返回已完成密钥交换的(服务器, 客户端)
+    """
+    def connect(**attrs):
+        server = make_app('server', **attrs)
+        client = make_app('client', **attrs)
+        port = free_port()
+        server.start_server('127.0.0.1', port)
+        time.sleep(0.1)
+        client.connect_to_server('127.0.0.1', port)
+        assert wait_until(lambda: server.key_exchange_completed and client.key_exchange_completed)
+        return server, client
+    return connect
+
+
+def saved_path(app):
+    infos = app.window.calls('show_info')
+    return infos[-1][1].split('已保存到 ')[-1] if infos else None
+
+
+def test_text_message_round_trip(pair):
+    server, client = pair()
+    client.send_message("hello 你好")
+    assert wait_until(lambda: any(args[0] == "hello 你好" for args in server.window.calls('add_message')))
+
+
+def test_file_transfer(pair, tmp_path):
+    server, client = pair()
+    data = os.urandom(300000)
+    path = tmp_path / 'payload.bin'
+    path.write_bytes(data)
+    client.send_file(str(path))
+    assert wait_until(lambda: saved_path(server))
+    with open(saved_path(server), 'rb') as f:
+        assert f.read() == data
+
+
+def test_file_with_wrong_hash_is_discarded(pair, tmp_path, monkeypatch):
+    server, client = pair()
+    path = tmp_path / 'payload.bin'
+    path.write_bytes(os.urandom(200000))
+    # 发送方声明的摘要与实际内容不一致
+    monkeypatch.setattr(client, '_Application__hash_file', lambda job, f, size: 'ab' * 32)
+    client.send_file(str(path))
+    assert wait_until(lambda: any('摘要不一致' in args[1] for args in server.window.calls('show_error')))
+    assert not server.window.calls('show_info')
+    received_dir = server._get_received_dir()
+    assert os.listdir(received_dir) in ([], ['.index.json'])
+
+
+def test_index_records_locally_computed_hash(pair, tmp_path, monkeypatch):
+    server, client = pair()
+    data = os.urandom(100000)
+    path = tmp_path / 'payload.bin'
+    path.write_bytes(data)
+    # 不带摘要的传输(例如旧版本的发送方)也以本端计算的摘要加入索引
+    monkeypatch.setattr(main.Application, '_Application__valid_file_hash', lambda self, file_hash: False)
+    client.send_file(str(path))
+    assert wait_until(lambda: saved_path(server))
+    entries = server._get_received_index().entries
+    assert [entry['hash'] for entry in entries.values()] == [hashlib.sha256(data).hexdigest()]
+
+
+def test_large_cbc_file_uses_parallel_decrypt(pair, monkeypatch):
+    server, client = pair()
+    monkeypatch.setattr(main.DESCipher, 'PARALLEL_MIN_SIZE', 4096)
+    monkeypatch.setattr(server, 'RECEIVE_WINDOW_SIZE', 8192)
+    calls = []
+    original = main.DESCipher.decrypt_cbc_parallel
+    monkeypatch.setattr(main.DESCipher, 'decrypt_cbc_parallel',
+                        lambda self, iv, data, *args: calls.append(len(data)) or original(self, iv, data, *args))
+    data = os.urandom(50000)
+    encrypted, _ = client.des.encrypt(data, mode=main.DESCipher.MODE_CBC)
+    server._on_encrypted_file_received({'name': 'cbc.bin', 'mode': main.DESCipher.MODE_CBC}, encrypted)
+    assert wait_until(lambda: saved_path(server))
+    # 每个接收窗口各自并行解密
+    assert len(calls) == -(-len(encrypted) // 8192)
+    with open(saved_path(server), 'rb') as f:
+        assert f.read() == data
+
+
+def test_reconnect_resumes_session(pair):
+    server, client = pair()
+    address = client.server_address
+    assert wait_until(lambda: client.session_cache.get(address))
+    first_key = bytes(client.des.key)
+
+    client.disconnect()
+    server.disconnect()
+    server.start_server(*address)
+    time.sleep(0.1)
+    client.connect_to_server(*address)
+    assert wait_until(lambda: server.key_exchange_completed and client.key_exchange_completed)
+
+    for app in (server, client):
+        assert wait_until(lambda: app.window.calls('set_encryption_status')[-1][0].startswith("会话已恢复"))
+    assert bytes(client.des.key) == bytes(server.des.key) != first_key
+    client.send_message("resumed")
+    assert wait_until(lambda: any(args[0] == "resumed" for args in server.window.calls('add_message')))
+
+
+def read_frame(sock):
+    """
+    从原始套接字读取一帧 (消息类型, 消息内容)
+    """
+    def recv_exact(size):
+        data = b''
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            assert chunk, "连接已关闭"
+            data += chunk
+        return data
+    msg_type, msg_len = struct.unpack("!II", recv_exact(8))
+    return msg_type, recv_exact(msg_len)
+
+
+def test_client_falls_back_to_text_dh_key(make_app):
+    # 只能解析十进制文本公钥的旧版本服务器: 收到二进制公钥时不回复
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    client = make_app('client', DH_KEY_TIMEOUT=0.5)
+    client.connect_to_server(*listener.getsockname())
+    peer, _ = listener.accept()
+    listener.close()
+    peer.settimeout(10)
+    try:
+        keys = []
+        while len(keys) < 2:
+            msg_type, data = read_frame(peer)
+            if msg_type == NetworkManager.MSG_TYPE_DH_PUBLIC_KEY:
+                keys.append(NetworkManager.decode_dh_public_key(data))
+        assert keys[0][2] == NetworkManager.DH_KEY_VERSION_BINARY
+        assert keys[1] == (client.dh.get_public_key(), None, NetworkManager.DH_KEY_VERSION_TEXT)
+
+        # 服务器以十进制文本回复后，双方按旧版本的密钥派生得到相同的密钥
+        server_dh = DiffieHellman(short_exponent=False)
+        reply = str(server_dh.get_public_key()).encode('utf-8')
+        peer.sendall(struct.pack("!II", NetworkManager.MSG_TYPE_DH_PUBLIC_KEY, len(reply)) + reply)
+        assert wait_until(lambda: client.key_exchange_completed)
+        assert bytes(client.des.key) == server_dh.generate_shared_secret(keys[1][0], legacy_kdf=True)
+    finally:
+        peer.close()
+
+
+def connect_pair(make_app, server_attrs, client_attrs):
+    server = make_app('server', **server_attrs)
+    client = make_app('client', **client_attrs)
+    port = free_port()
+    server.start_server('127.0.0.1', port)
+    time.sleep(0.1)
+    client.connect_to_server('127.0.0.1', port)
+    return server, client
+
+
+def test_server_adopts_acceptable_client_group(make_app):
+    server, client = connect_pair(make_app, {}, {'dh_group': 15})
+    assert wait_until(lambda: server.key_exchange_completed and client.key_exchange_completed)
+    assert server.dh.group_id == client.dh.group_id == 15
+    assert bytes(server.des.key) == bytes(client.des.key)
+
+
+def test_client_switches_to_server_group(make_app):
+    # 服务器不接受1536位的组，回复自己的组，客户端换组后重新发送公钥
+    server, client = connect_pair(make_app, {}, {'dh_group': 5})
+    assert wait_until(lambda: server.key_exchange_completed and client.key_exchange_completed)
+    assert server.dh.group_id == client.dh.group_id == 14
+    assert bytes(server.des.key) == bytes(client.des.key)
+
+
+def test_client_refuses_unknown_server_group(make_app):
+    server, client = connect_pair(make_app, {'dh_group': 15, 'dh_groups': (15,)}, {'dh_groups': (14,)})
+    assert wait_until(lambda: any('不被接受' in args[1] for args in client.window.calls('show_error')))
+    assert not client.key_exchange_completed
+    assert not server.key_exchange_completed
+
+
+@pytest.mark.parametrize('mode', main.DESCipher.MODES)
+def test_received_file_is_decrypted_in_bounded_windows(pair, monkeypatch, mode):
+    server, client = pair()
+    window = 8192
+    monkeypatch.setattr(main.DESCipher, 'PARALLEL_MIN_SIZE', 4096)
+    monkeypatch.setattr(server, 'RECEIVE_WINDOW_SIZE', window)
+    writes = []
+    original = main.ReceivedFile.write
+    monkeypatch.setattr(main.ReceivedFile, 'write', lambda self, data: writes.append(len(data)) or original(self, data))
+    data = os.urandom(60000)
+    encrypted, _ = client.des.encrypt(data, mode=mode)
+    assert len(encrypted) >= main.DESCipher.PARALLEL_MIN_SIZE
+    server._on_encrypted_file_received({'name': 'windowed.bin', 'mode': mode}, encrypted)
+    assert wait_until(lambda: saved_path(server))
+    # 每次写入的明文不超过一个接收窗口
+    assert sum(writes) == len(data)
+    assert max(writes) <= window
+    assert len(writes) > len(data) // window
+    with open(saved_path(server), 'rb') as f:
+        assert f.read() == data
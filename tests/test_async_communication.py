@@ -0,0 +1,144 @@
+import asyncio
+import contextlib
+import io
+import os
+import struct
+import time
+
+from crypto.des import DESCipher
+from crypto.diffie_hellman import DiffieHellman
+from network.async_communication import AsyncNetworkManager
+from network.communication import NetworkManager
+
+
+async def start_server(**kwargs):
+    server = AsyncNetworkManager(is_server=True, port=0, **kwargs)
+    assert await server.start()
+    server.port = server.server.sockets[0].getsockname()[1]
+    return server
+
+
+async def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        await asyncio.sleep(0.01)
+    return predicate()
+
+
+def run(coro):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return asyncio.run(coro)
+
+
+def test_text_round_trip():
+    async def main():
+        server = await start_server()
+        client = AsyncNetworkManager(port=server.port)
+        session = await client.connect()
+        await session.send_text("hello")
+        peer = next(iter(server.sessions))
+        assert await asyncio.wait_for(peer.receive(), 5) == (NetworkManager.MSG_TYPE_TEXT, b"hello")
+        await client.close()
+        await server.close()
+    run(main())
+
+
+def test_file_request_is_answered_by_default(tmp_path):
+    path = tmp_path / 'a.bin'
+    path.write_bytes(b'data')
+
+    async def main():
+        server = await start_server()
+        responses = []
+        client = NetworkManager(port=server.port)
+        client.set_file_response_callback(responses.append)
+        loop = asyncio.get_running_loop()
+        assert await loop.run_in_executor(None, client.start)
+        client.send_file_request(str(path), 'cd' * 32, 1024)
+        try:
+            assert await wait_until(lambda: responses, timeout=2)
+            assert responses[0]['status'] == NetworkManager.FILE_STATUS_SEND
+            assert responses[0]['hash'] == 'cd' * 32
+        finally:
+            await loop.run_in_executor(None, client.close)
+            await server.close()
+    run(main())
+
+
+def test_batched_messages_from_sync_client():
+    async def main():
+        server = await start_server()
+        dh = DiffieHellman()
+        keys = []
+        client = NetworkManager(port=server.port, batch_window=0.05)
+        client.set_dh_key_callback(lambda public_key, group_id: keys.append(dh.generate_shared_secret(public_key)))
+        loop = asyncio.get_running_loop()
+        assert await loop.run_in_executor(None, client.start)
+        client.send_dh_public_key(dh.get_public_key(), dh.group_id, dh.key_size)
+        try:
+            assert await wait_until(lambda: keys and server.sessions)
+            des = DESCipher(keys[0])
+            for i in range(10):
+                client.send_encrypted_message(des.encrypt(f'msg {i}'.encode())[0])
+            peer = next(iter(server.sessions))
+            received = [await asyncio.wait_for(peer.receive(), 5) for _ in range(10)]
+            assert received == [(NetworkManager.MSG_TYPE_TEXT, f'msg {i}'.encode()) for i in range(10)]
+        finally:
+            await loop.run_in_executor(None, client.close)
+            await server.close()
+    run(main())
+
+
+def test_oversized_frame_drops_connection():
+    async def main():
+        server = await start_server()
+        closed = []
+        server.set_connection_callback(lambda session, connected: connected or closed.append(session))
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+        writer.write(struct.pack("!II", NetworkManager.MSG_TYPE_TEXT, NetworkManager.MAX_FRAME_SIZE + 1))
+        await writer.drain()
+        assert await asyncio.wait_for(reader.read(1), 5) == b''
+        assert await wait_until(lambda: closed)
+        writer.close()
+        await server.close()
+    run(main())
+
+
+def test_dh_key_callback_matches_network_manager():
+    async def main():
+        server = await start_server()
+        calls = []
+        server.set_dh_key_callback(lambda session, public_key, group_id: calls.append((public_key, group_id)))
+        client = AsyncNetworkManager(port=server.port)
+        session = await client.connect()
+        assert await wait_until(lambda: calls)
+        assert calls == [(session.dh.get_public_key(), session.dh.group_id)]
+        await client.close()
+        await server.close()
+    run(main())
+
+
+def test_send_file(tmp_path):
+    data = os.urandom(200000)
+    path = tmp_path / 'a.bin'
+    path.write_bytes(data)
+
+    async def main():
+        server = await start_server()
+        client = AsyncNetworkManager(port=server.port, cipher_mode=NetworkManager.CIPHER_MODE_CTR)
+        session = await client.connect()
+        assert await session.send_file(str(path))
+        peer = next(iter(server.sessions))
+        chunks = {}
+        while True:
+            msg_type, content = await asyncio.wait_for(peer.receive(), 5)
+            if msg_type == NetworkManager.MSG_TYPE_FILE_CHUNK:
+                chunks[content[1]] = content[2]
+            elif msg_type == NetworkManager.MSG_TYPE_FILE_END:
+                break
+        assert b''.join(chunks[seq] for seq in sorted(chunks)) == data
+        await client.close()
+        await server.close()
+    run(main())
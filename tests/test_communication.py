@@ -0,0 +1,241 @@
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from network.communication import NetworkManager
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def listener():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(1)
+    yield sock
+    sock.close()
+
+
+def connect(listener, **kwargs):
+    """
+    NetworkManager客户端连接到listener，返回(客户端, 服务器端原始套接字)
+    """
+    client = NetworkManager(port=listener.getsockname()[1], **kwargs)
+    assert client.start()
+    peer, _ = listener.accept()
+    return client, peer
+
+
+def test_oversized_frame_drops_connection(listener):
+    states = []
+    client = NetworkManager(port=listener.getsockname()[1])
+    client.set_connection_callback(states.append)
+    assert client.start()
+    peer, _ = listener.accept()
+    try:
+        peer.sendall(struct.pack("!II", NetworkManager.MSG_TYPE_TEXT, NetworkManager.MAX_FRAME_SIZE + 1))
+        assert wait_until(lambda: states == [True, False])
+        assert not client.connected
+        peer.settimeout(5)
+        assert peer.recv(1) == b''
+    finally:
+        peer.close()
+        client.close()
+
+
+def test_short_reads_are_reassembled(listener):
+    received = []
+    client, peer = connect(listener)
+    client.set_message_callback(lambda data: received.append(bytes(data)))
+    try:
+        data = b''.join(struct.pack("!II", NetworkManager.MSG_TYPE_TEXT, len(p)) + p
+                        for p in (b'first', b'', b'x' * 100000))
+        for i in range(0, len(data), 7):
+            peer.sendall(data[i:i + 7])
+        assert wait_until(lambda: len(received) == 3)
+        assert received == [b'first', b'', b'x' * 100000]
+    finally:
+        peer.close()
+        client.close()
+
+
+def read_frames(sock, timeout=10):
+    """
+    从原始套接字读取帧直到对方关闭连接 [(消息类型, 消息内容)]
+    """
+    sock.settimeout(timeout)
+    buffer = b''
+    frames = []
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            break
+        buffer += data
+        while len(buffer) >= 8:
+            msg_type, msg_len = struct.unpack("!II", buffer[:8])
+            if len(buffer) < 8 + msg_len:
+                break
+            frames.append((msg_type, buffer[8:8 + msg_len]))
+            buffer = buffer[8 + msg_len:]
+    return frames
+
+
+def fill_send_queue(client):
+    """
+    对方不读取时持续发送，直到发送队列超过高水位
+    """
+    chunk = b'x' * 64 * 1024
+    while not client._send_paused:
+        client._enqueue_message(NetworkManager.MSG_TYPE_FILE_CHUNK, chunk, block=False)
+        time.sleep(0.001)
+
+
+def test_batch_lock_is_not_held_while_waiting_for_backpressure(listener):
+    client, peer = connect(listener, batch_window=0.01, batch_max_bytes=1024,
+                           send_high_watermark=256 * 1024, send_low_watermark=64 * 1024)
+    try:
+        fill_send_queue(client)
+        blocked = threading.Thread(target=lambda: client.send_encrypted_message(b'y' * 2048), daemon=True)
+        blocked.start()
+        time.sleep(0.2)
+        # 发送线程因高水位阻塞，但不持有批次锁，定时器线程和其他发送方仍然可以取得该锁
+        assert blocked.is_alive()
+        assert client._batch_lock.acquire(timeout=1)
+        client._batch_lock.release()
+    finally:
+        peer.close()
+        client.close()
+
+
+def test_control_replies_bypass_the_watermark(listener):
+    client, peer = connect(listener, send_high_watermark=256 * 1024, send_low_watermark=64 * 1024)
+    try:
+        fill_send_queue(client)
+        done = []
+        reply = threading.Thread(target=lambda: done.append(client.send_cipher_mode_proposal()), daemon=True)
+        reply.start()
+        reply.join(1)
+        assert done
+    finally:
+        peer.close()
+        client.close()
+
+
+def test_close_sends_queued_messages_first(listener):
+    client, peer = connect(listener, batch_window=10)
+    for i in range(200):
+        client.send_encrypted_message(b'%d' % i * 1000)
+    client.close()
+    frames = read_frames(peer)
+    peer.close()
+    records = []
+    for msg_type, payload in frames:
+        if msg_type == NetworkManager.MSG_TYPE_TEXT:
+            records.append(payload)
+            continue
+        assert msg_type == NetworkManager.MSG_TYPE_BATCH
+        offset = 0
+        while offset < len(payload):
+            size, = struct.unpack("!I", payload[offset:offset + 4])
+            records.append(payload[offset + 4:offset + 4 + size])
+            offset += 4 + size
+    assert records == [b'%d' % i * 1000 for i in range(200)]
+
+
+def test_buffer_list_longer_than_iov_max(listener):
+    client, peer = connect(listener)
+    parts = [b'%05d' % i for i in range(4 * NetworkManager.IOV_MAX + 3)]
+    try:
+        future = client._enqueue_message(NetworkManager.MSG_TYPE_FILE_CHUNK, parts)
+        assert future.result(timeout=10)
+        assert client.connected
+    finally:
+        client.close()
+    frames = read_frames(peer)
+    peer.close()
+    assert frames == [(NetworkManager.MSG_TYPE_FILE_CHUNK, b''.join(parts))]
+
+
+def test_large_batch_is_sent_as_one_frame(listener):
+    client, peer = connect(listener, batch_window=0.05)
+    messages = [b'%016d' % i for i in range(2000)]
+    try:
+        futures = [client.send_encrypted_message(message) for message in messages]
+        assert all(future.result(timeout=10) for future in futures)
+        assert client.connected
+    finally:
+        client.close()
+    frames = read_frames(peer)
+    peer.close()
+    records = []
+    for msg_type, payload in frames:
+        assert msg_type == NetworkManager.MSG_TYPE_BATCH
+        records.extend(NetworkManager.decode_batch(payload))
+    assert len(frames) < len(messages)
+    assert records == messages
+
+
+def test_dh_public_key_binary_round_trip():
+    data = NetworkManager.encode_dh_public_key(0x1234, 14, key_size=256)
+    # 版本字节 + 组编号 + 按质数字节数补齐的公钥
+    assert len(data) == 3 + 256
+    assert data[:3] == struct.pack('!BH', NetworkManager.DH_KEY_VERSION_BINARY, 14)
+    assert data[3:-2] == bytes(254)
+    assert NetworkManager.decode_dh_public_key(data) == (0x1234, 14, NetworkManager.DH_KEY_VERSION_BINARY)
+    # 自定义质数没有组编号
+    data = NetworkManager.encode_dh_public_key(0xABCDEF)
+    assert NetworkManager.decode_dh_public_key(memoryview(data)) == (0xABCDEF, None, NetworkManager.DH_KEY_VERSION_BINARY)
+
+
+def test_dh_public_key_text_decode():
+    text = NetworkManager.encode_dh_public_key(123456789, 14, version=NetworkManager.DH_KEY_VERSION_TEXT)
+    assert text == b'123456789'
+    assert NetworkManager.decode_dh_public_key(text) == (123456789, None, NetworkManager.DH_KEY_VERSION_TEXT)
+    # 没有任何版本发送"组编号:公钥"形式的文本
+    with pytest.raises(ValueError):
+        NetworkManager.decode_dh_public_key(b'15:987654321')
+
+
+@pytest.mark.parametrize('data', [b'\x02', b'\x02\x00', b'\x02\x00\x0e'])
+def test_truncated_binary_dh_public_key_is_rejected(data):
+    with pytest.raises(ValueError):
+        NetworkManager.decode_dh_public_key(data)
+
+
+def test_chunked_file_transfer_messages(listener):
+    # 原始套接字把客户端发出的帧原样转给另一个NetworkManager处理
+    events = []
+    client, peer = connect(listener)
+    receiver = NetworkManager()
+    receiver.set_file_start_callback(lambda transfer_id, info: events.append(('start', transfer_id, info)))
+    receiver.set_file_chunk_callback(lambda transfer_id, seq, chunk: events.append(('chunk', transfer_id, seq, bytes(chunk))))
+    receiver.set_file_end_callback(lambda transfer_id, info: events.append(('end', transfer_id, info)))
+    transfer_id = client.new_transfer_id()
+    chunks = [b'a' * 64, b'b' * 64, b'c' * 10]
+    try:
+        client.send_file_start(transfer_id, '/tmp/data.bin', 138, 64, file_hash='ab' * 32, compression='zlib')
+        for seq, chunk in enumerate(chunks):
+            client.send_file_chunk(transfer_id, seq, bytearray(chunk))
+        assert client.send_file_end(transfer_id, len(chunks)).result(timeout=5)
+    finally:
+        client.close()
+    for msg_type, payload in read_frames(peer):
+        receiver._handle_message(msg_type, memoryview(payload))
+    peer.close()
+
+    kind, start_id, info = events[0]
+    assert (kind, start_id) == ('start', transfer_id)
+    assert (info['name'], info['size'], info['chunk_size'], info['hash'], info['compression'], info['mode']) == \
+        ('data.bin', 138, 64, 'ab' * 32, 'zlib', NetworkManager.CIPHER_MODE_CBC)
+    assert events[1:4] == [('chunk', transfer_id, seq, chunk) for seq, chunk in enumerate(chunks)]
+    assert events[4] == ('end', transfer_id, {'transfer_id': transfer_id, 'chunks': 3})
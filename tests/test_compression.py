@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from crypto.compression import Compressor
+
+
+TEXT = "先压缩再加密 compress then encrypt\n".encode('utf-8') * 500
+
+
+@pytest.mark.parametrize('method, tag', [(Compressor.METHOD_ZLIB, Compressor.TAG_ZLIB),
+                                         (Compressor.METHOD_LZMA, Compressor.TAG_LZMA)])
+def test_round_trip_via_tag_byte(method, tag):
+    compressed = Compressor(method).compress(TEXT)
+    assert compressed[0] == tag
+    assert len(compressed) < len(TEXT)
+    # 解压方只根据标记字节选择方法
+    assert Compressor.decompress(compressed) == TEXT
+    assert Compressor(Compressor.METHOD_NONE).decompress(memoryview(compressed)) == TEXT
+
+
+@pytest.mark.parametrize('method', [Compressor.METHOD_NONE, Compressor.METHOD_ZLIB, Compressor.METHOD_LZMA])
+@pytest.mark.parametrize('data', [b'', b'short', os.urandom(4096)])
+def test_stored_passthrough(method, data):
+    # 不压缩、数据过短或压缩后没有变小时按原样保存
+    compressed = Compressor(method).compress(data)
+    assert compressed == bytes([Compressor.TAG_STORED]) + data
+    assert Compressor.decompress(compressed) == data
+
+
+@pytest.mark.parametrize('method', Compressor.METHODS)
+def test_max_size_rejects_decompression_bomb(method):
+    bomb = Compressor(method, level=9).compress(bytes(10 * 1024 * 1024))
+    assert len(bomb) < 64 * 1024
+    assert Compressor.decompress(bomb, max_size=1024 * 1024) is None
+    assert Compressor.decompress(bomb, max_size=10 * 1024 * 1024) == bytes(10 * 1024 * 1024)
+
+
+def test_invalid_data_is_rejected():
+    compressed = Compressor(Compressor.METHOD_ZLIB).compress(TEXT)
+    assert Compressor.decompress(b'') is None
+    assert Compressor.decompress(b'\x09' + TEXT) is None
+    assert Compressor.decompress(compressed[:len(compressed) // 2]) is None
+    assert Compressor.decompress(b'\x02garbage') is None
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        Compressor('bz2')
+
+
+def test_should_compress():
+    compressor = Compressor(Compressor.METHOD_ZLIB)
+    assert compressor.should_compress(TEXT, 'notes.txt')
+    assert compressor.should_compress(TEXT)
+    # 已经压缩过的文件类型按扩展名跳过(不区分大小写)，不论内容如何
+    for file_name in ('archive.zip', 'photo.JPG', 'movie.mp4', 'paper.pdf', 'backup.tar.gz'):
+        assert not compressor.should_compress(TEXT, file_name)
+    # 取样压缩率不理想或样本过短时跳过
+    assert not compressor.should_compress(os.urandom(64 * 1024), 'random.bin')
+    assert not compressor.should_compress(b'tiny', 'tiny.txt')
+    assert not Compressor(Compressor.METHOD_NONE).should_compress(TEXT, 'notes.txt')
@@ -0,0 +1,65 @@
+import threading
+
+from main import CryptoJobScheduler
+from conftest import FakeRoot, wait_until
+
+
+def blocking_job(release):
+    def func(job):
+        release.wait(5)
+    return func
+
+
+def submit_in_thread(scheduler, channel, func, **kwargs):
+    done = threading.Event()
+
+    def run():
+        scheduler.submit(channel, 'job', func, **kwargs)
+        done.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    return done
+
+
+def test_wait_blocks_while_channel_is_full():
+    scheduler = CryptoJobScheduler(FakeRoot(), channel_limits={'recv': 2})
+    release = threading.Event()
+    try:
+        for _ in range(2):
+            scheduler.submit('recv', 'job', blocking_job(release), wait=True)
+        done = submit_in_thread(scheduler, 'recv', blocking_job(release), wait=True)
+        assert not done.wait(0.3)
+        release.set()
+        assert done.wait(5)
+        assert wait_until(lambda: not scheduler.channels, timeout=5)
+    finally:
+        scheduler.shutdown()
+
+
+def test_submit_without_wait_never_blocks():
+    scheduler = CryptoJobScheduler(FakeRoot(), channel_limits={'recv': 1})
+    release = threading.Event()
+    try:
+        for _ in range(5):
+            scheduler.submit('recv', 'job', blocking_job(release))
+        # 未设置上限的通道即使wait=True也不阻塞
+        for _ in range(5):
+            scheduler.submit('send', 'job', blocking_job(release), wait=True)
+        assert len(scheduler.channels['recv']) == 5
+        assert len(scheduler.channels['send']) == 5
+    finally:
+        release.set()
+        scheduler.shutdown()
+
+
+def test_shutdown_releases_waiting_submitter():
+    scheduler = CryptoJobScheduler(FakeRoot(), channel_limits={'recv': 1})
+    release = threading.Event()
+    try:
+        scheduler.submit('recv', 'job', blocking_job(release))
+        done = submit_in_thread(scheduler, 'recv', blocking_job(release), wait=True)
+        assert not done.wait(0.3)
+        scheduler.shutdown()
+        assert done.wait(5)
+    finally:
+        release.set()
@@ -0,0 +1,206 @@
+import os
+import random
+
+import pytest
+
+from crypto.des import DESCipher
+
+
+# (密钥, 明文, 密文) 已知答案测试向量
+KNOWN_ANSWERS = [
+    ('133457799BBCDFF1', '0123456789ABCDEF', '85E813540F0AB405'),
+    ('0123456789ABCDEF', '4E6F772069732074', '3FA40E8A984D4815'),
+    ('0101010101010101', '95F8A5E5DD31D900', '8000000000000000'),
+    ('10316E028C8F3B4A', '0000000000000000', '82DCBAFBDEAB6602'),
+    ('0E329232EA6D0D73', '8787878787878787', '0000000000000000'),
+]
+
+ENGINES = [DESCipher.ENGINE_INT, DESCipher.ENGINE_BITS]
+
+
+def to_bits(value, width):
+    """
+    整数转换为高位在前的比特列表
+    """
+    return [(value >> (width - 1 - i)) & 1 for i in range(width)]
+
+
+def from_bits(bits):
+    """
+    高位在前的比特列表转换为整数
+    """
+    return int(''.join(str(bit) for bit in bits), 2)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('key, plaintext, ciphertext', KNOWN_ANSWERS)
+def test_known_answer(engine, key, plaintext, ciphertext):
+    cipher = DESCipher(bytes.fromhex(key), engine=engine, use_numpy=False)
+    assert cipher.encrypt_blocks(bytes.fromhex(plaintext)).hex().upper() == ciphertext
+    assert cipher.decrypt_blocks(bytes.fromhex(ciphertext)).hex().upper() == plaintext
+
+
+def test_f_function_table_matches_reference():
+    cipher = DESCipher(b'8bytekey', engine=DESCipher.ENGINE_INT)
+    reference = cipher._DESCipher__f_function
+    table = cipher._DESCipher__f_function_table
+    rng = random.Random(2024)
+    edge_cases = [(0, 0), (0xFFFFFFFF, 0xFFFFFFFFFFFF), (0x80000001, 0), (1, 0x800000000001)]
+    cases = edge_cases + [(rng.getrandbits(32), rng.getrandbits(48)) for _ in range(2000)]
+    for right, sub_key in cases:
+        expected = from_bits(reference(to_bits(right, 32), to_bits(sub_key, 48)))
+        assert table(right, sub_key) == expected, (hex(right), hex(sub_key))
+
+
+def test_f_function_table_with_real_sub_keys():
+    key = os.urandom(8)
+    bits_cipher = DESCipher(key, engine=DESCipher.ENGINE_BITS)
+    int_cipher = DESCipher(key, engine=DESCipher.ENGINE_INT)
+    # 两种引擎的子密钥编排一致
+    assert [from_bits(sub_key) for sub_key in bits_cipher.sub_keys] == list(int_cipher.sub_keys)
+    rng = random.Random(7)
+    for sub_key in int_cipher.sub_keys:
+        right = rng.getrandbits(32)
+        expected = from_bits(bits_cipher._DESCipher__f_function(to_bits(right, 32), to_bits(sub_key, 48)))
+        assert int_cipher._DESCipher__f_function_table(right, sub_key) == expected
+
+
+def test_engines_agree_on_random_blocks():
+    rng = random.Random(11)
+    for _ in range(20):
+        key = bytes(rng.getrandbits(8) for _ in range(8))
+        data = bytes(rng.getrandbits(8) for _ in range(64))
+        bits_cipher = DESCipher(key, engine=DESCipher.ENGINE_BITS)
+        int_cipher = DESCipher(key, engine=DESCipher.ENGINE_INT, use_numpy=False)
+        encrypted = int_cipher.encrypt_blocks(data)
+        assert bits_cipher.encrypt_blocks(data) == encrypted
+        assert bits_cipher.decrypt_blocks(encrypted) == data
+
+
+def test_numpy_backend_matches_scalar():
+    pytest.importorskip('numpy')
+    key = os.urandom(8)
+    data = os.urandom(64 * 1024)
+    scalar = DESCipher(key, use_numpy=False)
+    batched = DESCipher(key, use_numpy=True)
+    assert batched.encrypt_blocks(data) == scalar.encrypt_blocks(data)
+    assert batched.decrypt_blocks(data) == scalar.decrypt_blocks(data)
+
+
+@pytest.mark.parametrize('mode', DESCipher.MODES)
+@pytest.mark.parametrize('size', [0, 1, 7, 8, 9, 1000])
+def test_round_trip(mode, size):
+    cipher = DESCipher(b'roundtrp', mode=mode)
+    data = os.urandom(size)
+    encrypted, _ = cipher.encrypt(data)
+    assert len(encrypted) == cipher.encrypted_size(size)
+    decrypted, _ = cipher.decrypt(encrypted)
+    assert decrypted == data
+
+
+@pytest.mark.parametrize('mode', DESCipher.MODES)
+def test_encrypt_into_matches_encrypt(mode):
+    cipher = DESCipher(b'into-key', mode=mode)
+    data = os.urandom(1234)
+    out = bytearray(cipher.encrypted_size(len(data)))
+    written = cipher.encrypt_into(data, out)[0]
+    assert written == len(out)
+    decrypted, _ = cipher.decrypt(bytes(out))
+    assert decrypted == data
+
+
+def test_ctr_random_access():
+    cipher = DESCipher(b'ctr--key', mode=DESCipher.MODE_CTR)
+    nonce = os.urandom(8)
+    data = os.urandom(300)
+    whole = cipher.crypt_ctr(nonce, data)
+    for offset in (0, 3, 8, 13, 250):
+        assert cipher.crypt_ctr(nonce, data[offset:offset + 40], offset) == whole[offset:offset + 40]
+
+
+def test_ctr_counter_wraps():
+    cipher = DESCipher(b'wrapwrap', mode=DESCipher.MODE_CTR)
+    nonce = b'\xff' * 8
+    data = os.urandom(24)
+    assert cipher.crypt_ctr(nonce, cipher.crypt_ctr(nonce, data)) == data
+
+
+def test_cbc_rejects_bad_padding():
+    cipher = DESCipher(b'cbc--key', mode=DESCipher.MODE_CBC)
+    encrypted, _ = cipher.encrypt(b'hello world')
+    # 修改倒数第二个密文块的最后一个字节，使最后一个明文块的填充字节由0x05变为0xFA
+    tampered = encrypted[:-9] + bytes([encrypted[-9] ^ 0xFF]) + encrypted[-8:]
+    decrypted, _ = cipher.decrypt(tampered)
+    assert decrypted is None
+
+
+@pytest.mark.parametrize('mode', DESCipher.MODES)
+def test_streaming_matches_one_shot(mode):
+    cipher = DESCipher(b'streamkk', mode=mode)
+    data = os.urandom(5000)
+    encryptor = cipher.encryptor()
+    parts = [encryptor.update(data[i:i + 777]) for i in range(0, len(data), 777)]
+    parts.append(encryptor.finalize())
+    encrypted = b''.join(parts)
+    assert cipher.decrypt(encrypted)[0] == data
+
+    decryptor = cipher.decryptor()
+    parts = [decryptor.update(encrypted[i:i + 333]) for i in range(0, len(encrypted), 333)]
+    parts.append(decryptor.finalize())
+    assert b''.join(parts) == data
+
+
+@pytest.mark.parametrize('mode', DESCipher.MODES)
+@pytest.mark.parametrize('size', [0, 1, 8, 100, 5000])
+def test_decrypt_parallel_matches_decrypt(mode, size):
+    cipher = DESCipher(b'parallel', mode=mode)
+    encrypted, _ = cipher.encrypt(os.urandom(size))
+    expected, _ = cipher.decrypt(encrypted)
+    # threshold=0使所有非空密文都走进程池
+    decrypted, _ = cipher.decrypt_parallel(encrypted, max_workers=3, threshold=0)
+    assert decrypted == expected
+
+
+def test_decrypt_parallel_rejects_bad_padding():
+    cipher = DESCipher(b'parallel', mode=DESCipher.MODE_CBC)
+    encrypted, _ = cipher.encrypt(os.urandom(100))
+    tampered = encrypted[:-1] + bytes([encrypted[-1] ^ 0xFF])
+    assert cipher.decrypt_parallel(tampered, max_workers=2, threshold=0)[0] == cipher.decrypt(tampered)[0]
+
+
+def test_key_schedule_cache_counts_hits_and_misses():
+    DESCipher.clear_key_schedule_cache()
+    key = os.urandom(8)
+    first = DESCipher(key)
+    info = DESCipher.key_schedule_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (0, 1, 1)
+    second = DESCipher(key)
+    info = DESCipher.key_schedule_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+    assert second.sub_keys == first.sub_keys
+    # bytearray密钥与bytes密钥命中同一条缓存
+    DESCipher(bytearray(key))
+    assert DESCipher.key_schedule_cache_info().hits == 2
+
+
+def test_parallel_decryptor_matches_serial():
+    cipher = DESCipher(b'parallel', mode=DESCipher.MODE_CBC)
+    data = os.urandom(20000)
+    encrypted, _ = cipher.encrypt(data)
+    decryptor = cipher.decryptor(max_workers=2)
+    parts = [decryptor.update(encrypted[i:i + 4096]) for i in range(0, len(encrypted), 4096)]
+    parts.append(decryptor.finalize())
+    assert b''.join(parts) == data
+
+
+@pytest.mark.parametrize('size', [0, 1, 7, 8, 9, 1000])
+def test_ctr_encrypt_into_matches_crypt_ctr(size):
+    cipher = DESCipher(b'into-ctr', mode=DESCipher.MODE_CTR)
+    data = os.urandom(size)
+    out = bytearray(b'\xaa' * (cipher.encrypted_size(size) + 5))
+    written = cipher.encrypt_into(memoryview(data), out)[0]
+    assert written == 8 + size
+    iv = bytes(out[:8])
+    assert bytes(out[8:written]) == cipher.crypt_ctr(iv, data)
+    # 不写入超出加密结果的部分
+    assert out[written:] == b'\xaa' * 5
@@ -0,0 +1,99 @@
+import pytest
+
+from crypto.diffie_hellman import DiffieHellman, FixedBaseTable, GROUPS, DEFAULT_GROUP_ID, get_group
+
+
+def test_registry_groups():
+    expected = {5: 1536, 14: 2048, 15: 3072, 16: 4096, 17: 6144, 18: 8192,
+                256: 2048, 257: 3072, 258: 4096, 259: 6144, 260: 8192}
+    assert {group_id: group.bits for group_id, group in GROUPS.items()} == expected
+    for group in GROUPS.values():
+        assert group.generator == 2
+        # RFC 3526/7919的质数首尾64位均为1
+        assert group.prime >> (group.bits - 64) == 2 ** 64 - 1
+        assert group.prime & (2 ** 64 - 1) == 2 ** 64 - 1
+
+
+def test_get_group():
+    group = get_group(DEFAULT_GROUP_ID)
+    assert group.name == 'modp2048'
+    assert get_group('modp2048') is group
+    assert get_group(group) is group
+    assert get_group('ffdhe3072').id == 257
+    with pytest.raises(ValueError):
+        get_group(99)
+    with pytest.raises(ValueError):
+        get_group('modp1024')
+
+
+def test_group_key_agreement():
+    alice = DiffieHellman(group='modp1536')
+    bob = DiffieHellman(group=5)
+    assert alice.group_id == bob.group_id == 5
+    assert alice.key_size == 192
+    assert alice.generate_shared_secret(bob.get_public_key()) == bob.generate_shared_secret(alice.get_public_key())
+
+
+def test_custom_prime_has_no_group():
+    dh = DiffieHellman(23, 5)
+    assert dh.group_id is None
+    assert 2 <= dh.private_key <= 21
+
+
+@pytest.mark.parametrize('public_key', [0, 1, -1, 'p-1', 'p'])
+def test_invalid_peer_public_key_is_rejected(public_key):
+    dh = DiffieHellman(group=5)
+    public_key = {'p-1': dh.prime - 1, 'p': dh.prime}.get(public_key, public_key)
+    with pytest.raises(ValueError):
+        dh.generate_shared_secret(public_key)
+
+
+@pytest.mark.parametrize('group_id', [5, 14, 15, 256])
+def test_short_exponent_bit_length(group_id):
+    bits = DiffieHellman.SHORT_EXPONENT_BITS[GROUPS[group_id].bits]
+    for _ in range(20):
+        # 最高位固定为1，所有私钥位数相同
+        assert DiffieHellman(group=group_id).private_key.bit_length() == bits
+
+
+def test_short_exponent_sizes_follow_security_level():
+    sizes = [DiffieHellman.SHORT_EXPONENT_BITS[bits] for bits in sorted(DiffieHellman.SHORT_EXPONENT_BITS)]
+    assert sizes == sorted(sizes)
+    assert set(DiffieHellman.SHORT_EXPONENT_BITS) == {group.bits for group in GROUPS.values()}
+
+
+def test_full_exponent_when_disabled():
+    keys = [DiffieHellman(group=5, short_exponent=False).private_key for _ in range(20)]
+    assert all(2 <= key <= GROUPS[5].prime - 2 for key in keys)
+    assert max(key.bit_length() for key in keys) > 1500
+
+
+def test_short_and_full_exponents_agree():
+    short = DiffieHellman(group=14)
+    full = DiffieHellman(group=14, short_exponent=False)
+    assert short.generate_shared_secret(full.get_public_key()) == full.generate_shared_secret(short.get_public_key())
+
+
+def test_fixed_base_table_matches_pow():
+    group = GROUPS[5]
+    table = FixedBaseTable(group.generator, group.prime, window=5, max_bits=240)
+    for exponent in (0, 1, 31, 2 ** 239 + 12345, 2 ** 240 - 1):
+        assert table.pow(exponent) == pow(group.generator, exponent, group.prime)
+
+
+def test_full_exponent_does_not_grow_table():
+    group = GROUPS[5]
+    table = FixedBaseTable(group.generator, group.prime, window=5, max_bits=240)
+    exponent = group.prime - 2
+    assert table.pow(exponent) == pow(group.generator, exponent, group.prime)
+    assert table.rows == []
+    table.pow(2 ** 239)
+    assert len(table.rows) == 48
+
+
+def test_shared_table_is_bounded_by_short_exponent_bits():
+    DiffieHellman(group=5, short_exponent=False)
+    DiffieHellman(group=5)
+    table = DiffieHellman.get_fixed_base_table(GROUPS[5].prime, GROUPS[5].generator)
+    assert table.max_bits == DiffieHellman.SHORT_EXPONENT_BITS[1536]
+    assert len(table.rows) <= -(-table.max_bits // table.window)
@@ -0,0 +1,73 @@
+import hashlib
+import os
+
+from main import ReceivedFile, ReceivedIndex
+
+
+CHUNK = 1024
+
+
+def chunks_of(data):
+    return [data[i:i + CHUNK] for i in range(0, len(data), CHUNK)]
+
+
+def test_chunks_out_of_order_commit(tmp_path):
+    data = os.urandom(CHUNK * 5 + 17)
+    file_hash = hashlib.sha256(data).hexdigest()
+    received = ReceivedFile(str(tmp_path), 'a.bin', 0, len(data), CHUNK, file_hash)
+    for seq in (4, 0, 5, 2, 1, 3):
+        received.write_chunk(seq, chunks_of(data)[seq])
+    assert received.is_complete()
+    assert received.content_hash() == file_hash
+    name, path = received.commit()
+    assert name == 'a.bin'
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    assert sorted(os.listdir(tmp_path)) == ['a.bin']
+
+
+def test_resume_from_manifest(tmp_path):
+    data = os.urandom(CHUNK * 4)
+    file_hash = hashlib.sha256(data).hexdigest()
+    received = ReceivedFile(str(tmp_path), 'b.bin', 0, len(data), CHUNK, file_hash)
+    received.write_chunk(0, chunks_of(data)[0])
+    received.write_chunk(2, chunks_of(data)[2])
+    received.abort()
+
+    resumed = ReceivedFile(str(tmp_path), 'b.bin', 0, len(data), CHUNK, file_hash)
+    assert resumed.have_ranges() == [[0, 1], [2, 3]]
+    resumed.write_chunk(1, chunks_of(data)[1])
+    resumed.write_chunk(3, chunks_of(data)[3])
+    assert resumed.content_hash() == file_hash
+
+
+def test_content_hash_detects_wrong_partial_data(tmp_path):
+    data = os.urandom(CHUNK * 2)
+    file_hash = hashlib.sha256(data).hexdigest()
+    received = ReceivedFile(str(tmp_path), 'c.bin', 0, len(data), CHUNK, file_hash)
+    # 块摘要由接收方计算，写入错误数据时清单本身无法发现
+    received.write_chunk(0, os.urandom(CHUNK))
+    received.write_chunk(1, chunks_of(data)[1])
+    assert received.is_complete()
+    assert received.content_hash() != file_hash
+    received.discard()
+    assert os.listdir(tmp_path) == []
+
+
+def test_commit_does_not_overwrite(tmp_path):
+    (tmp_path / 'd.bin').write_bytes(b'existing')
+    received = ReceivedFile(str(tmp_path), 'd.bin')
+    received.write(b'new')
+    name, path = received.commit()
+    assert name != 'd.bin'
+    assert (tmp_path / 'd.bin').read_bytes() == b'existing'
+    with open(path, 'rb') as f:
+        assert f.read() == b'new'
+
+
+def test_index_finds_files_by_content(tmp_path):
+    data = b'indexed content'
+    (tmp_path / 'e.bin').write_bytes(data)
+    index = ReceivedIndex(str(tmp_path))
+    assert index.find(hashlib.sha256(data).hexdigest(), len(data)) == 'e.bin'
+    assert index.find(hashlib.sha256(b'other').hexdigest(), len(data)) is None
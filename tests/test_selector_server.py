@@ -0,0 +1,172 @@
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from crypto.des import DESCipher
+from crypto.diffie_hellman import DiffieHellman
+from network.communication import NetworkManager
+from network.selector_server import FrameReader, SelectorNetworkManager
+
+
+def frame(msg_type, payload):
+    return struct.pack("!II", msg_type, len(payload)) + payload
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def server():
+    manager = SelectorNetworkManager(port=0)
+    assert manager.start()
+    manager.port = manager.socket.getsockname()[1]
+    yield manager
+    manager.close()
+
+
+def test_frame_reader_reassembles_split_frames():
+    data = frame(2, b'hello') + frame(3, b'') + frame(4, b'x' * 1000)
+    reader = FrameReader()
+    frames = []
+    for i in range(len(data)):
+        frames.extend((msg_type, bytes(payload)) for msg_type, payload in reader.feed(data[i:i + 1]))
+    assert frames == [(2, b'hello'), (3, b''), (4, b'x' * 1000)]
+
+
+def test_frame_reader_handles_many_frames_in_one_read():
+    data = b''.join(frame(2, bytes([i]) * i) for i in range(50))
+    frames = [(t, bytes(p)) for t, p in FrameReader().feed(data)]
+    assert frames == [(2, bytes([i]) * i) for i in range(50)]
+
+
+def test_frame_reader_rejects_oversized_frame():
+    reader = FrameReader(max_frame_size=1024)
+    assert reader.feed(frame(2, b'a' * 1024))[0][1].nbytes == 1024
+    with pytest.raises(ValueError):
+        reader.feed(struct.pack("!II", 2, 1025))
+
+
+def test_server_drops_connection_on_oversized_header(server):
+    closed = []
+    server.set_connection_callback(lambda conn, connected: connected or closed.append(conn))
+    client = socket.create_connection((server.host, server.port))
+    try:
+        client.sendall(struct.pack("!II", NetworkManager.MSG_TYPE_TEXT, NetworkManager.MAX_FRAME_SIZE + 1))
+        client.settimeout(5)
+        assert client.recv(1) == b''
+        assert wait_until(lambda: closed)
+    finally:
+        client.close()
+
+
+def connect_client(server, **kwargs):
+    """
+    连接到服务器并完成密钥交换，返回(客户端, 客户端DES加密器, 服务器端连接)
+    """
+    ready = []
+    server.set_dh_key_callback(lambda conn, public_key, group_id: ready.append(conn))
+    dh = DiffieHellman()
+    client = NetworkManager(port=server.port, **kwargs)
+    keys = []
+    client.set_dh_key_callback(lambda public_key, group_id: keys.append(dh.generate_shared_secret(public_key)))
+    assert client.start()
+    client.send_dh_public_key(dh.get_public_key(), dh.group_id, dh.key_size)
+    assert wait_until(lambda: keys and ready)
+    return client, DESCipher(keys[0]), ready[0]
+
+
+def test_dh_runs_off_the_event_loop(server):
+    threads = []
+
+    def factory():
+        threads.append(threading.current_thread())
+        return DiffieHellman()
+
+    server.dh_factory = factory
+    client, des, conn = connect_client(server)
+    try:
+        assert threads and all(t.name.startswith('ThreadPoolExecutor') for t in threads)
+        assert conn.des.key == des.key
+    finally:
+        client.close()
+
+
+def test_messages_arriving_before_key_pair_are_deferred_in_order(server):
+    def slow_factory():
+        time.sleep(0.3)
+        return DiffieHellman()
+
+    server.dh_factory = slow_factory
+    accepted = []
+    server.set_connection_callback(lambda conn, connected: connected and accepted.append(conn))
+    dh = DiffieHellman()
+    client = NetworkManager(port=server.port, cipher_mode=NetworkManager.CIPHER_MODE_CTR)
+    assert client.start()
+    try:
+        client.send_cipher_mode_proposal()
+        client.send_dh_public_key(dh.get_public_key(), dh.group_id, dh.key_size)
+        # 密钥对生成期间事件循环仍然可以接受新连接
+        other = socket.create_connection((server.host, server.port))
+        assert wait_until(lambda: len(accepted) == 2, timeout=0.25)
+        other.close()
+        conn = accepted[0]
+        assert wait_until(lambda: conn.des is not None)
+        # 模式协商消息先于公钥处理，DES加密器使用协商的模式
+        assert conn.des.mode == NetworkManager.CIPHER_MODE_CTR
+    finally:
+        client.close()
+
+
+@pytest.mark.parametrize('batch_window', [None, 0.05])
+def test_text_messages_round_trip(server, batch_window):
+    received = []
+    server.set_message_callback(lambda conn, data: received.append(conn.des.decrypt(bytes(data))[0]))
+    client, des, conn = connect_client(server, batch_window=batch_window)
+    try:
+        for i in range(20):
+            client.send_encrypted_message(des.encrypt(f'msg {i}'.encode())[0])
+        assert wait_until(lambda: len(received) == 20)
+        assert received == [f'msg {i}'.encode() for i in range(20)]
+    finally:
+        client.close()
+
+
+def test_slow_reader_is_disconnected_when_out_buffer_is_full(server):
+    server.max_out_buffer = 64 * 1024
+    closed = []
+    server.set_connection_callback(lambda conn, connected: connected or closed.append(conn))
+    client = socket.create_connection((server.host, server.port))
+    try:
+        assert wait_until(lambda: server.connections)
+        conn = next(iter(server.connections))
+        # 客户端不读取，写缓冲区逐渐积累直到超过上限
+        results = [conn.send_message(NetworkManager.MSG_TYPE_TEXT, b'x' * 16 * 1024) for _ in range(4096)]
+        assert results[-1] is False
+        assert wait_until(lambda: closed == [conn])
+        assert len(conn.out_buffer) <= server.max_out_buffer
+    finally:
+        client.close()
+
+
+def test_file_request_is_answered_by_default(server, tmp_path):
+    client, des, conn = connect_client(server)
+    responses = []
+    client.set_file_response_callback(responses.append)
+    path = tmp_path / 'a.bin'
+    path.write_bytes(b'data')
+    try:
+        client.send_file_request(str(path), 'ab' * 32, 1024)
+        assert wait_until(lambda: responses, timeout=2)
+        assert responses[0]['status'] == NetworkManager.FILE_STATUS_SEND
+        assert responses[0]['hash'] == 'ab' * 32
+    finally:
+        client.close()
@@ -0,0 +1,44 @@
+import os
+import time
+
+from crypto.session_ticket import SessionTicketIssuer, SessionTicketCache
+
+
+def test_issue_and_open_round_trip():
+    issuer = SessionTicketIssuer()
+    secret = os.urandom(32)
+    ticket = issuer.issue(secret)
+    assert issuer.open(ticket) == secret
+    # 相同票据密钥的其他实例也能解开
+    key = os.urandom(32)
+    assert SessionTicketIssuer(key).open(SessionTicketIssuer(key).issue(secret)) == secret
+
+
+def test_tampered_ticket_is_rejected():
+    issuer = SessionTicketIssuer()
+    ticket = bytearray(issuer.issue(os.urandom(32)))
+    for index in (0, SessionTicketIssuer.NONCE_SIZE + 3, len(ticket) - 1):
+        tampered = bytearray(ticket)
+        tampered[index] ^= 0x01
+        assert issuer.open(bytes(tampered)) is None
+    assert issuer.open(bytes(ticket[:-1])) is None
+    # 其他票据密钥签发的票据
+    assert SessionTicketIssuer().open(bytes(ticket)) is None
+
+
+def test_expired_ticket_is_rejected(monkeypatch):
+    issuer = SessionTicketIssuer(lifetime=60)
+    ticket = issuer.issue(os.urandom(32))
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    assert issuer.open(ticket) is None
+
+
+def test_cache_drops_expired_tickets(monkeypatch):
+    cache = SessionTicketCache()
+    cache.put(('127.0.0.1', 9999), b'ticket', b's' * 32, 60)
+    assert cache.get(('127.0.0.1', 9999)) == (b'ticket', b's' * 32)
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    assert cache.get(('127.0.0.1', 9999)) is None
+    assert not cache.entries
@@ -210,7 +210,7 @@ class MainWindow:
         
         # 加密统计信息
         self.encryption_info = ttk.Treeview(encryption_frame, columns=("value",), 
-                                         show="tree", height=6)
+                                         show="tree", height=8)
         self.encryption_info.pack(fill=tk.X, padx=5, pady=5)
         
         self.encryption_info.column("#0", width=150)
@@ -224,6 +224,8 @@ class MainWindow:
         self.encryption_info.insert("", tk.END, text="接收文件数量", values=["0"], iid="recv_files")
         self.encryption_info.insert("", tk.END, text="平均加密效率", values=["0 B/s"], iid="encryption_rate")
         self.encryption_info.insert("", tk.END, text="平均解密效率", values=["0 B/s"], iid="decryption_rate")
+        self.encryption_info.insert("", tk.END, text="加密任务队列", values=["0"], iid="crypto_jobs")
+        self.encryption_info.insert("", tk.END, text="当前任务进度", values=["-"], iid="crypto_progress")
         
         # 右侧底部：文件传输
         files_label = ttk.Label(right_frame, text="文件传输", style='Header.TLabel')
@@ -475,6 +477,15 @@ class MainWindow:
             
         self.encryption_info.item("decryption_rate", values=[rate_str])
     
+    def update_crypto_jobs(self, queue_depth, progress):
+        """
+        更新加密任务队列状态
+        :param queue_depth: 尚未完成的任务数量
+        :param progress: 正在执行的任务进度描述，为空时显示"-"
+        """
+        self.encryption_info.item("crypto_jobs", values=[str(queue_depth)])
+        self.encryption_info.item("crypto_progress", values=[progress or "-"])
+    
     def show_error(self, title, message):
         """
         显示错误消息